@@ -0,0 +1,121 @@
+import hashlib
+import os
+import sys
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+def git_blob_sha(data: bytes) -> str:
+    """SHA-1 git assigns to a blob with this content"""
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+class BlobStore:
+    """On-disk content-addressed store of file contents keyed by git blob SHA
+
+    Content at a given blob SHA never changes, so a stored blob is valid across
+    refs, repositories and sessions. Files live under <root>/<sha[:2]>/<sha>;
+    when the total size exceeds max_bytes the least recently read blobs are
+    evicted first. The directory is scanned once, on first use, into an
+    in-memory size index kept in least recently read order.
+    """
+
+    def __init__(self, root: str, max_bytes: int = 256 * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.total_bytes = 0
+        self._index: Optional["OrderedDict[str, int]"] = None
+
+    def path_for(self, sha: str) -> str:
+        return os.path.join(self.root, sha[:2], sha)
+
+    @property
+    def index(self) -> "OrderedDict[str, int]":
+        """{sha: size}, least recently read first"""
+        if self._index is None:
+            os.makedirs(self.root, exist_ok=True)
+            self._index = OrderedDict((os.path.basename(path), size) for _, path, size in sorted(self._scan()))
+            self.total_bytes = sum(self._index.values())
+        return self._index
+
+    def get(self, sha: str) -> Optional[bytes]:
+        """Return the stored content for sha, or None"""
+        index = self.index
+        path = self.path_for(sha)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            # Removed by another process sharing the store
+            self.total_bytes -= index.pop(sha, 0)
+            self.misses += 1
+            return None
+        if sha not in index:
+            # Written by another process sharing the store
+            index[sha] = len(data)
+            self.total_bytes += len(data)
+        index.move_to_end(sha)
+        self.hits += 1
+        return data
+
+    def put(self, sha: str, data: bytes) -> bool:
+        """Store content under its blob SHA; content that does not hash to sha is rejected"""
+        if len(data) > self.max_bytes or git_blob_sha(data) != sha:
+            return False
+        index = self.index
+        path = self.path_for(sha)
+        if os.path.exists(path):
+            return True
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error writing blob {sha}: {e}", file=sys.stderr)
+            return False
+        self.total_bytes += len(data) - index.pop(sha, 0)
+        index[sha] = len(data)
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+        return True
+
+    def evict(self):
+        """Drop least recently read blobs until the store fits in max_bytes"""
+        index = self.index
+        while self.total_bytes > self.max_bytes and index:
+            sha, size = index.popitem(last=False)
+            self.total_bytes -= size
+            try:
+                os.remove(self.path_for(sha))
+            except OSError:
+                continue
+            self.evictions += 1
+
+    def _scan(self):
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield stat.st_mtime, path, stat.st_size
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "root": self.root,
+            "total_bytes": self.total_bytes if self._index is not None else None,
+            "blobs": len(self._index) if self._index is not None else None,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
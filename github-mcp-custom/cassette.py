@@ -0,0 +1,147 @@
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+import httpx
+
+# Headers never written to a cassette
+SECRET_HEADERS = {"authorization", "cookie", "set-cookie", "x-github-token"}
+# Describe the encoded body on the wire; recordings keep the decoded body
+WIRE_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+
+class CassetteMiss(Exception):
+    """Replay got a request that is not in the cassette"""
+
+
+class Cassette:
+    """Recorded HTTP exchanges, stored as JSON and matched on request shape
+
+    Requests match on method, path, sorted query, a hash of the body and
+    whether they are conditional (If-None-Match / If-Modified-Since). The same
+    request made several times is answered with its recordings in order, the
+    last one repeating.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.interactions: List[Dict[str, Any]] = []
+        self._served: Dict[str, int] = defaultdict(int)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.interactions = json.load(f).get("interactions", [])
+        self._by_key: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for interaction in self.interactions:
+            self._by_key[interaction["key"]].append(interaction)
+
+    @staticmethod
+    def request_key(request: httpx.Request) -> str:
+        query = "&".join(sorted(request.url.query.decode().split("&"))) if request.url.query else ""
+        body = hashlib.sha256(request.content).hexdigest()[:16] if request.content else ""
+        conditional = "if-none-match" in request.headers or "if-modified-since" in request.headers
+        return f"{request.method} {request.url.path}?{query} body={body} conditional={conditional}"
+
+    def find(self, request: httpx.Request) -> Dict[str, Any]:
+        key = self.request_key(request)
+        recordings = self._by_key.get(key)
+        if not recordings:
+            raise CassetteMiss(f"No recorded response for {key} in {self.path}")
+        index = min(self._served[key], len(recordings) - 1)
+        self._served[key] += 1
+        return recordings[index]
+
+    def add(self, request: httpx.Request, response: httpx.Response, content: bytes, seconds: float):
+        try:
+            body: Dict[str, str] = {"text": content.decode("utf-8")}
+        except UnicodeDecodeError:
+            body = {"base64": base64.b64encode(content).decode("ascii")}
+        interaction = {
+            "key": self.request_key(request),
+            "request": {"method": request.method, "url": str(request.url.copy_with(query=None))},
+            "response": {
+                "status": response.status_code,
+                "headers": [[k, v] for k, v in response.headers.multi_items()
+                            if k.lower() not in SECRET_HEADERS | WIRE_HEADERS],
+                **body
+            },
+            "seconds": round(seconds, 4)
+        }
+        self.interactions.append(interaction)
+        self._by_key[interaction["key"]].append(interaction)
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "interactions": self.interactions}, f, indent=1)
+        os.replace(tmp_path, self.path)
+
+
+class CassetteTransport(httpx.AsyncBaseTransport):
+    """httpx transport that records exchanges to a cassette or replays them offline
+
+    mode 'record' sends requests through `transport` (a real transport by
+    default) and saves every exchange; 'replay' never opens a connection and
+    answers from the cassette after `latency`: 'recorded' waits as long as the
+    original exchange took, a number waits that many seconds.
+    """
+
+    def __init__(self, path: str, mode: str = "replay", latency: Any = "recorded",
+                 transport: Optional[httpx.AsyncBaseTransport] = None, **transport_kwargs):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Cassette mode must be 'record' or 'replay', not {mode!r}")
+        self.cassette = Cassette(path)
+        self.mode = mode
+        self.latency = latency
+        self.transport = transport
+        self.transport_kwargs = transport_kwargs
+        self._owned = False
+        self.replayed = 0
+        self.recorded = 0
+
+    def _delay(self, interaction: Dict[str, Any]) -> float:
+        if self.latency == "recorded":
+            return interaction.get("seconds", 0.0)
+        return float(self.latency or 0)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if self.mode == "replay":
+            interaction = self.cassette.find(request)
+            delay = self._delay(interaction)
+            if delay:
+                await asyncio.sleep(delay)
+            recorded = interaction["response"]
+            content = (base64.b64decode(recorded["base64"]) if "base64" in recorded
+                       else recorded.get("text", "").encode("utf-8"))
+            self.replayed += 1
+            return httpx.Response(recorded["status"], headers=recorded["headers"], content=content,
+                                  request=request)
+
+        if self.transport is None:
+            # Created per client lifetime: GitHubAPI reopens its client after aclose()
+            self.transport = httpx.AsyncHTTPTransport(**self.transport_kwargs)
+            self._owned = True
+        start = time.perf_counter()
+        response = await self.transport.handle_async_request(request)
+        content = await response.aread()
+        self.cassette.add(request, response, content, time.perf_counter() - start)
+        self.cassette.save()
+        self.recorded += 1
+        headers = [(k, v) for k, v in response.headers.multi_items() if k.lower() not in WIRE_HEADERS]
+        return httpx.Response(response.status_code, headers=headers, content=content, request=request,
+                              extensions=response.extensions)
+
+    async def aclose(self):
+        if self.transport is not None and self._owned:
+            await self.transport.aclose()
+            self.transport = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"mode": self.mode, "path": self.cassette.path, "interactions": len(self.cassette.interactions),
+                "recorded": self.recorded, "replayed": self.replayed}
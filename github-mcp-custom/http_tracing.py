@@ -0,0 +1,20 @@
+import os
+import sys
+
+# http_request spans of the GitHub API client, written by the voicegit CLI's
+# tracer (src/tracing.py) to the same file, with the same rotation. This
+# server runs as a separate process without the CLI's trace context, so its
+# spans have no parent: `voicegit trace summarize` attaches each one to the
+# tool call that was running when it was made.
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+if SRC_DIR not in sys.path:
+    # Appended, so this server's own modules keep precedence
+    sys.path.append(SRC_DIR)
+
+from tracing import Tracer  # noqa: E402
+
+# Off unless asked for: the server is often run on its own, without the CLI
+TRACE_ENABLED = os.getenv("VOICEGIT_TRACE", "0") != "0"
+
+tracer = Tracer(service="github-mcp", enabled=TRACE_ENABLED)
@@ -0,0 +1,166 @@
+import asyncio
+import time
+from typing import Any, Dict, Optional
+import httpx
+
+
+class RateLimitExceeded(Exception):
+    """The rate limit budget would not allow a request within the maximum wait"""
+
+
+class ResourceBudget:
+    """Known rate limit state of one GitHub resource category (core, search, graphql, ...)"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.limit: Optional[int] = None
+        self.remaining: Optional[int] = None
+        self.reset_at = 0.0
+        self.blocked_until = 0.0
+        self.next_slot = 0.0
+        self.queued = 0
+        self.throttled = 0
+        self.retries = 0
+        self.lock = asyncio.Lock()
+
+
+class RateLimitScheduler:
+    """Paces GitHub requests from the X-RateLimit-* and Retry-After response headers
+
+    Every resource category is a token bucket refilled at X-RateLimit-Reset.
+    Requests wait for a token instead of failing: once the bucket is empty they
+    are queued until the reset, and below pace_below of the limit the remaining
+    tokens are spread evenly over the time left. 403/429 rate limit responses
+    block the bucket for Retry-After (or an exponential backoff) and are retried.
+
+    Buckets are named after the X-RateLimit-Resource header (core, search,
+    code_search, graphql, ...). Until a response has named the resource of an
+    endpoint, it is guessed from the path.
+    """
+
+    def __init__(self, max_wait: float = 60.0, pace_below: float = 0.1, max_retries: int = 3,
+                 backoff_base: float = 1.0, clock=time.time, sleep=asyncio.sleep):
+        self.max_wait = max_wait
+        self.pace_below = pace_below
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.clock = clock
+        self.sleep = sleep
+        self.budgets: Dict[str, ResourceBudget] = {}
+        # Resource named by the responses of a route, where it differs from the guess
+        self.learned: Dict[str, str] = {}
+
+    @staticmethod
+    def route(endpoint: str) -> str:
+        """First two path segments: '/search/code', '/repos/<owner>', '/graphql'"""
+        return "/" + "/".join(endpoint.split("?", 1)[0].strip("/").split("/")[:2])
+
+    @staticmethod
+    def guess_resource(endpoint: str) -> str:
+        if endpoint.startswith("/graphql"):
+            return "graphql"
+        if endpoint.startswith("/search"):
+            return "search"
+        return "core"
+
+    def resource_for(self, endpoint: str) -> str:
+        """Bucket an endpoint's requests are paced by"""
+        return self.learned.get(self.route(endpoint)) or self.guess_resource(endpoint)
+
+    def budget(self, resource: str) -> ResourceBudget:
+        if resource not in self.budgets:
+            self.budgets[resource] = ResourceBudget(resource)
+        return self.budgets[resource]
+
+    async def acquire(self, resource: str):
+        """Wait until the resource budget allows one more request and take its token"""
+        budget = self.budget(resource)
+        budget.queued += 1
+        try:
+            async with budget.lock:
+                now = self.clock()
+                wait = self._delay(budget, now)
+                if wait > self.max_wait:
+                    raise RateLimitExceeded(
+                        f"GitHub {resource} rate limit exhausted, next request allowed in {wait:.0f}s"
+                    )
+                if wait > 0:
+                    budget.throttled += 1
+                budget.next_slot = now + wait + self._interval(budget, now + wait)
+                if budget.remaining is not None:
+                    budget.remaining = max(budget.remaining - 1, 0)
+            if wait > 0:
+                await self.sleep(wait)
+        finally:
+            budget.queued -= 1
+
+    def _delay(self, budget: ResourceBudget, now: float) -> float:
+        if budget.remaining is not None and budget.reset_at <= now:
+            # Window has reset since the last response; the next response will tell us more
+            budget.remaining = None
+        wait = max(budget.blocked_until - now, budget.next_slot - now, 0.0)
+        if budget.remaining == 0:
+            wait = max(wait, budget.reset_at - now)
+        return wait
+
+    def _interval(self, budget: ResourceBudget, at: float) -> float:
+        if not budget.limit or budget.remaining is None or budget.reset_at <= at:
+            return 0.0
+        if budget.remaining >= budget.limit * self.pace_below:
+            return 0.0
+        return (budget.reset_at - at) / max(budget.remaining, 1)
+
+    def update(self, endpoint: str, response: httpx.Response) -> str:
+        """Record the rate limit headers of a response; returns the resource they belong to"""
+        headers = response.headers
+        resource = headers.get("X-RateLimit-Resource")
+        if resource:
+            if resource == self.guess_resource(endpoint):
+                self.learned.pop(self.route(endpoint), None)
+            else:
+                self.learned[self.route(endpoint)] = resource
+        else:
+            resource = self.resource_for(endpoint)
+        budget = self.budget(resource)
+        if "X-RateLimit-Remaining" in headers:
+            budget.remaining = int(headers["X-RateLimit-Remaining"])
+            if "X-RateLimit-Limit" in headers:
+                budget.limit = int(headers["X-RateLimit-Limit"])
+            if "X-RateLimit-Reset" in headers:
+                budget.reset_at = float(headers["X-RateLimit-Reset"])
+        return resource
+
+    def should_retry(self, resource: str, response: httpx.Response, attempt: int) -> bool:
+        """Block the budget and return True if the response is a rate limit rejection"""
+        if response.status_code not in (403, 429) or attempt >= self.max_retries:
+            return False
+        headers = response.headers
+        budget = self.budget(resource)
+        now = self.clock()
+        if headers.get("Retry-After"):
+            delay = float(headers["Retry-After"])
+        elif headers.get("X-RateLimit-Remaining") == "0":
+            delay = max(budget.reset_at - now, 0.0)
+        elif response.status_code == 429 or "rate limit" in response.text.lower():
+            delay = self.backoff_base * 2 ** attempt
+        else:
+            # Plain permission error, not a rate limit
+            return False
+        budget.blocked_until = max(budget.blocked_until, now + delay)
+        budget.retries += 1
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        now = self.clock()
+        return {
+            name: {
+                "limit": budget.limit,
+                "remaining": budget.remaining,
+                "reset_in": round(max(budget.reset_at - now, 0)) if budget.reset_at else None,
+                "blocked_for": round(max(budget.blocked_until - now, 0), 1),
+                "queue_depth": budget.queued,
+                "throttled": budget.throttled,
+                "retries": budget.retries
+            }
+            for name, budget in self.budgets.items()
+        }
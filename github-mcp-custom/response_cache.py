@@ -0,0 +1,102 @@
+import json
+import os
+import sys
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from urllib.parse import urlencode
+
+
+class ResponseCache:
+    """LRU cache of GitHub API responses with their ETag / Last-Modified validators
+
+    Entries are revalidated with If-None-Match / If-Modified-Since. GitHub answers
+    an unchanged resource with 304 Not Modified, which is served from here and
+    does not count against the rate limit.
+    """
+
+    def __init__(self, max_entries: int = 256, path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.path = path
+        self.entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if self.path:
+            self.load()
+
+    @staticmethod
+    def make_key(endpoint: str, params: Optional[Dict] = None) -> str:
+        """Build a stable key from the endpoint and its sorted query params"""
+        query = urlencode(sorted((params or {}).items()))
+        return f"{endpoint}?{query}" if query else endpoint
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached entry for key and mark it as recently used"""
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    def conditional_headers(self, entry: Optional[Dict[str, Any]]) -> Dict[str, str]:
+        """Headers that turn a request for a cached entry into a conditional one"""
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def store(self, key: str, data: Any, etag: Optional[str], last_modified: Optional[str],
+              link: Optional[str] = None):
+        """Cache a full response; responses without validators are not stored"""
+        self.misses += 1
+        if not etag and not last_modified:
+            return
+        self.entries[key] = {"data": data, "etag": etag, "last_modified": last_modified, "link": link}
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def hit(self, entry: Dict[str, Any]) -> Any:
+        """Record a 304 Not Modified and return the cached payload"""
+        self.hits += 1
+        return entry["data"]
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "persisted_to": self.path
+        }
+
+    def load(self):
+        """Load entries persisted by an earlier session, if any"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return
+        for key, entry in list(entries.items())[-self.max_entries:]:
+            self.entries[key] = entry
+
+    def save(self):
+        """Persist entries to disk so the next CLI session can revalidate them"""
+        if not self.path:
+            return
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Error saving response cache: {e}", file=sys.stderr)
@@ -1,40 +1,532 @@
 import asyncio
+import base64
+import fnmatch
 import json
+import re
 import os
-from typing import Any, Dict, List, Optional
+import sys
+import time
+from contextlib import asynccontextmanager
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
 import httpx
 from mcp.server.fastmcp import FastMCP
+from blob_store import BlobStore
+from cassette import CassetteTransport
+from rate_limit import RateLimitScheduler
+from response_cache import ResponseCache
+from http_tracing import tracer
 
 # GitHub API Configuration
 GITHUB_API_BASE = "https://api.github.com"
 
-# Initialize FastMCP server
-mcp = FastMCP("GitHub")
+# HTTP client configuration (shared, process-lifetime connection pool)
+GITHUB_HTTP2 = os.getenv("GITHUB_HTTP2", "1") != "0"
+GITHUB_MAX_CONNECTIONS = int(os.getenv("GITHUB_MAX_CONNECTIONS", "20"))
+GITHUB_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("GITHUB_MAX_KEEPALIVE_CONNECTIONS", "10"))
+GITHUB_KEEPALIVE_EXPIRY = float(os.getenv("GITHUB_KEEPALIVE_EXPIRY", "30"))
+GITHUB_CONNECT_TIMEOUT = float(os.getenv("GITHUB_CONNECT_TIMEOUT", "10"))
+GITHUB_TIMEOUT = float(os.getenv("GITHUB_TIMEOUT", "30"))
+
+# Conditional-request response cache (set GITHUB_CACHE_FILE to persist across sessions)
+GITHUB_CACHE_ENABLED = os.getenv("GITHUB_CACHE_ENABLED", "1") != "0"
+GITHUB_CACHE_MAX_ENTRIES = int(os.getenv("GITHUB_CACHE_MAX_ENTRIES", "256"))
+GITHUB_CACHE_FILE = os.getenv("GITHUB_CACHE_FILE") or None
+
+# all_pages mode for list tools: bounded concurrent page fetches and a hard item cap
+GITHUB_PAGE_CONCURRENCY = int(os.getenv("GITHUB_PAGE_CONCURRENCY", "4"))
+GITHUB_MAX_ITEMS = int(os.getenv("GITHUB_MAX_ITEMS", "1000"))
+
+# Content-addressed file cache keyed by blob SHA, shared across sessions
+GITHUB_BLOB_CACHE_ENABLED = os.getenv("GITHUB_BLOB_CACHE_ENABLED", "1") != "0"
+GITHUB_BLOB_CACHE_DIR = os.getenv("GITHUB_BLOB_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".voicegit", "blobs")
+GITHUB_BLOB_CACHE_MAX_MB = int(os.getenv("GITHUB_BLOB_CACHE_MAX_MB", "256"))
+GITHUB_RAW_MEDIA_TYPE = "application/vnd.github.raw"
+
+# Rate limit scheduler: queue and pace requests instead of failing on 403/429
+GITHUB_RATE_LIMIT_ENABLED = os.getenv("GITHUB_RATE_LIMIT_ENABLED", "1") != "0"
+GITHUB_RATE_LIMIT_MAX_WAIT = float(os.getenv("GITHUB_RATE_LIMIT_MAX_WAIT", "60"))
+GITHUB_RATE_LIMIT_MAX_RETRIES = int(os.getenv("GITHUB_RATE_LIMIT_MAX_RETRIES", "3"))
+
+# Record/replay of GitHub HTTP exchanges (cassette.py), for offline runs and benchmarks:
+# GITHUB_CASSETTE=path.json, GITHUB_CASSETTE_MODE=record|replay,
+# GITHUB_CASSETTE_LATENCY=recorded|<seconds> injected per replayed response
+GITHUB_CASSETTE = os.getenv("GITHUB_CASSETTE") or None
+GITHUB_CASSETTE_MODE = os.getenv("GITHUB_CASSETTE_MODE", "replay")
+GITHUB_CASSETTE_LATENCY = os.getenv("GITHUB_CASSETTE_LATENCY", "recorded")
+
+# Recursive git trees, cached by SHA (a tree at a given SHA never changes)
+GITHUB_TREE_CACHE_SIZE = int(os.getenv("GITHUB_TREE_CACHE_SIZE", "32"))
+SHA_PATTERN = re.compile(r"^[0-9a-f]{40}$")
+
+# GraphQL batch backend for org-wide scans (falls back to REST when unavailable)
+GITHUB_GRAPHQL_ENABLED = os.getenv("GITHUB_GRAPHQL_ENABLED", "1") != "0"
+GITHUB_GRAPHQL_ENDPOINT = "/graphql"
+GITHUB_GRAPHQL_CHUNK_SIZE = int(os.getenv("GITHUB_GRAPHQL_CHUNK_SIZE", "50"))
+
+REPO_BRANCHES_FRAGMENT = """
+fragment RepoBranches on Repository {
+  name
+  defaultBranchRef { name }
+  refs(refPrefix: "refs/heads/", first: $branches) { totalCount nodes { name } }
+}
+"""
+
+ORG_REPOS_QUERY = """
+query($org: String!, $first: Int!, $after: String, $branches: Int!) {
+  organization(login: $org) {
+    repositories(first: $first, after: $after, orderBy: {field: CREATED_AT, direction: DESC}) {
+      pageInfo { hasNextPage endCursor }
+      nodes { ...RepoBranches }
+    }
+  }
+}
+""" + REPO_BRANCHES_FRAGMENT
+
+ORG_MEMBERS_QUERY = """
+query($org: String!, $after: String) {
+  organization(login: $org) {
+    membersWithRole(first: 100, after: $after) {
+      pageInfo { hasNextPage endCursor }
+      nodes { login }
+    }
+  }
+}
+"""
+
+class GraphQLError(Exception):
+    """GraphQL response carried errors and no data"""
+
+
+def graphql_missing(error: Exception) -> bool:
+    """Whether a failed GraphQL call means the server has no GraphQL endpoint"""
+    return isinstance(error, httpx.HTTPStatusError) and error.response.status_code in (404, 410, 501)
+
+
+def _http2_available() -> bool:
+    """HTTP/2 needs the optional 'h2' package (pip install httpx[http2])"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
 
 class GitHubAPI:
-    def __init__(self, token: str):
+    def __init__(self, token: str, base_url: str = GITHUB_API_BASE,
+                 http2: bool = GITHUB_HTTP2,
+                 max_connections: int = GITHUB_MAX_CONNECTIONS,
+                 max_keepalive_connections: int = GITHUB_MAX_KEEPALIVE_CONNECTIONS,
+                 keepalive_expiry: float = GITHUB_KEEPALIVE_EXPIRY,
+                 connect_timeout: float = GITHUB_CONNECT_TIMEOUT,
+                 timeout: float = GITHUB_TIMEOUT,
+                 cache: Optional[ResponseCache] = None,
+                 blob_store: Optional[BlobStore] = None,
+                 scheduler: Optional[RateLimitScheduler] = None,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
         self.token = token
+        self.base_url = base_url
         self.headers = {
             "Authorization": f"Bearer {token}",
             "Accept": "application/vnd.github+json",
             "X-GitHub-Api-Version": "2022-11-28"
         }
+        self.http2 = http2 and _http2_available()
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self._client: Optional[httpx.AsyncClient] = None
+        # Custom transport (e.g. a CassetteTransport); the pool limits then apply to it instead
+        self.transport = transport
+        self.cache = cache
+        self.blob_store = blob_store
+        self.scheduler = scheduler
+        self.graphql_enabled = GITHUB_GRAPHQL_ENABLED
+        self.request_count = 0
+        self.tree_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
 
-    async def make_request(self, endpoint: str, params: Optional[Dict] = None) -> Dict[str, Any]:
-        """Make authenticated request to GitHub API"""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{GITHUB_API_BASE}{endpoint}",
+    def get_client(self) -> httpx.AsyncClient:
+        """Return the shared keep-alive client, creating it on first use"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
                 headers=self.headers,
-                params=params or {}
+                http2=self.http2,
+                limits=self.limits,
+                timeout=self.timeout,
+                transport=self.transport
             )
-            response.raise_for_status()
-            return response.json()
+        return self._client
+
+    async def send(self, method: str, endpoint: str, **kwargs) -> httpx.Response:
+        """Send a request through the rate limit scheduler, retrying rate limit rejections"""
+        if self.scheduler is None:
+            return await self._request(method, endpoint, 0, **kwargs)
+
+        attempt = 0
+        while True:
+            await self.scheduler.acquire(self.scheduler.resource_for(endpoint))
+            response = await self._request(method, endpoint, attempt, **kwargs)
+            resource = self.scheduler.update(endpoint, response)
+            if not self.scheduler.should_retry(resource, response, attempt):
+                return response
+            attempt += 1
+
+    async def _request(self, method: str, endpoint: str, attempt: int, **kwargs) -> httpx.Response:
+        """One HTTP request, recorded as an http_request span"""
+        self.request_count += 1
+        with tracer.span("http_request", method=method, endpoint=endpoint, attempt=attempt) as span:
+            response = await self.get_client().request(method, endpoint, **kwargs)
+            span.set(status=response.status_code, request_bytes=len(response.request.content),
+                     response_bytes=len(response.content), http_version=response.http_version)
+            return response
+
+    async def make_request(self, endpoint: str, params: Optional[Dict] = None) -> Dict[str, Any]:
+        """Make authenticated request to GitHub API"""
+        data, _ = await self.make_request_with_links(endpoint, params)
+        return data
+
+    async def make_request_with_links(self, endpoint: str, params: Optional[Dict] = None) -> Tuple[Any, Dict[str, str]]:
+        """Make authenticated request and also return the pagination links by rel
+
+        Cached responses are revalidated with If-None-Match / If-Modified-Since;
+        a 304 Not Modified is answered from the cache.
+        """
+        params = params or {}
+        key = entry = None
+        headers = {}
+        if self.cache is not None:
+            key = self.cache.make_key(endpoint, params)
+            entry = self.cache.get(key)
+            headers = self.cache.conditional_headers(entry)
+
+        response = await self.send("GET", endpoint, params=params, headers=headers)
+        if response.status_code == 304 and entry is not None:
+            return self.cache.hit(entry), parse_link_header(entry.get("link"))
+        response.raise_for_status()
+        data = response.json()
+
+        link = response.headers.get("Link")
+        if self.cache is not None:
+            self.cache.store(key, data, response.headers.get("ETag"), response.headers.get("Last-Modified"), link)
+        return data, parse_link_header(link)
+
+    async def iter_pages(self, endpoint: str, params: Optional[Dict] = None,
+                         max_items: int = GITHUB_MAX_ITEMS,
+                         concurrency: int = GITHUB_PAGE_CONCURRENCY) -> AsyncIterator[List[Any]]:
+        """Yield every page of a list endpoint in order, stopping after max_items
+
+        The first page is fetched on its own to read the last page number from
+        the Link header; the remaining pages are then fetched concurrently under
+        a semaphore and yielded in page order as soon as each one is ready.
+        """
+        params = dict(params or {})
+        per_page = params.setdefault("per_page", 100)
+        params["page"] = 1
+
+        first_page, links = await self.make_request_with_links(endpoint, params)
+        yield first_page
+
+        last_page = page_number(links.get("last"))
+        if not last_page or len(first_page) < per_page:
+            return
+        last_page = min(last_page, -(-max_items // per_page))
+
+        semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+        async def fetch(page: int) -> List[Any]:
+            async with semaphore:
+                return await self.make_request(endpoint, {**params, "page": page})
+
+        tasks = [asyncio.create_task(fetch(page)) for page in range(2, last_page + 1)]
+        try:
+            for task in tasks:
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+            # Wait for the cancellations so no task is left pending or with an unretrieved error
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def get_all_pages(self, endpoint: str, params: Optional[Dict] = None,
+                            max_items: int = GITHUB_MAX_ITEMS) -> Tuple[List[Any], bool]:
+        """Fetch all pages merged in order; returns (items, truncated)"""
+        items: List[Any] = []
+        # Ask for one item past the cap so hitting it exactly is not reported as truncated
+        pages = self.iter_pages(endpoint, params, max_items + 1)
+        try:
+            async for page in pages:
+                items.extend(page)
+                if len(items) > max_items:
+                    break
+        finally:
+            await pages.aclose()
+        truncated = len(items) > max_items
+        return items[:max_items], truncated
+
+    async def make_raw_request(self, endpoint: str, params: Optional[Dict] = None) -> bytes:
+        """Fetch an endpoint with the raw media type, skipping the base64/JSON envelope"""
+        response = await self.send(
+            "GET",
+            endpoint,
+            params=params or {},
+            headers={"Accept": GITHUB_RAW_MEDIA_TYPE}
+        )
+        response.raise_for_status()
+        return response.content
+
+    async def get_blob(self, org: str, repo: str, sha: str) -> bytes:
+        """Content of a blob by SHA, from the blob store or fetched raw and stored"""
+        if self.blob_store is not None:
+            data = self.blob_store.get(sha)
+            if data is not None:
+                return data
+        data = await self.make_raw_request(f"/repos/{org}/{repo}/git/blobs/{sha}")
+        if self.blob_store is not None:
+            self.blob_store.put(sha, data)
+        return data
+
+    def cached_tree_entry(self, org: str, repo: str, ref: str, path: str) -> Optional[Dict[str, Any]]:
+        """Entry for path in an already cached tree of ref, without any request"""
+        tree = self.tree_cache.get(f"{org}/{repo}@{ref}")
+        if tree is None:
+            return None
+        path = path.strip("/")
+        for item in tree.get("tree", []):
+            if item.get("path") == path:
+                return item
+        return None
+
+    async def get_tree(self, org: str, repo: str, ref: str) -> Dict[str, Any]:
+        """Full recursive git tree of a ref, from the tree cache when the SHA is known
+
+        Trees are cached under both their own SHA and the commit SHA they were
+        requested with, so lookups by SHA against the same commit skip the network.
+        """
+        cache_key = f"{org}/{repo}@{ref}"
+        if SHA_PATTERN.match(ref) and cache_key in self.tree_cache:
+            self.tree_cache.move_to_end(cache_key)
+            return self.tree_cache[cache_key]
+
+        tree = await self.make_request(f"/repos/{org}/{repo}/git/trees/{ref}", {"recursive": 1})
+        for key in (cache_key, f"{org}/{repo}@{tree.get('sha')}"):
+            if SHA_PATTERN.match(key.rsplit("@", 1)[1]):
+                self.tree_cache[key] = tree
+                self.tree_cache.move_to_end(key)
+        while len(self.tree_cache) > GITHUB_TREE_CACHE_SIZE:
+            self.tree_cache.popitem(last=False)
+        return tree
+
+    async def graphql(self, query: str, variables: Optional[Dict] = None) -> Dict[str, Any]:
+        """Run a query against the GitHub GraphQL API and return its data"""
+        response = await self.send(
+            "POST",
+            GITHUB_GRAPHQL_ENDPOINT,
+            json={"query": query, "variables": variables or {}}
+        )
+        response.raise_for_status()
+        payload = response.json()
+        if payload.get("data") is None:
+            raise GraphQLError(payload.get("errors") or "empty GraphQL response")
+        return payload["data"]
+
+    async def scan_org(self, org: str, repos: Optional[List[str]] = None, include_members: bool = True,
+                       max_branches: int = 100, max_items: int = GITHUB_MAX_ITEMS) -> Dict[str, Any]:
+        """Repositories, default branches, branch lists and members of an org
+
+        Uses one GraphQL query per chunk of repositories and falls back to one
+        REST call per repository when GraphQL is not available.
+        """
+        max_branches = max(1, min(max_branches, 100))
+        start_count = self.request_count
+        result = None
+        if self.graphql_enabled:
+            try:
+                result = await self._scan_org_graphql(org, repos, include_members, max_branches, max_items)
+                result["backend"] = "graphql"
+            except (httpx.HTTPStatusError, GraphQLError) as e:
+                print(f"GraphQL failed, falling back to REST: {e}", file=sys.stderr)
+                # Only an endpoint that does not exist turns GraphQL off for good;
+                # server errors, auth errors and query errors fall back for this call
+                if graphql_missing(e):
+                    self.graphql_enabled = False
+        if result is None:
+            result = await self._scan_org_rest(org, repos, include_members, max_branches, max_items)
+            result["backend"] = "rest"
+        result["requests"] = self.request_count - start_count
+        return result
+
+    async def _scan_org_graphql(self, org: str, repos: Optional[List[str]], include_members: bool,
+                                max_branches: int, max_items: int) -> Dict[str, Any]:
+        repositories = []
+        if repos is None:
+            cursor = None
+            while len(repositories) < max_items:
+                data = await self.graphql(ORG_REPOS_QUERY, {
+                    "org": org,
+                    "first": GITHUB_GRAPHQL_CHUNK_SIZE,
+                    "after": cursor,
+                    "branches": max_branches
+                })
+                if not data.get("organization"):
+                    raise GraphQLError(f"organization {org} not found")
+                connection = data["organization"]["repositories"]
+                repositories.extend(graphql_repo_summary(node) for node in connection["nodes"] if node)
+                if not connection["pageInfo"]["hasNextPage"]:
+                    break
+                cursor = connection["pageInfo"]["endCursor"]
+        else:
+            repos = repos[:max_items]
+            for start in range(0, len(repos), GITHUB_GRAPHQL_CHUNK_SIZE):
+                chunk = repos[start:start + GITHUB_GRAPHQL_CHUNK_SIZE]
+                query, variables = build_repos_batch_query(org, chunk, max_branches)
+                data = await self.graphql(query, variables)
+                for i, name in enumerate(chunk):
+                    node = data.get(f"r{i}")
+                    repositories.append(graphql_repo_summary(node) if node else {"name": name, "error": "not found"})
+
+        members = []
+        if include_members:
+            cursor = None
+            while len(members) < max_items:
+                data = await self.graphql(ORG_MEMBERS_QUERY, {"org": org, "after": cursor})
+                if not data.get("organization"):
+                    raise GraphQLError(f"organization {org} not found")
+                connection = data["organization"]["membersWithRole"]
+                members.extend(node["login"] for node in connection["nodes"] if node)
+                if not connection["pageInfo"]["hasNextPage"]:
+                    break
+                cursor = connection["pageInfo"]["endCursor"]
+
+        return {
+            "organization": org,
+            "repositories": repositories[:max_items],
+            "members": members[:max_items] if include_members else None
+        }
+
+    async def _scan_org_rest(self, org: str, repos: Optional[List[str]], include_members: bool,
+                             max_branches: int, max_items: int) -> Dict[str, Any]:
+        if repos is None:
+            repos_data, _ = await self.get_all_pages(f"/orgs/{org}/repos", {"per_page": 100}, max_items)
+            targets = [(repo.get("name"), repo.get("default_branch")) for repo in repos_data]
+        else:
+            targets = [(name, None) for name in repos[:max_items]]
+
+        semaphore = asyncio.Semaphore(max(GITHUB_PAGE_CONCURRENCY, 1))
+
+        async def repo_branches(name: str, default_branch: Optional[str]) -> Dict[str, Any]:
+            async with semaphore:
+                try:
+                    branches = await self.make_request(f"/repos/{org}/{name}/branches", {"per_page": max_branches})
+                except httpx.HTTPStatusError as e:
+                    return {"name": name, "error": str(e)}
+            return {
+                "name": name,
+                "default_branch": default_branch,
+                "branches": [branch.get("name") for branch in branches],
+                "branches_truncated": len(branches) >= max_branches
+            }
+
+        repositories = await asyncio.gather(*(repo_branches(name, branch) for name, branch in targets))
+
+        members = None
+        if include_members:
+            members_data, _ = await self.get_all_pages(f"/orgs/{org}/members", {"per_page": 100}, max_items)
+            members = [member.get("login") for member in members_data]
+
+        return {"organization": org, "repositories": list(repositories), "members": members}
+
+    async def aclose(self):
+        """Close the pooled client and its open connections"""
+        if self.cache is not None:
+            self.cache.save()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+
+def build_repos_batch_query(org: str, repos: List[str], max_branches: int) -> Tuple[str, Dict[str, Any]]:
+    """One GraphQL query with an aliased repository() field per repo"""
+    variable_defs = ["$org: String!", "$branches: Int!"]
+    fields = []
+    variables: Dict[str, Any] = {"org": org, "branches": max_branches}
+    for i, name in enumerate(repos):
+        variable_defs.append(f"$r{i}: String!")
+        fields.append(f"  r{i}: repository(owner: $org, name: $r{i}) {{ ...RepoBranches }}")
+        variables[f"r{i}"] = name
+    query = f"query({', '.join(variable_defs)}) {{\n" + "\n".join(fields) + "\n}\n" + REPO_BRANCHES_FRAGMENT
+    return query, variables
+
+
+def graphql_repo_summary(node: Dict[str, Any]) -> Dict[str, Any]:
+    refs = node.get("refs") or {"nodes": [], "totalCount": 0}
+    branches = [ref["name"] for ref in refs["nodes"]]
+    return {
+        "name": node.get("name"),
+        "default_branch": (node.get("defaultBranchRef") or {}).get("name"),
+        "branches": branches,
+        "branches_truncated": refs["totalCount"] > len(branches)
+    }
+
+
+def parse_link_header(link: Optional[str]) -> Dict[str, str]:
+    """Parse a GitHub Link header into {rel: url}"""
+    links = {}
+    for part in (link or "").split(","):
+        if ";" not in part:
+            continue
+        url, _, rel = part.partition(";")
+        rel = rel.strip()
+        if rel.startswith('rel="') and rel.endswith('"'):
+            links[rel[5:-1]] = url.strip().strip("<>")
+    return links
+
+
+def page_number(url: Optional[str]) -> Optional[int]:
+    """Return the page query param of a pagination link"""
+    if not url:
+        return None
+    page = parse_qs(urlparse(url).query).get("page")
+    return int(page[0]) if page else None
 
 # Initialize GitHub API with token
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN", "")
 GITHUB_TOKEN = ""
-github_api = GitHubAPI(GITHUB_TOKEN)
+github_api = GitHubAPI(
+    GITHUB_TOKEN,
+    cache=ResponseCache(GITHUB_CACHE_MAX_ENTRIES, GITHUB_CACHE_FILE) if GITHUB_CACHE_ENABLED else None,
+    blob_store=BlobStore(GITHUB_BLOB_CACHE_DIR, GITHUB_BLOB_CACHE_MAX_MB * 1024 * 1024) if GITHUB_BLOB_CACHE_ENABLED else None,
+    scheduler=RateLimitScheduler(
+        max_wait=GITHUB_RATE_LIMIT_MAX_WAIT,
+        max_retries=GITHUB_RATE_LIMIT_MAX_RETRIES
+    ) if GITHUB_RATE_LIMIT_ENABLED else None,
+    transport=CassetteTransport(
+        GITHUB_CASSETTE,
+        mode=GITHUB_CASSETTE_MODE,
+        latency=GITHUB_CASSETTE_LATENCY if GITHUB_CASSETTE_LATENCY == "recorded" else float(GITHUB_CASSETTE_LATENCY),
+        http2=_http2_available() and GITHUB_HTTP2,
+        limits=httpx.Limits(max_connections=GITHUB_MAX_CONNECTIONS,
+                            max_keepalive_connections=GITHUB_MAX_KEEPALIVE_CONNECTIONS,
+                            keepalive_expiry=GITHUB_KEEPALIVE_EXPIRY)
+    ) if GITHUB_CASSETTE else None
+)
+
+
+@asynccontextmanager
+async def github_lifespan(server: FastMCP):
+    """Keep one HTTP client for the server's lifetime and close it on shutdown"""
+    try:
+        yield
+    finally:
+        await github_api.aclose()
+
+# Initialize FastMCP server
+mcp = FastMCP("GitHub", lifespan=github_lifespan)
 
 @mcp.tool()
 async def get_authenticated_user() -> str:
@@ -173,7 +665,7 @@ async def list_user_organizations(username: Optional[str] = None) -> str:
 
 
 @mcp.tool()
-async def list_org_repos(org: str, type: str = "all", sort: str = "created", direction: str = "desc", per_page: int = 30, page: int = 1) -> str:
+async def list_org_repos(org: str, type: str = "all", sort: str = "created", direction: str = "desc", per_page: int = 30, page: int = 1, all_pages: bool = False, max_items: int = GITHUB_MAX_ITEMS) -> str:
     """List repositories in an organization
     
     Args:
@@ -183,6 +675,8 @@ async def list_org_repos(org: str, type: str = "all", sort: str = "created", dir
         direction: Sort direction (asc, desc)
         per_page: Results per page (max 100)
         page: Page number
+        all_pages: Fetch every page at once (ignores per_page/page)
+        max_items: Maximum repositories returned when all_pages is set
     """
     try:
         endpoint = f"/orgs/{org}/repos"
@@ -194,7 +688,12 @@ async def list_org_repos(org: str, type: str = "all", sort: str = "created", dir
             "page": max(page, 1)
         }
         
-        repos_data = await github_api.make_request(endpoint, params)
+        truncated = False
+        if all_pages:
+            params["per_page"] = 100
+            repos_data, truncated = await github_api.get_all_pages(endpoint, params, max_items)
+        else:
+            repos_data = await github_api.make_request(endpoint, params)
         
         repos_summary = []
         for repo in repos_data:
@@ -229,14 +728,31 @@ async def list_org_repos(org: str, type: str = "all", sort: str = "created", dir
             "type_filter": type,
             "sort": sort,
             "direction": direction,
-            "page": page,
-            "per_page": per_page,
+            "page": "all" if all_pages else page,
+            "per_page": params["per_page"],
             "total_repos_on_page": len(repos_summary),
+            "truncated": truncated,
             "repositories": repos_summary
         }, indent=2)
     except Exception as e:
         print("Error",e)
 
+def file_contents_json(org: str, repo: str, path: str, name: str, size: Optional[int], raw: bytes) -> str:
+    try:
+        file_content = raw.decode('utf-8')
+    except UnicodeDecodeError:
+        file_content = "[Binary file - cannot display as text]"
+
+    return json.dumps({
+        "repository": f"{org}/{repo}",
+        "type": "file",
+        "path": path,
+        "name": name,
+        "size": size,
+        "content": file_content
+    }, indent=2)
+
+
 @mcp.tool()
 async def get_org_file_contents(org: str, repo: str, path: str = "", ref: str = "main") -> str:
     """
@@ -249,6 +765,13 @@ async def get_org_file_contents(org: str, repo: str, path: str = "", ref: str =
         ref: Branch or commit reference (default: 'main')
     """
     try:
+        # Blob SHA already known from a cached tree: no contents request needed
+        if path:
+            entry = github_api.cached_tree_entry(org, repo, ref, path)
+            if entry and entry.get("type") == "blob":
+                raw = await github_api.get_blob(org, repo, entry["sha"])
+                return file_contents_json(org, repo, entry["path"], entry["path"].rsplit("/", 1)[-1], entry.get("size"), raw)
+
         # Build endpoint
         if path:
             endpoint = f"/repos/{org}/{repo}/contents/{path}"
@@ -260,23 +783,21 @@ async def get_org_file_contents(org: str, repo: str, path: str = "", ref: str =
         
         # Handle single file
         if isinstance(content_data, dict):
-            # Decode file content if it's base64 encoded
-            file_content = ""
+            sha = content_data.get("sha")
+            raw = b""
             if content_data.get("content") and content_data.get("encoding") == "base64":
-                import base64
-                try:
-                    file_content = base64.b64decode(content_data.get("content")).decode('utf-8')
-                except:
-                    file_content = "[Binary file - cannot display as text]"
-            
-            return json.dumps({
-                "repository": f"{org}/{repo}",
-                "type": "file",
-                "path": content_data.get("path"),
-                "name": content_data.get("name"),
-                "size": content_data.get("size"),
-                "content": file_content
-            }, indent=2)
+                # Skip the base64 decode when this blob is already stored
+                store = github_api.blob_store
+                raw = store.get(sha) if store is not None and sha else None
+                if raw is None:
+                    raw = base64.b64decode(content_data.get("content"))
+                    if store is not None and sha:
+                        store.put(sha, raw)
+            elif sha and content_data.get("type") == "file":
+                # Files over 1 MB come without inline content; fetch them raw
+                raw = await github_api.get_blob(org, repo, sha)
+
+            return file_contents_json(org, repo, content_data.get("path"), content_data.get("name"), content_data.get("size"), raw)
         
         # Handle directory listing
         else:
@@ -321,7 +842,62 @@ async def get_org_file_contents(org: str, repo: str, path: str = "", ref: str =
 
 
 @mcp.tool()
-async def list_org_repos_branches(org: str,repo:str, type: str = "all", sort: str = "created", direction: str = "desc", per_page: int = 30, page: int = 1) -> str:
+async def get_repo_tree(org: str, repo: str, ref: str = "main", path: str = "", pattern: str = "", max_depth: int = 0, max_items: int = GITHUB_MAX_ITEMS) -> str:
+    """
+    Get the full file/directory index of a repository in one request (recursive git tree)
+    
+    Args:
+        org: Organization name
+        repo: Repository name
+        ref: Branch, tag or commit SHA (default: 'main')
+        path: Only include entries under this directory (e.g., 'src')
+        pattern: Glob filter on the entry path (e.g., '*.py', 'src/**/test_*')
+        max_depth: Maximum depth below path (0 for unlimited)
+        max_items: Maximum entries returned
+    """
+    try:
+        tree = await github_api.get_tree(org, repo, ref)
+
+        prefix = path.strip("/")
+        entries = []
+        for item in tree.get("tree", []):
+            item_path = item.get("path", "")
+            if prefix:
+                if not item_path.startswith(prefix + "/"):
+                    continue
+                relative = item_path[len(prefix) + 1:]
+            else:
+                relative = item_path
+            if max_depth > 0 and relative.count("/") >= max_depth:
+                continue
+            if pattern and not fnmatch.fnmatch(item_path, pattern):
+                continue
+            entries.append({
+                "path": item_path,
+                "type": item.get("type"),
+                "size": item.get("size"),
+                "sha": item.get("sha")
+            })
+
+        return json.dumps({
+            "repository": f"{org}/{repo}",
+            "ref": ref,
+            "sha": tree.get("sha"),
+            "path": prefix or "/",
+            "total_matches": len(entries),
+            "truncated": bool(tree.get("truncated")) or len(entries) > max_items,
+            "entries": entries[:max_items]
+        }, indent=2)
+
+    except Exception as e:
+        return json.dumps({
+            "error": f"Failed to get tree for {org}/{repo}@{ref}",
+            "message": str(e)
+        }, indent=2)
+
+
+@mcp.tool()
+async def list_org_repos_branches(org: str,repo:str, type: str = "all", sort: str = "created", direction: str = "desc", per_page: int = 30, page: int = 1, all_pages: bool = False, max_items: int = GITHUB_MAX_ITEMS) -> str:
     """List repositories in an organization
     
     Args:
@@ -331,6 +907,8 @@ async def list_org_repos_branches(org: str,repo:str, type: str = "all", sort: st
         direction: Sort direction (asc, desc)
         per_page: Results per page (max 100)
         page: Page number
+        all_pages: Fetch every page at once (ignores per_page/page)
+        max_items: Maximum branches returned when all_pages is set
     """
     try:
         
@@ -343,7 +921,11 @@ async def list_org_repos_branches(org: str,repo:str, type: str = "all", sort: st
             "page": max(page, 1)
         }
         
-        repos_data = await github_api.make_request(endpoint, params)
+        if all_pages:
+            params["per_page"] = 100
+            repos_data, _ = await github_api.get_all_pages(endpoint, params, max_items)
+        else:
+            repos_data = await github_api.make_request(endpoint, params)
         
         repos_summary = []
         for repo in repos_data:
@@ -371,7 +953,7 @@ async def list_org_repos_branches(org: str,repo:str, type: str = "all", sort: st
 
 
 @mcp.tool()
-async def get_org_members(org: str, filter: str = "all", role: str = "all", per_page: int = 30, page: int = 1) -> str:
+async def get_org_members(org: str, filter: str = "all", role: str = "all", per_page: int = 30, page: int = 1, all_pages: bool = False, max_items: int = GITHUB_MAX_ITEMS) -> str:
     """Get members of an organization with filtering options
     
     Args:
@@ -380,6 +962,8 @@ async def get_org_members(org: str, filter: str = "all", role: str = "all", per_
         role: Filter by role (all, admin, member) 
         per_page: Results per page (max 100)
         page: Page number
+        all_pages: Fetch every page at once (ignores per_page/page)
+        max_items: Maximum members returned when all_pages is set
     """
     try:
         endpoint = f"/orgs/{org}/members"
@@ -390,7 +974,12 @@ async def get_org_members(org: str, filter: str = "all", role: str = "all", per_
             "page": max(page, 1)
         }
         
-        members_data = await github_api.make_request(endpoint, params)
+        truncated = False
+        if all_pages:
+            params["per_page"] = 100
+            members_data, truncated = await github_api.get_all_pages(endpoint, params, max_items)
+        else:
+            members_data = await github_api.make_request(endpoint, params)
         
         members_summary = []
         for member in members_data:
@@ -409,9 +998,10 @@ async def get_org_members(org: str, filter: str = "all", role: str = "all", per_
             "organization": org,
             "filter_applied": filter,
             "role_filter": role,
-            "page": page,
-            "per_page": per_page,
+            "page": "all" if all_pages else page,
+            "per_page": params["per_page"],
             "total_members_on_page": len(members_summary),
+            "truncated": truncated,
             "members": members_summary
         }, indent=2)
         
@@ -459,6 +1049,42 @@ async def search_repositories(query: str, sort: str = "stars", order: str = "des
     
 
 
+@mcp.tool()
+async def scan_org(org: str, repos: Optional[List[str]] = None, include_members: bool = True, max_branches: int = 100) -> str:
+    """Scan an organization: repositories, default branches, branches and members in a few batched calls
+    
+    Args:
+        org: Organization name
+        repos: Only scan these repository names (all repositories if omitted)
+        include_members: Also list organization members
+        max_branches: Maximum branches listed per repository (max 100)
+    """
+    try:
+        result = await github_api.scan_org(org, repos, include_members, max_branches)
+        return json.dumps(result, indent=2)
+    except Exception as e:
+        return f"Error scanning organization {org}: {str(e)}"
+
+
+@mcp.tool()
+async def get_rate_limit_status() -> str:
+    """Get the GitHub rate limit budget, queue depth and throttling counters per resource (core, search, graphql)"""
+    if github_api.scheduler is None:
+        return json.dumps({"enabled": False}, indent=2)
+    return json.dumps({"enabled": True, "resources": github_api.scheduler.stats()}, indent=2)
+
+
+@mcp.tool()
+async def get_cache_stats() -> str:
+    """Get hit/miss counters of the GitHub response (ETag) cache and the file blob store"""
+    stats = {"response_cache": {"enabled": False}, "blob_store": {"enabled": False}}
+    if github_api.cache is not None:
+        stats["response_cache"] = {"enabled": True, **github_api.cache.stats()}
+    if github_api.blob_store is not None:
+        stats["blob_store"] = {"enabled": True, **github_api.blob_store.stats()}
+    return json.dumps(stats, indent=2)
+
+
 # @mcp.tool()
 # async def get_user_followers(username: Optional[str] = None, per_page: int = 30) -> str:
 #     """Get followers for a user (authenticated user if no username provided)"""
@@ -551,9 +1177,122 @@ async def test_tools():
 
     print("\n Get Username repos")
 
+    await github_api.aclose()
+
+
+def start_stub_server(port: int = 0):
+    """Start a local keep-alive HTTP server that answers every GET with a small JSON body"""
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            body = json.dumps([{"login": "stub", "name": "stub-repo"}]).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _percentiles(latencies: List[float]) -> Dict[str, float]:
+    latencies = sorted(latencies)
+    return {
+        "p50_ms": round(latencies[len(latencies) // 2], 2),
+        "p99_ms": round(latencies[int(0.99 * (len(latencies) - 1))], 2)
+    }
+
+
+async def benchmark_pooling(calls: int = 100):
+    """Compare per-call clients against the pooled client on a local stub server"""
+    import logging
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    server = start_stub_server()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    api = GitHubAPI("stub", base_url=base_url)
+
+    async def per_call_client():
+        # Previous behaviour: a fresh AsyncClient (and connection) for every request
+        async with httpx.AsyncClient(base_url=base_url, headers=api.headers) as client:
+            response = await client.get("/orgs/stub/repos")
+            response.raise_for_status()
+            return response.json()
+
+    async def pooled_client():
+        return await api.make_request("/orgs/stub/repos")
+
+    async def run(call, concurrent: bool) -> Dict[str, float]:
+        latencies = []
+
+        async def timed():
+            start = time.perf_counter()
+            await call()
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        if concurrent:
+            await asyncio.gather(*(timed() for _ in range(calls)))
+        else:
+            for _ in range(calls):
+                await timed()
+        return _percentiles(latencies)
+
+    results = {}
+    try:
+        for mode in ("sequential", "concurrent"):
+            results[mode] = {
+                "per_call_client": await run(per_call_client, mode == "concurrent"),
+                "pooled_client": await run(pooled_client, mode == "concurrent")
+            }
+    finally:
+        await api.aclose()
+        server.shutdown()
+
+    print(json.dumps({"calls": calls, "results": results}, indent=2))
+    return results
+
 
+async def benchmark_cassette(rounds: int = 5):
+    """Record tool calls against the local stub server, stop it, and replay them offline"""
+    import logging
+    import tempfile
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    server = start_stub_server()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    path = os.path.join(tempfile.mkdtemp(), "github_cassette.json")
+    endpoints = ["/user", "/user/orgs", "/orgs/stub/repos", "/repos/stub/stub-repo/branches", "/orgs/stub/members"]
 
+    async def session(transport: CassetteTransport) -> Tuple[List[Any], float]:
+        api = GitHubAPI("stub", base_url=base_url, transport=transport)
+        start = time.perf_counter()
+        try:
+            results = [await api.make_request(endpoint) for _ in range(rounds) for endpoint in endpoints]
+        finally:
+            await api.aclose()
+        return results, time.perf_counter() - start
 
+    recording = CassetteTransport(path, mode="record")
+    recorded, seconds = await session(recording)
+    server.shutdown()
+    server.server_close()
+    print(f"{len(recorded)} GitHub requests recorded to {path} ({len(recording.cassette.interactions)} exchanges)")
+    print(f"  {'record (stub server)':26} {seconds * 1000:7.1f} ms")
+    for latency in ("recorded", 0.02, 0.0):
+        replaying = CassetteTransport(path, mode="replay", latency=latency)
+        replayed, seconds = await session(replaying)
+        print(f"  replay offline latency={latency!s:9} {seconds * 1000:7.1f} ms"
+              f"  identical results: {replayed == recorded}")
+        assert replayed == recorded
 
 
 if __name__ == "__main__":
@@ -562,6 +1301,12 @@ if __name__ == "__main__":
     if len(sys.argv) > 1 and sys.argv[1] == "test":
         # Run tests
         asyncio.run(test_tools())
+    elif len(sys.argv) > 1 and sys.argv[1] == "bench":
+        # Benchmark HTTP client pooling against a local stub server
+        asyncio.run(benchmark_pooling())
+    elif len(sys.argv) > 1 and sys.argv[1] == "cassette-bench":
+        # Record/replay round trip; the replay runs with the server stopped
+        asyncio.run(benchmark_cassette())
     else:
         # Run as MCP server
         mcp.run(transport="stdio")
\ No newline at end of file
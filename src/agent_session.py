@@ -0,0 +1,69 @@
+import json
+import time
+from tool_execution import ToolCallLimiter, build_agent
+from tool_selection import TOOL_SUBSET, ToolSelector
+
+
+GIT_AGENT_PROMPT = "Your are a Git Agent which does takes for Git Actions if your asks give about me use get_me tool first gather user info "
+
+
+class AgentSession:
+    """MCP tools and the compiled ReAct graph for one chat session
+
+    Listing MCP tools and compiling the LangGraph graph is done once and reused
+    for every turn. The graph is rebuilt when invalidate() is called or when the
+    MCP client's server configuration changes.
+    """
+
+    def __init__(self, model, client, prompt=GIT_AGENT_PROMPT, extra_tools=(), limiter=None, tool_subset=TOOL_SUBSET):
+        self.model = model
+        self.client = client
+        self.prompt = prompt
+        # Cap and timeouts for the tool calls of one agent step, which run concurrently
+        self.limiter = limiter or ToolCallLimiter()
+        # Local (non-MCP) tools given to the agent alongside the MCP tools
+        self.extra_tools = list(extra_tools)
+        # Bind only the tools relevant to each turn (see tool_selection)
+        self.tool_subset = tool_subset
+        self.selector = None
+        self.tools = None
+        self.graph = None
+        self._servers = None
+        self.build_seconds = 0.0
+        self.builds = 0
+        self.turn_timings = []
+
+    def servers_fingerprint(self):
+        """Snapshot of the MCP server configuration the tools were loaded from"""
+        return json.dumps(getattr(self.client, "connections", None), sort_keys=True, default=str)
+
+    def invalidate(self, client=None):
+        """Drop the cached tools and graph, optionally switching to a new MCP client"""
+        if client is not None:
+            self.client = client
+        self.tools = None
+        self.graph = None
+        self._servers = None
+
+    async def get_graph(self):
+        """Return the compiled agent graph, building it on first use"""
+        servers = self.servers_fingerprint()
+        if self.graph is not None and servers != self._servers:
+            self.invalidate()
+        if self.graph is None:
+            start = time.perf_counter()
+            self.tools = [*await self.client.get_tools(), *self.extra_tools]
+            self.selector = ToolSelector(self.tools, enabled=self.tool_subset)
+            self.graph = build_agent(self.model, self.tools, self.prompt, self.limiter, self.selector)
+            self._servers = servers
+            self.build_seconds = time.perf_counter() - start
+            self.builds += 1
+        return self.graph
+
+    def record_turn(self, first_token_seconds, total_seconds):
+        """Keep per-turn time-to-first-token and total time"""
+        self.turn_timings.append({
+            "first_token": round(first_token_seconds, 3) if first_token_seconds is not None else None,
+            "total": round(total_seconds, 3)
+        })
+        return self.turn_timings[-1]
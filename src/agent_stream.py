@@ -0,0 +1,109 @@
+import json
+import time
+from conversation_memory import count_tokens
+from prompt_cache import cache_usage
+from tracing import llm_callback, tracer
+
+# Token-level streaming of an agent turn. The graph is streamed in three modes
+# at once: "messages" for model tokens as they are generated, "updates" for the
+# finished agent/tool messages, and "custom" for the tool start/finish events
+# that ToolCallLimiter writes.
+
+
+class ToolProgress(str):
+    """Tool progress line: shown to the user but not part of the answer text"""
+
+
+def content_text(content):
+    """Text of a message (chunk) content: a string, or the text blocks of a content list"""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(
+            block.get("text", "") if isinstance(block, dict) and block.get("type") == "text" else
+            block if isinstance(block, str) else ""
+            for block in content
+        )
+    return ""
+
+
+def _args_preview(args, limit=80):
+    text = ", ".join(f"{key}={json.dumps(value, default=str)}" for key, value in (args or {}).items())
+    return text if len(text) <= limit else text[:limit] + "…"
+
+
+async def stream_agent(graph, messages, recorder=None, stats=None):
+    """Yield answer text as tokens arrive and ToolProgress lines as tools run.
+
+    `recorder` (a list) receives the turn's complete agent and tool messages.
+    `stats` (a dict) is filled with time to first token, output tokens,
+    tokens per second and cached/uncached input tokens once the stream ends.
+    """
+    stats = stats if stats is not None else {}
+    start = time.perf_counter()
+    first_token_at = None
+    # First/last token time per model call, so tool time between calls is not
+    # counted as generation time
+    spans = {}
+    usage_tokens = 0
+    input_usage = {}
+    text = []
+    tools = {}
+    announced = set()
+
+    # llm_call spans, nested under the current (turn) span
+    config = {"callbacks": [llm_callback()]} if tracer.enabled else None
+    async for mode, payload in graph.astream({"messages": messages}, config, stream_mode=["messages", "updates", "custom"]):
+        if mode == "messages":
+            chunk, metadata = payload
+            if metadata.get("langgraph_node") != "agent":
+                continue
+            usage = getattr(chunk, "usage_metadata", None)
+            if usage:
+                usage_tokens += usage.get("output_tokens", 0)
+                for key, value in cache_usage(usage).items():
+                    input_usage[key] = input_usage.get(key, 0) + value
+            piece = content_text(chunk.content)
+            if piece:
+                now = time.perf_counter()
+                if first_token_at is None:
+                    first_token_at = now
+                spans.setdefault(getattr(chunk, "id", None), [now, now])[1] = now
+                text.append(piece)
+                yield piece
+
+        elif mode == "custom" and isinstance(payload, dict) and "tool" in payload:
+            call_id = payload.get("id")
+            if payload["status"] == "start":
+                announced.add(call_id)
+                yield ToolProgress(f"\n🔧 {payload['tool']}({_args_preview(payload.get('args'))}) …\n")
+            else:
+                tools[call_id] = {"tool": payload["tool"], "status": payload["status"],
+                                  "seconds": payload.get("seconds")}
+                yield ToolProgress(f"🔧 {payload['tool']} {payload['status']} in {payload.get('seconds', 0):.2f}s\n")
+
+        elif mode == "updates":
+            for node, update in payload.items():
+                node_messages = update.get("messages", []) if isinstance(update, dict) else []
+                if recorder is not None:
+                    recorder.extend(node_messages)
+                if node != "tools":
+                    continue
+                for message in node_messages:
+                    # Tool nodes without ToolCallLimiter send no progress events
+                    if getattr(message, "tool_call_id", None) not in announced:
+                        preview = content_text(message.content).strip().splitlines()[:1]
+                        yield ToolProgress(f"\n🔧 {getattr(message, 'name', '')} {preview[0][:200] if preview else ''}\n")
+
+    total = time.perf_counter() - start
+    output_tokens = usage_tokens or count_tokens("".join(text))
+    generating = sum(last - first for first, last in spans.values())
+    stats.update({
+        "first_token": round(first_token_at - start, 3) if first_token_at is not None else None,
+        "total": round(total, 3),
+        "output_tokens": output_tokens,
+        "tokens_per_second": round(output_tokens / generating, 1) if generating > 0 else None,
+        "tools": list(tools.values()),
+        # Summed over the turn's model calls; empty if the provider reports no usage
+        **input_usage
+    })
@@ -0,0 +1,318 @@
+import asyncio
+import hashlib
+import json
+import math
+import os
+import re
+import sys
+import time
+from collections import Counter, OrderedDict
+from query_text import STOPWORDS, words
+from tool_policy import is_read_only
+
+# Cache of final answers to repeated questions ("list my orgs", "what branches
+# does X have"). A hit skips the whole agent loop. Answers that came from tool
+# calls are only reused after the same calls, re-run, return the same results:
+# that check costs one round of tool calls (conditional requests, for the
+# GitHub server) instead of two or more model calls.
+
+ANSWER_CACHE_MODE = os.getenv("VOICEGIT_ANSWER_CACHE", "off")  # off, exact or semantic
+ANSWER_CACHE_TTL = float(os.getenv("VOICEGIT_ANSWER_CACHE_TTL", "600"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("VOICEGIT_ANSWER_CACHE_MAX_ENTRIES", "200"))
+# Seconds the re-run tool calls of a cached answer may take before the lookup gives up
+ANSWER_CACHE_REVALIDATE_TIMEOUT = float(os.getenv("VOICEGIT_ANSWER_CACHE_REVALIDATE_TIMEOUT", "10"))
+
+SYNONYMS = {"show": "list", "display": "list", "get": "list", "fetch": "list", "see": "list",
+            "organizations": "orgs", "organization": "org", "organisations": "orgs", "organisation": "org",
+            "repositories": "repos", "repository": "repo", "branch": "branches",
+            "people": "members", "users": "members", "commit": "commits", "pull": "prs", "requests": "prs",
+            "pr": "prs"}
+# Words a query can contain without naming a specific repo, org, branch, ...
+VOCABULARY = STOPWORDS | set(SYNONYMS) | set(SYNONYMS.values()) | {
+    "my", "list", "repos", "orgs", "org", "branches", "members", "commits", "files", "tree", "status",
+    "diff", "log", "latest", "recent", "last", "who", "how", "many", "owns", "owner", "changed", "since",
+    "with", "and", "or", "by", "from", "current", "open", "closed", "readme", "main", "default", "rate",
+    "limit", "stats", "cache", "me", "mine", "our", "team"}
+
+# Words that refer back to an earlier turn ("list its branches"); such a
+# question is only the same question after the same previous turn
+REFERRING = {"it", "its", "they", "them", "their", "that", "those", "this", "these", "there", "here", "same",
+             "above", "previous", "he", "she", "his", "her", "one", "ones", "else"}
+
+
+def tokens(query):
+    return [SYNONYMS.get(word, word) for word in words(query)]
+
+
+def normalize(query):
+    """Canonical form: synonyms folded, filler words dropped. Word order is kept,
+    it carries direction ("diff from main to dev", "is dev ahead of main")"""
+    return " ".join(word for word in tokens(query) if word not in STOPWORDS)
+
+
+def entities(query):
+    """Words naming something specific (repo, org, branch, sha), in order: must match for a semantic hit"""
+    return tuple(word for word in tokens(query) if word not in VOCABULARY - {"main", "default"})
+
+
+def refers_back(query):
+    return any(word in REFERRING for word in tokens(query))
+
+
+def embed(query):
+    """Local character-trigram vector of the normalised query"""
+    text = f" {normalize(query)} "
+    return Counter(text[i:i + 3] for i in range(len(text) - 2))
+
+
+def cosine(a, b):
+    dot = sum(count * b.get(gram, 0) for gram, count in a.items())
+    norm = math.sqrt(sum(v * v for v in a.values())) * math.sqrt(sum(v * v for v in b.values()))
+    return dot / norm if norm else 0.0
+
+
+def result_text(result):
+    """Comparable text of a tool result: content blocks joined, per-call ids and page handles removed"""
+    if isinstance(result, list):
+        result = "\n".join(item.get("text", "") if isinstance(item, dict) else str(item) for item in result)
+    return re.sub(r"handle='r\d+'", "handle", str(result))
+
+
+def digest(results):
+    return hashlib.sha256("\0".join(result_text(result) for result in results).encode()).hexdigest()
+
+
+def repo_state(repo_path="."):
+    """Fingerprint of the local repository: HEAD commit and index modification time"""
+    import subprocess
+
+    result = subprocess.run(["git", "rev-parse", "HEAD", "--git-path", "index"],
+                            cwd=repo_path, capture_output=True, text=True)
+    if result.returncode != 0:
+        return os.path.abspath(repo_path)
+    head, index = (result.stdout.splitlines() + ["", ""])[:2]
+    try:
+        index_mtime = os.stat(os.path.join(repo_path, index)).st_mtime_ns
+    except OSError:
+        index_mtime = 0
+    return f"{os.path.abspath(repo_path)}@{head}:{index_mtime}"
+
+
+class AnswerCache:
+    """TTL + LRU cache of answers keyed on the normalised query and a state fingerprint.
+
+    mode 'exact' matches queries with the same normalised form; 'semantic'
+    also accepts the most similar cached query above `threshold` when both
+    name the same entities in the same order. `fingerprint` is an optional
+    callable returning the state the answers depend on (e.g. the local
+    repository's HEAD). `context` (the previous turn) is part of the key of
+    questions that refer back to it. Re-running the tool calls of a cached
+    answer is bounded by `revalidate_timeout`; a lookup that runs out of time
+    is a miss and the agent answers instead.
+    """
+
+    def __init__(self, mode=ANSWER_CACHE_MODE, ttl=ANSWER_CACHE_TTL, max_entries=ANSWER_CACHE_MAX_ENTRIES,
+                 threshold=0.85, fingerprint=None, clock=time.monotonic,
+                 revalidate_timeout=ANSWER_CACHE_REVALIDATE_TIMEOUT):
+        self.mode = mode
+        self.revalidate_timeout = revalidate_timeout
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.fingerprint = fingerprint
+        self.clock = clock
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.timeouts = 0
+        self.saved_seconds = 0.0
+
+    @property
+    def enabled(self):
+        return self.mode in ("exact", "semantic")
+
+    def _key(self, query, context=""):
+        state = self.fingerprint() if self.fingerprint else ""
+        context = hashlib.sha256(context.encode()).hexdigest()[:16] if context and refers_back(query) else ""
+        return state, context, normalize(query)
+
+    def _find(self, query, context=""):
+        key = self._key(query, context)
+        entry = self._entries.get(key)
+        if entry is None and self.mode == "semantic":
+            wanted, vector = entities(query), embed(query)
+            best = 0.0
+            for candidate_key, candidate in self._entries.items():
+                if candidate_key[:2] != key[:2] or candidate["entities"] != wanted:
+                    continue
+                score = cosine(vector, candidate["vector"])
+                if score >= self.threshold and score > best:
+                    entry, best = candidate, score
+        if entry is not None and self.clock() - entry["created"] > self.ttl:
+            self._entries.pop(entry["key"], None)
+            entry = None
+        return entry
+
+    async def lookup(self, query, tools=None, context=""):
+        """Cached answer for query, or None.
+
+        `tools` maps tool names to LangChain tools (anything with ainvoke) and is
+        used to re-run the recorded tool calls; without it, answers that needed
+        tools are not reused.
+        """
+        if not self.enabled:
+            return None
+        entry = self._find(query, context)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry["plan"]:
+            if tools is None or any(call["name"] not in tools for call in entry["plan"]):
+                self.misses += 1
+                return None
+            start = time.perf_counter()
+            try:
+                results = await asyncio.wait_for(
+                    asyncio.gather(*(tools[call["name"]].ainvoke(call["args"]) for call in entry["plan"])),
+                    self.revalidate_timeout
+                )
+            except asyncio.TimeoutError:
+                # Unknown whether the data changed: answer through the agent, keep the entry
+                self.timeouts += 1
+                self.misses += 1
+                return None
+            except Exception:
+                results = None
+            if results is None or digest(results) != entry["results"]:
+                # The data changed since the answer was given
+                self._entries.pop(entry["key"], None)
+                self.stale += 1
+                self.misses += 1
+                return None
+            spent = time.perf_counter() - start
+        else:
+            spent = 0.0
+        self._entries.move_to_end(entry["key"])
+        entry["hits"] += 1
+        self.hits += 1
+        self.saved_seconds += max(entry["seconds"] - spent, 0)
+        return entry["answer"]
+
+    def store(self, query, answer, plan=(), results=(), seconds=0.0, context=""):
+        """Remember an answer with the tool calls (name, args) and results it came from"""
+        if not self.enabled or not answer:
+            return False
+        plan = [{"name": call["name"], "args": call["args"]} for call in plan]
+        if any(not is_read_only(call["name"]) for call in plan):
+            return False
+        key = self._key(query, context)
+        self._entries[key] = {
+            "key": key,
+            "answer": answer,
+            "plan": plan,
+            "results": digest(list(results)),
+            "entities": entities(query),
+            "vector": embed(query),
+            "created": self.clock(),
+            "seconds": seconds,
+            "hits": 0
+        }
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return True
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "mode": self.mode,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "timeouts": self.timeouts,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "saved_seconds": round(self.saved_seconds, 2)
+        }
+
+
+def plan_from_messages(messages):
+    """Tool calls and their results, in call order, from an agent turn's messages"""
+    calls, results = [], {}
+    for message in messages:
+        for call in getattr(message, "tool_calls", None) or []:
+            calls.append({"id": call.get("id"), "name": call["name"], "args": call.get("args", {})})
+        if getattr(message, "type", None) == "tool":
+            results[message.tool_call_id] = message.content
+    return calls, [results.get(call["id"]) for call in calls]
+
+
+REPLAY_QUERIES = [
+    "list my orgs", "what branches does service-api have", "show me my organizations",
+    "list repos in acme", "what branches does service-web have", "List my orgs!",
+    "branches of service-api", "list the repositories in acme", "who owns service-api",
+    "list my orgs please", "what branches does service-api have?", "show repos in acme",
+    "list repos in globex", "get my organizations", "what branches does service-web have",
+    "list my org", "acme repos list", "service-api branch list",
+]
+
+
+class _FakeTool:
+    def __init__(self, name, seconds, data):
+        self.name, self.seconds, self.data = name, seconds, data
+
+    async def ainvoke(self, args):
+        await asyncio.sleep(self.seconds)
+        return json.dumps({"args": args, "data": self.data})
+
+
+async def benchmark_cache(rounds=4, llm_seconds=0.3, tool_seconds=0.05):
+    """Replay a query log against a simulated agent (two model calls + one tool call per turn)"""
+    tools = {
+        "list_user_organizations": _FakeTool("list_user_organizations", tool_seconds, ["acme", "globex"]),
+        "list_org_repos": _FakeTool("list_org_repos", tool_seconds, ["service-api", "service-web"]),
+        "list_org_repos_branches": _FakeTool("list_org_repos_branches", tool_seconds, ["main", "dev"]),
+    }
+
+    def plan_for(query):
+        words = set(tokens(query))
+        if "branches" in words:
+            repo = next(iter(entities(query)), "")
+            return [{"name": "list_org_repos_branches", "args": {"org": "acme", "repo": repo}}]
+        if "repos" in words:
+            return [{"name": "list_org_repos", "args": {"org": next(iter(entities(query)), "")}}]
+        if "orgs" in words:
+            return [{"name": "list_user_organizations", "args": {}}]
+        return []
+
+    async def agent(query):
+        start = time.perf_counter()
+        await asyncio.sleep(llm_seconds)
+        plan = plan_for(query)
+        results = [await tools[call["name"]].ainvoke(call["args"]) for call in plan]
+        await asyncio.sleep(llm_seconds)
+        return f"answer to {normalize(query)}", plan, results, time.perf_counter() - start
+
+    log = REPLAY_QUERIES * rounds
+    print(f"Replaying {len(log)} queries ({len(set(map(normalize, REPLAY_QUERIES)))} distinct after normalising),"
+          f" {llm_seconds}s per model call, {tool_seconds}s per tool call")
+    for mode in ("off", "exact", "semantic"):
+        cache = AnswerCache(mode=mode)
+        start = time.perf_counter()
+        for query in log:
+            if await cache.lookup(query, tools) is None:
+                answer, plan, results, seconds = await agent(query)
+                cache.store(query, answer, plan, results, seconds)
+        total = time.perf_counter() - start
+        stats = cache.stats()
+        print(f"  {mode:9} hit rate {stats['hit_rate']:5.1%}  total {total:6.2f}s"
+              f"  mean {total / len(log) * 1000:6.0f} ms/query  saved {stats['saved_seconds']:.2f}s")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        asyncio.run(benchmark_cache())
@@ -3,26 +3,84 @@ from pathlib import Path
 import sys
 import click
 import subprocess
-from main import config ,greet,interactive
 
+# Keep this module's imports light: main (LLM clients, langgraph, MCP) is only
+# imported by the chat command so that status/diff start fast.
+
+
+def import_times(module):
+    """Import a module in a fresh interpreter with -X importtime.
+
+    Returns (cumulative_us, [(cumulative_us, name), ...]) for the module and
+    each of its direct imports.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, cwd=str(Path(__file__).parent)
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        parts = line[len("import time:"):].split("|")
+        if not line.startswith("import time:") or len(parts) != 3 or "[us]" in line:
+            continue
+        # Nesting shows as two extra spaces of indentation per level
+        depth = (len(parts[2]) - len(parts[2].lstrip()) - 1) // 2
+        rows.append((depth, int(parts[1]), parts[2].strip()))
+
+    # importtime lists children before their parent: the module's direct
+    # imports are the depth-1 rows right above its own depth-0 row
+    total_us, children = 0, []
+    for depth, us, name in rows:
+        if depth == 0:
+            if name == module:
+                total_us = us
+                break
+            children = []
+        elif depth == 1:
+            children.append((us, name))
+    return total_us, sorted(children, reverse=True)
+
+
+def profile_startup(ctx, param, value):
+    if not value or ctx.resilient_parsing:
+        return
+    if getattr(sys, "frozen", False):
+        click.echo("Startup profiling needs the source install (python -m / pip install -e .)")
+        ctx.exit()
+    for module, label in (("cli", "voicegit (status, diff, ...)"), ("main", "voicegit chat")):
+        total_us, rows = import_times(module)
+        click.echo(f"{label}: {total_us / 1000:.1f} ms importing")
+        for us, name in rows[:10]:
+            click.echo(f"  {us / 1000:8.1f} ms  {name}")
+    ctx.exit()
 
 
 @click.group()
+@click.option('--profile-startup', is_flag=True, expose_value=False, is_eager=True,
+              callback=profile_startup, help='Show import-time breakdown of CLI and chat startup')
 def cli():
     "Voice Git CLI "
     pass
 
+def echo_lines(lines):
+    """Stream lines to the terminal, through the pager when stdout is a terminal"""
+    if sys.stdout.isatty():
+        click.echo_via_pager(lines)
+    else:
+        for line in lines:
+            click.echo(line, nl=False)
+
+
 @cli.command()
 def status():
     try:
-        result = subprocess.run(['git','status'],capture_output=True,text=True)
-        if result.returncode == 0:
-            click.echo(result.stdout)
-        else:
-            click.echo(f"Error {result.stderr}")
+        from git_backend import get_backend, format_status
+        backend = get_backend()
+        for line in format_status(backend.status()):
+            click.echo(line)
 
     except Exception as e:
-        click.echo(f"Error :{result.stderr} ",err=True)
+        click.echo(f"Error :{e} ",err=True)
 
 
 @cli.command()
@@ -33,17 +91,21 @@ def author():
         print("Error Getting Author Name ")
 
 
-@cli.command()
-def diff():
+@cli.command(context_settings={"ignore_unknown_options": True})
+@click.option('--max-lines', type=int, default=None, help='Summarize files first, then show hunks up to this many lines')
+@click.option('--max-bytes', type=int, default=None, help='Summarize files first, then show hunks up to this many bytes')
+@click.argument('args', nargs=-1, type=click.UNPROCESSED)
+def diff(max_lines, max_bytes, args):
     try:
-        result = subprocess.run(['git','diff'],capture_output=True,text=True)
-        if result.returncode == 0:
-            click.echo(result.stdout)
+        if max_lines or max_bytes:
+            from diff_pipeline import DEFAULT_MAX_BYTES, DEFAULT_MAX_LINES, render_diff
+            echo_lines(render_diff(".", args, max_bytes or DEFAULT_MAX_BYTES, max_lines or DEFAULT_MAX_LINES))
         else:
-            click.echo(f"Error {result.stderr}")
+            from git_backend import get_backend
+            echo_lines(get_backend().diff(args))
 
     except Exception as e:
-        click.echo(f"Error :{result.stderr} ",err=True)
+        click.echo(f"Error :{e} ",err=True)
 
 @cli.command()
 @click.option('--name', prompt='Your name', help='Your full name')
@@ -51,7 +113,7 @@ def diff():
 def configure(name, email):
     """Configure user name and email for VoiceGit"""
     try:
-        # Call the config function from main.py
+        from user_config import config
         result = config(name, email)
         
         if result:
@@ -68,6 +130,7 @@ def configure(name, email):
 def greeter():
     """Greet user with personalized message"""
     try:
+        from user_config import greet
         greeting = greet()
         click.echo(greeting)
     except Exception as e:
@@ -80,11 +143,46 @@ def debug():
     print("add code to debug")
 
 @cli.command()
-def chat():
+@click.option('--verbose', is_flag=True, help='Show time to first token, tokens/sec and tool timings per turn')
+def chat(verbose):
     """Start interactive chat with the assistant"""
     try:
         import asyncio
         from main import interactive
-        asyncio.run(interactive())
+        asyncio.run(interactive(verbose=verbose))
+    except Exception as e:
+        click.echo(f"❌ Error starting chat: {e}", err=True)
+
+@cli.group()
+def trace():
+    """Latency traces of chat turns (VOICEGIT_TRACE_FILE)"""
+    pass
+
+
+@trace.command()
+@click.option('--file', 'path', default=None, help='Trace file (default: VOICEGIT_TRACE_FILE or ~/.voicegit/traces.jsonl)')
+@click.option('--top', type=int, default=3, help='Number of slowest turns to show')
+def summarize(path, top):
+    """Critical path of the slowest turns: model, tool and GitHub request time"""
+    try:
+        from tracing import TRACE_FILE, summarize as summarize_traces
+        summarize_traces(path or TRACE_FILE, top, echo=click.echo)
     except Exception as e:
-        click.echo(f"❌ Error starting chat: {e}", err=True)
\ No newline at end of file
+        click.echo(f"❌ Error: {e}", err=True)
+
+
+@trace.command()
+@click.option('--file', 'path', default=None, help='Trace file (default: VOICEGIT_TRACE_FILE or ~/.voicegit/traces.jsonl)')
+@click.argument('output', type=click.Path(dir_okay=False))
+def export(path, output):
+    """Write the traces as OTLP/JSON, for Jaeger, Tempo or an OpenTelemetry collector"""
+    try:
+        import json
+        from tracing import TRACE_FILE, build_trees, load_spans, to_otlp
+        spans = [span for span in load_spans(path or TRACE_FILE) if span.get("endTimeUnixNano")]
+        build_trees(spans)  # GitHub MCP server spans take the trace id of the tool call they ran in
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(to_otlp(spans), f)
+        click.echo(f"✅ {len(spans)} spans written to {output}")
+    except Exception as e:
+        click.echo(f"❌ Error: {e}", err=True)
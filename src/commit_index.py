@@ -0,0 +1,338 @@
+import hashlib
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from git_backend import GitError, check_rev, iter_nul_records
+from user_config import get_config_path
+
+# Incremental index of a repository's commit graph for history questions
+# ("who touched this file most", "commits since v1.2", "branches containing
+# abc123") that would otherwise need a full `git log` walk each time.
+
+FIELD_SEP = "\x1f"
+RECORD_START = "\x1e"
+LOG_FORMAT = RECORD_START + FIELD_SEP.join(["%H", "%P", "%an", "%ae", "%at"])
+REF_FORMAT = FIELD_SEP.join(["%(refname)", "%(objectname)", "%(*objectname)"])
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS commits (
+    id INTEGER PRIMARY KEY,
+    sha TEXT NOT NULL UNIQUE,
+    author TEXT NOT NULL,
+    email TEXT NOT NULL,
+    timestamp INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS parents (
+    commit_id INTEGER NOT NULL,
+    parent_id INTEGER NOT NULL,
+    PRIMARY KEY (commit_id, parent_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS parents_by_parent ON parents (parent_id);
+CREATE TABLE IF NOT EXISTS paths (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS touches (
+    path_id INTEGER NOT NULL,
+    commit_id INTEGER NOT NULL,
+    PRIMARY KEY (path_id, commit_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS refs (
+    name TEXT PRIMARY KEY,
+    sha TEXT NOT NULL
+);
+"""
+
+# A commit and every commit it descends from
+ANCESTORS = """
+WITH RECURSIVE ancestors(id) AS (
+    SELECT id FROM commits WHERE sha = ?
+    UNION
+    SELECT parents.parent_id FROM parents JOIN ancestors ON parents.commit_id = ancestors.id
+)
+SELECT id FROM ancestors
+"""
+
+# A commit and every commit that has it as an ancestor
+DESCENDANTS = """
+WITH RECURSIVE descendants(id) AS (
+    SELECT id FROM commits WHERE sha = ?
+    UNION
+    SELECT parents.commit_id FROM parents JOIN descendants ON parents.parent_id = descendants.id
+)
+SELECT id FROM descendants
+"""
+
+
+def index_path(repo_path):
+    """Index file for a repository, kept next to the user config"""
+    key = hashlib.sha1(os.path.abspath(repo_path).encode()).hexdigest()[:16]
+    return get_config_path().parent / "history_index" / f"{key}.sqlite3"
+
+
+def _git(repo_path, args):
+    result = subprocess.run(["git", *args], cwd=repo_path, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise GitError(result.stderr.strip() or f"git {args[0]} failed")
+    return result.stdout
+
+
+class CommitIndex:
+    """SQLite commit graph (parents, author, timestamp, touched paths) of one repository.
+
+    update() only walks commits that are not reachable from the ref tips seen
+    by the previous update, so keeping the index current after a pull or a
+    new commit costs about as much as the new commits themselves.
+    """
+
+    def __init__(self, repo_path=".", db_path=None):
+        self.repo_path = os.path.abspath(repo_path)
+        self.db_path = db_path or index_path(self.repo_path)
+        if self.db_path != ":memory:":
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self.db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.db.executescript(SCHEMA)
+        self.last_update = None
+
+    def close(self):
+        self.db.close()
+
+    def _current_refs(self):
+        refs = {}
+        output = _git(self.repo_path, ["for-each-ref", f"--format={REF_FORMAT}",
+                                       "refs/heads", "refs/tags", "refs/remotes"])
+        for line in output.splitlines():
+            name, sha, peeled = line.split(FIELD_SEP)
+            # Annotated tags point at a tag object; index the commit it tags
+            refs[name] = peeled or sha
+        head = subprocess.run(["git", "rev-parse", "--verify", "-q", "HEAD"],
+                              cwd=self.repo_path, capture_output=True, text=True)
+        if head.returncode == 0:
+            refs["HEAD"] = head.stdout.strip()
+        return refs
+
+    def update(self):
+        """Index commits added since the last update; returns how many were added"""
+        start = time.perf_counter()
+        refs = self._current_refs()
+        known = dict(self.db.execute("SELECT name, sha FROM refs"))
+        if refs == known:
+            self.last_update = {"new_commits": 0, "seconds": time.perf_counter() - start}
+            return 0
+
+        # Parents come before children, so every parent id already exists
+        args = ["log", "-z", "--reverse", "--topo-order", f"--format={LOG_FORMAT}", "--name-only",
+                "--ignore-missing", *sorted(set(refs.values())), "--not", *sorted(set(known.values()))]
+        proc = subprocess.Popen(["git", *args], cwd=self.repo_path, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        # Drained alongside stdout so a chatty git cannot block on a full stderr pipe
+        stderr = []
+        drain = threading.Thread(target=lambda: stderr.append(proc.stderr.read()), daemon=True)
+        drain.start()
+        path_ids = {}
+        added = 0
+        commit_id = None
+        try:
+            with self.db:
+                for record in iter_nul_records(proc.stdout):
+                    if record.startswith(RECORD_START):
+                        sha, parents, author, email, timestamp = record[1:].split(FIELD_SEP)
+                        self.db.execute(
+                            "INSERT OR IGNORE INTO commits (sha, author, email, timestamp) VALUES (?, ?, ?, ?)",
+                            (sha, author, email, int(timestamp))
+                        )
+                        commit_id = self.db.execute("SELECT id FROM commits WHERE sha = ?", (sha,)).fetchone()[0]
+                        added += 1
+                        for parent in parents.split():
+                            # Missing in shallow clones: the parent is just not linked
+                            self.db.execute(
+                                "INSERT OR IGNORE INTO parents SELECT ?, id FROM commits WHERE sha = ?",
+                                (commit_id, parent)
+                            )
+                    elif commit_id is not None and record.strip():
+                        path = record.lstrip("\n")
+                        if path not in path_ids:
+                            self.db.execute("INSERT OR IGNORE INTO paths (path) VALUES (?)", (path,))
+                            path_ids[path] = self.db.execute(
+                                "SELECT id FROM paths WHERE path = ?", (path,)
+                            ).fetchone()[0]
+                        self.db.execute("INSERT OR IGNORE INTO touches VALUES (?, ?)", (path_ids[path], commit_id))
+                # A failed or cut-short walk rolls back, so the refs are never recorded as indexed
+                if proc.wait() != 0:
+                    drain.join()
+                    message = b"".join(stderr).decode("utf-8", errors="replace").strip()
+                    raise GitError(message or "git log failed")
+                self.db.execute("DELETE FROM refs")
+                self.db.executemany("INSERT INTO refs VALUES (?, ?)", refs.items())
+        finally:
+            proc.stdout.close()
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
+            drain.join()
+            proc.stderr.close()
+        self.last_update = {"new_commits": added, "seconds": time.perf_counter() - start}
+        return added
+
+    def resolve(self, rev):
+        """Full sha of a revision (branch, tag, abbreviated sha, HEAD~2, ...)"""
+        check_rev(rev)
+        # Ref names as of the last update are answered without running git
+        row = self.db.execute(
+            "SELECT sha FROM refs WHERE name IN (?, ?, ?, ?) ORDER BY name = ? DESC, name LIKE 'refs/heads/%' DESC",
+            (rev, f"refs/heads/{rev}", f"refs/tags/{rev}", f"refs/remotes/{rev}", rev)
+        ).fetchone()
+        if row:
+            return row[0]
+        return _git(self.repo_path, ["rev-parse", "--verify", "-q", f"{rev}^{{commit}}"]).strip()
+
+    def file_authors(self, path, limit=10):
+        """Authors ranked by how many commits touched a file, or any file under a directory"""
+        path = path.strip("/")
+        rows = self.db.execute(
+            """
+            SELECT commits.author, commits.email, COUNT(DISTINCT commits.id), MAX(commits.timestamp)
+            FROM paths
+            JOIN touches ON touches.path_id = paths.id
+            JOIN commits ON commits.id = touches.commit_id
+            WHERE paths.path = ? OR paths.path LIKE ? ESCAPE '\\'
+            GROUP BY commits.email
+            ORDER BY 3 DESC, 4 DESC
+            LIMIT ?
+            """,
+            (path, path.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "/%", limit)
+        )
+        return [{"author": author, "email": email, "commits": count, "last_commit": last}
+                for author, email, count, last in rows]
+
+    def commits_since(self, base, head="HEAD", limit=100):
+        """Commits reachable from head but not from base (git log base..head), newest first"""
+        excluded = {commit_id for commit_id, in self.db.execute(ANCESTORS, (self.resolve(base),))}
+        ids = [commit_id for commit_id, in self.db.execute(ANCESTORS, (self.resolve(head),))
+               if commit_id not in excluded]
+        # Ids follow indexing order (parents first), so the highest ids are the newest commits
+        newest = sorted(ids, reverse=True)[:limit]
+        rows = self.db.execute(
+            f"SELECT sha, author, email, timestamp FROM commits WHERE id IN ({','.join('?' * len(newest))})"
+            " ORDER BY id DESC",
+            newest
+        )
+        commits = [{"sha": sha, "author": author, "email": email, "timestamp": timestamp}
+                   for sha, author, email, timestamp in rows]
+        total = len(ids)
+        return {"base": base, "head": head, "total": total, "commits": commits}
+
+    def refs_containing(self, rev, kind="heads"):
+        """Branches (kind 'heads'), remote branches ('remotes') or tags ('tags') whose tip reaches rev"""
+        reachable = {commit_id for commit_id, in self.db.execute(DESCENDANTS, (self.resolve(rev),))}
+        rows = self.db.execute(
+            "SELECT refs.name, commits.id FROM refs JOIN commits ON commits.sha = refs.sha WHERE refs.name LIKE ?",
+            (f"refs/{kind}/%",)
+        )
+        prefix = len(f"refs/{kind}/")
+        return sorted(name[prefix:] for name, commit_id in rows if commit_id in reachable)
+
+    def stats(self):
+        counts = {
+            table: self.db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in ("commits", "paths", "touches", "refs")
+        }
+        return {
+            "repository": self.repo_path,
+            "index_file": str(self.db_path),
+            **counts,
+            "last_update": self.last_update
+        }
+
+
+_indexes = {}
+_lock = threading.Lock()
+
+
+def query(repo_path, method, *args, **kwargs):
+    """Bring the shared index of a repository up to date and run one of its queries.
+
+    Serialised with a lock because the MCP server calls this from worker threads.
+    """
+    key = os.path.abspath(repo_path)
+    with _lock:
+        if key not in _indexes:
+            _indexes[key] = CommitIndex(key)
+        index = _indexes[key]
+        index.update()
+        return getattr(index, method)(*args, **kwargs)
+
+
+def benchmark_index(commits=5000, files=500):
+    """Build an index of a synthetic repository and compare its queries with git"""
+    import shutil
+    import tempfile
+
+    repo = tempfile.mkdtemp(prefix="voicegit-bench-")
+    try:
+        print(f"Creating synthetic repository with {commits} commits in {repo} ...")
+        subprocess.run(["git", "init", "-q", "-b", "main"], cwd=repo, check=True)
+        stream = []
+        for i in range(commits):
+            author = f"dev{i % 7}"
+            message = f"commit {i}"
+            stream.append(f"commit refs/heads/main\nmark :{i + 1}\n"
+                          f"author {author} <{author}@example.com> {1700000000 + i * 60} +0000\n"
+                          f"committer {author} <{author}@example.com> {1700000000 + i * 60} +0000\n"
+                          f"data {len(message)}\n{message}\n")
+            for j in range(3):
+                path = f"src/m{(i * 3 + j) % files}.py"
+                content = f"# {i}\n"
+                stream.append(f"M 644 inline {path}\ndata {len(content)}\n{content}\n")
+            if i == commits // 2:
+                stream.append(f"reset refs/tags/v1.0\nfrom :{i + 1}\n\n")
+            if i % 10 == 0:
+                stream.append(f"reset refs/heads/feature-{i}\nfrom :{i + 1}\n\n")
+        subprocess.run(["git", "fast-import", "--quiet"], cwd=repo, input="".join(stream).encode(), check=True)
+        subprocess.run(["git", "checkout", "-q", "main"], cwd=repo, check=True)
+
+        index = CommitIndex(repo, os.path.join(repo, "index.sqlite3"))
+        start = time.perf_counter()
+        index.update()
+        print(f"  full build          {(time.perf_counter() - start) * 1000:8.1f} ms ({index.stats()['commits']} commits)")
+
+        for i in range(10):
+            with open(os.path.join(repo, "new.txt"), "a") as f:
+                f.write(f"{i}\n")
+            subprocess.run(["git", "add", "new.txt"], cwd=repo, check=True)
+            subprocess.run(["git", "-c", "user.name=bench", "-c", "user.email=bench@example.com",
+                            "commit", "-qm", f"new {i}"], cwd=repo, check=True)
+        start = time.perf_counter()
+        index.update()
+        print(f"  incremental update  {(time.perf_counter() - start) * 1000:8.1f} ms ({index.last_update['new_commits']} new commits)")
+        start = time.perf_counter()
+        index.update()
+        print(f"  no-op update        {(time.perf_counter() - start) * 1000:8.1f} ms")
+
+        old_commit = _git(repo, ["rev-list", "--max-count=1", "--skip", str(commits - 50), "main"]).strip()
+        queries = [
+            ("who touched file", lambda: index.file_authors("src/m7.py"),
+             ["log", "--format=%ae", "--", "src/m7.py"]),
+            ("commits since tag", lambda: index.commits_since("v1.0"),
+             ["log", "--format=%H", "v1.0..HEAD"]),
+            ("branches containing", lambda: index.refs_containing(old_commit),
+             ["branch", "--contains", old_commit]),
+        ]
+        for label, query, git_args in queries:
+            start = time.perf_counter()
+            query()
+            index_ms = (time.perf_counter() - start) * 1000
+            start = time.perf_counter()
+            _git(repo, git_args)
+            git_ms = (time.perf_counter() - start) * 1000
+            print(f"  {label:20} index {index_ms:7.1f} ms   git {git_ms:7.1f} ms")
+        index.close()
+    finally:
+        shutil.rmtree(repo, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        benchmark_index(int(sys.argv[2]) if len(sys.argv) > 2 else 5000)
@@ -0,0 +1,284 @@
+import json
+import os
+import re
+import sys
+import time
+from collections import OrderedDict
+
+# Token-budgeted chat history: pinned facts, recent tool results and a rolling
+# summary of old turns go first, then as many recent turns as fit in the budget.
+
+DEFAULT_BUDGET_TOKENS = int(os.getenv("VOICEGIT_CONTEXT_TOKENS", "4000"))
+DEFAULT_MAX_MESSAGE_TOKENS = 1000
+DEFAULT_SUMMARY_TOKENS = 500
+DEFAULT_TOOL_RESULT_TOKENS = 600
+# Each remembered tool result is cut to this many tokens
+MAX_TOOL_RESULT_TOKENS = 200
+
+_encoding = None
+
+
+def count_tokens(text):
+    """Number of tokens in text.
+
+    Uses tiktoken's cl100k_base encoding when tiktoken is installed; otherwise
+    an estimate of one token per short word or symbol and one per 4 characters
+    of longer words, which stays within ~15% of BPE counts on English and code.
+    """
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return sum(max(1, len(piece) // 4) for piece in re.findall(r"\w+|\S", text))
+
+
+def message_text(message):
+    content = message.get("content", "")
+    if isinstance(content, str):
+        return content
+    return json.dumps(content, ensure_ascii=False)
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Cut text to roughly max_tokens, marking that it was cut"""
+    tokens = count_tokens(text)
+    if tokens <= max_tokens:
+        return text
+    keep = int(len(text) * max_tokens / tokens)
+    return text[:keep] + f"\n…[truncated, {tokens - max_tokens} more tokens]"
+
+
+def gist(message, max_chars=160):
+    """One-line extract of a message for the rolling summary"""
+    text = " ".join(message_text(message).split())
+    # Tool output echoed into the reply is the bulkiest part and the least useful to keep
+    text = text.split("🔧 Tool executed:")[0].strip() or text
+    if len(text) > max_chars:
+        text = text[:max_chars].rsplit(" ", 1)[0] + " …"
+    return f"{message['role']}: {text}"
+
+
+def extractive_summary(previous, evicted, max_tokens=DEFAULT_SUMMARY_TOKENS):
+    """Default summariser: append a gist per evicted message, dropping the oldest gists past max_tokens"""
+    lines = previous.splitlines() if previous else []
+    lines.extend(gist(message) for message in evicted)
+    while len(lines) > 1 and count_tokens("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+def llm_summarizer(model):
+    """Summariser that asks a chat model to fold evicted turns into the summary"""
+    def summarize(previous, evicted, max_tokens=DEFAULT_SUMMARY_TOKENS):
+        transcript = "\n".join(f"{m['role']}: {message_text(m)}" for m in evicted)
+        response = model.invoke([
+            {"role": "system", "content": (
+                "Update the running summary of a git assistant conversation with the new turns. "
+                "Keep repositories, branches, file names, decisions and open questions. "
+                f"Answer with the summary only, under {max_tokens} tokens."
+            )},
+            {"role": "user", "content": f"Summary so far:\n{previous or '(none)'}\n\nNew turns:\n{transcript}"}
+        ])
+        return truncate_to_tokens(str(response.content), max_tokens)
+    return summarize
+
+
+class ConversationMemory:
+    """Chat history that fits a token budget instead of a fixed number of messages
+
+    context() returns a system message with the pinned facts, the newest tool
+    results (within tool_result_tokens) and the summary of evicted turns,
+    followed by the newest turns that fit in budget_tokens. Turns
+    are evicted whole (a user message with the replies that follow it) and each
+    evicted turn is folded into the summary exactly once. Messages longer than
+    max_message_tokens are shortened in the context but kept intact in
+    `messages`.
+    """
+
+    def __init__(self, budget_tokens=DEFAULT_BUDGET_TOKENS, max_message_tokens=DEFAULT_MAX_MESSAGE_TOKENS,
+                 summary_tokens=DEFAULT_SUMMARY_TOKENS, summarizer=extractive_summary, messages=None,
+                 tool_result_tokens=DEFAULT_TOOL_RESULT_TOKENS):
+        self.budget_tokens = budget_tokens
+        self.max_message_tokens = max_message_tokens
+        self.summary_tokens = summary_tokens
+        self.tool_result_tokens = tool_result_tokens
+        self.summarizer = summarizer
+        self.messages = list(messages or [])
+        self.pinned = {}
+        self.tool_results = OrderedDict()
+        self.summary = ""
+        self._summarized = 0
+        self._token_cache = {}
+        self.last_stats = None
+
+    def pin(self, key, fact):
+        """Keep a fact in every context (e.g. pin('repo', 'owner/name')); None unpins it"""
+        if fact is None:
+            self.pinned.pop(key, None)
+        else:
+            self.pinned[key] = fact
+
+    def remember_tools(self, calls, results):
+        """Keep the (already compacted) results of a turn's tool calls for the following turns
+
+        A repeated call replaces its older result; the oldest results are
+        dropped once they no longer fit in tool_result_tokens.
+        """
+        for call, result in zip(calls, results):
+            if result is None:
+                continue
+            args = ", ".join(f"{key}={value}" for key, value in call.get("args", {}).items())
+            key = f"{call['name']}({args})"
+            self.tool_results.pop(key, None)
+            self.tool_results[key] = truncate_to_tokens(message_text({"content": result}), MAX_TOOL_RESULT_TOKENS)
+        while len(self.tool_results) > 1 and count_tokens(self._tool_results_text()) > self.tool_result_tokens:
+            self.tool_results.popitem(last=False)
+
+    def add(self, role, content):
+        self.messages.append({"role": role, "content": content})
+
+    def append(self, message):
+        # list-like, so existing `messages.append({...})` callers keep working
+        self.messages.append(message)
+
+    def __len__(self):
+        return len(self.messages)
+
+    def _shortened(self, index):
+        """Message as it goes into the context, with its token count (cached per message)"""
+        message = self.messages[index]
+        text = message_text(message)
+        cached = self._token_cache.get(index)
+        if cached is None or cached[0] != text:
+            short = truncate_to_tokens(text, self.max_message_tokens)
+            # ~4 tokens of per-message overhead in chat formats
+            cached = (text, short, count_tokens(short) + 4)
+            self._token_cache[index] = cached
+        return {"role": message["role"], "content": cached[1]}, cached[2]
+
+    def _turn_starts(self):
+        starts = [i for i in range(self._summarized, len(self.messages)) if self.messages[i]["role"] == "user"]
+        if not starts or starts[0] != self._summarized:
+            starts.insert(0, self._summarized)
+        return starts
+
+    def _pinned_text(self):
+        if not self.pinned:
+            return ""
+        return "Facts about this session:\n" + "\n".join(f"- {k}: {v}" for k, v in self.pinned.items())
+
+    def _tool_results_text(self):
+        if not self.tool_results:
+            return ""
+        return "Recent tool results:\n" + "\n".join(f"- {k}: {v}" for k, v in self.tool_results.items())
+
+    def _header(self):
+        parts = [self._pinned_text()] if self.pinned else []
+        if self.tool_results:
+            parts.append(self._tool_results_text())
+        if self.summary:
+            parts.append("Summary of earlier conversation:\n" + self.summary)
+        return "\n\n".join(parts)
+
+    def context(self):
+        """Messages to send to the model for the next turn"""
+        start = time.perf_counter()
+        # Room for the system message: pinned facts, tool results and a full-size summary,
+        # so that folding evicted turns into the summary cannot overrun the budget
+        available = (self.budget_tokens - count_tokens(self._pinned_text()) - count_tokens(self._tool_results_text())
+                     - self.summary_tokens - 16)
+
+        starts = self._turn_starts()
+        kept_from = len(self.messages)
+        used = 0
+        for turn_start in reversed(starts):
+            turn_end = kept_from
+            turn_tokens = sum(self._shortened(i)[1] for i in range(turn_start, turn_end))
+            # The newest turn is always kept, even if it alone exceeds the budget
+            if used + turn_tokens > available and kept_from < len(self.messages):
+                break
+            used += turn_tokens
+            kept_from = turn_start
+
+        if kept_from > self._summarized:
+            evicted = self.messages[self._summarized:kept_from]
+            self.summary = self.summarizer(self.summary, evicted, self.summary_tokens)
+            self._summarized = kept_from
+
+        header = self._header()
+        context = [{"role": "system", "content": header}] if header else []
+        context.extend(self._shortened(i)[0] for i in range(kept_from, len(self.messages)))
+        self.last_stats = {
+            "prompt_tokens": used + (count_tokens(header) + 4 if header else 0),
+            "messages": len(context),
+            "summarized_messages": self._summarized,
+            "build_ms": round((time.perf_counter() - start) * 1000, 3)
+        }
+        return context
+
+    def stats(self):
+        return {
+            "budget_tokens": self.budget_tokens,
+            "total_messages": len(self.messages),
+            "pinned_facts": len(self.pinned),
+            "tool_results": len(self.tool_results),
+            "summary_tokens": count_tokens(self.summary),
+            **(self.last_stats or {})
+        }
+
+
+def scripted_session(turns=100):
+    """Synthetic git chat: short questions, replies with bulky tool output every few turns"""
+    repo_listing = json.dumps([{
+        "name": f"repo-{i}", "full_name": f"acme/repo-{i}", "clone_url": f"https://github.com/acme/repo-{i}.git",
+        "ssh_url": f"git@github.com:acme/repo-{i}.git", "default_branch": "main", "stargazers_count": i
+    } for i in range(40)], indent=2)
+    for turn in range(turns):
+        if turn % 10 == 0:
+            yield "list the repos in acme", f"Here are the repositories:\n🔧 Tool executed: {repo_listing}\n"
+        elif turn % 3 == 0:
+            yield (f"what changed in repo-{turn % 40} on feature-{turn}?",
+                   f"feature-{turn} has 3 commits ahead of main touching src/app.py and README.md. " * 4)
+        else:
+            yield f"ok, and who owns repo-{turn % 40}?", f"repo-{turn % 40} is maintained by dev{turn % 7}."
+
+
+def benchmark_memory(turns=100, budget_tokens=DEFAULT_BUDGET_TOKENS):
+    """Prompt tokens and context build time per turn: last-5 window vs token budget"""
+    window = []
+    memory = ConversationMemory(budget_tokens=budget_tokens)
+    memory.pin("repository", "acme/platform")
+    memory.pin("branch", "feature-42")
+    results = {"last_5_window": [], "token_budget": []}
+    build_ms = []
+    for question, answer in scripted_session(turns):
+        window.append({"role": "user", "content": question})
+        memory.add("user", question)
+        results["last_5_window"].append(sum(count_tokens(message_text(m)) + 4 for m in window[-5:]))
+        context = memory.context()
+        results["token_budget"].append(memory.last_stats["prompt_tokens"])
+        build_ms.append(memory.last_stats["build_ms"])
+        assert "acme/platform" in context[0]["content"]
+        window.append({"role": "assistant", "content": answer})
+        memory.add("assistant", answer)
+
+    print(f"{turns}-turn scripted session, budget {budget_tokens} tokens"
+          f" ({'tiktoken' if _encoding else 'estimated'} token counts)")
+    for mode, tokens in results.items():
+        ordered = sorted(tokens)
+        print(f"  {mode:14} prompt tokens  mean {sum(tokens) / len(tokens):7.0f}"
+              f"  p95 {ordered[int(0.95 * (len(ordered) - 1))]:6}  max {ordered[-1]:6}")
+    print(f"  context build  mean {sum(build_ms) / len(build_ms):.2f} ms  max {max(build_ms):.2f} ms")
+    print(f"  last-5 window keeps pinned repo/branch: no; token budget keeps them: yes"
+          f" (+ summary of {memory._summarized} older messages)")
+    return results
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        benchmark_memory(int(sys.argv[2]) if len(sys.argv) > 2 else 100)
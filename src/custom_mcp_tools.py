@@ -1,6 +1,7 @@
 import asyncio
 import json
 import os
+from contextlib import asynccontextmanager
 from typing import Any, Dict, List, Optional
 import httpx
 from mcp.server.fastmcp import FastMCP
@@ -8,33 +9,88 @@ from mcp.server.fastmcp import FastMCP
 # GitHub API Configuration
 GITHUB_API_BASE = "https://api.github.com"
 
-# Initialize FastMCP server
-mcp = FastMCP("GitHub")
+# HTTP client configuration (shared, process-lifetime connection pool)
+GITHUB_HTTP2 = os.getenv("GITHUB_HTTP2", "1") != "0"
+GITHUB_MAX_CONNECTIONS = int(os.getenv("GITHUB_MAX_CONNECTIONS", "20"))
+GITHUB_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("GITHUB_MAX_KEEPALIVE_CONNECTIONS", "10"))
+GITHUB_KEEPALIVE_EXPIRY = float(os.getenv("GITHUB_KEEPALIVE_EXPIRY", "30"))
+GITHUB_CONNECT_TIMEOUT = float(os.getenv("GITHUB_CONNECT_TIMEOUT", "10"))
+GITHUB_TIMEOUT = float(os.getenv("GITHUB_TIMEOUT", "30"))
+
+
+def _http2_available() -> bool:
+    """HTTP/2 needs the optional 'h2' package (pip install httpx[http2])"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
 
 class GitHubAPI:
-    def __init__(self, token: str):
+    def __init__(self, token: str, base_url: str = GITHUB_API_BASE,
+                 http2: bool = GITHUB_HTTP2,
+                 max_connections: int = GITHUB_MAX_CONNECTIONS,
+                 max_keepalive_connections: int = GITHUB_MAX_KEEPALIVE_CONNECTIONS,
+                 keepalive_expiry: float = GITHUB_KEEPALIVE_EXPIRY,
+                 connect_timeout: float = GITHUB_CONNECT_TIMEOUT,
+                 timeout: float = GITHUB_TIMEOUT):
         self.token = token
+        self.base_url = base_url
         self.headers = {
             "Authorization": f"Bearer {token}",
             "Accept": "application/vnd.github+json",
             "X-GitHub-Api-Version": "2022-11-28"
         }
+        self.http2 = http2 and _http2_available()
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self._client: Optional[httpx.AsyncClient] = None
 
-    async def make_request(self, endpoint: str, params: Optional[Dict] = None) -> Dict[str, Any]:
-        """Make authenticated request to GitHub API"""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{GITHUB_API_BASE}{endpoint}",
+    def get_client(self) -> httpx.AsyncClient:
+        """Return the shared keep-alive client, creating it on first use"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
                 headers=self.headers,
-                params=params or {}
+                http2=self.http2,
+                limits=self.limits,
+                timeout=self.timeout
             )
-            response.raise_for_status()
-            return response.json()
+        return self._client
+
+    async def make_request(self, endpoint: str, params: Optional[Dict] = None) -> Dict[str, Any]:
+        """Make authenticated request to GitHub API"""
+        response = await self.get_client().get(endpoint, params=params or {})
+        response.raise_for_status()
+        return response.json()
+
+    async def aclose(self):
+        """Close the pooled client and its open connections"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
 
 # Initialize GitHub API with token
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN", "ACCESS_TOKEN")
 github_api = GitHubAPI(GITHUB_TOKEN)
 
+
+@asynccontextmanager
+async def github_lifespan(server: FastMCP):
+    """Keep one HTTP client for the server's lifetime and close it on shutdown"""
+    try:
+        yield
+    finally:
+        await github_api.aclose()
+
+# Initialize FastMCP server
+mcp = FastMCP("GitHub", lifespan=github_lifespan)
+
 @mcp.tool()
 async def get_authenticated_user() -> str:
     """Get details of the authenticated GitHub user"""
@@ -271,6 +327,8 @@ async def test_tools():
     result = await get_user_organizations()
     print(result)
 
+    await github_api.aclose()
+
 if __name__ == "__main__":
     import sys
     
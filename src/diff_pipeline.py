@@ -0,0 +1,157 @@
+import json
+from collections import namedtuple
+from git_backend import check_rev, get_backend
+
+FileStat = namedtuple("FileStat", "path added removed binary")
+Hunk = namedtuple("Hunk", "path header lines")
+
+DEFAULT_MAX_BYTES = 64 * 1024
+DEFAULT_MAX_LINES = 2000
+DEFAULT_MAX_FILES = 200
+
+
+def file_stats(backend, args=()):
+    """Per-file added/removed line counts from `git diff --numstat` (binary files show '-')"""
+    stats = []
+    for line in backend.diff(["--numstat", *args]):
+        added, _, rest = line.rstrip("\n").partition("\t")
+        removed, _, path = rest.partition("\t")
+        if not path:
+            continue
+        binary = added == "-" and removed == "-"
+        stats.append(FileStat(path, 0 if binary else int(added), 0 if binary else int(removed), binary))
+    return stats
+
+
+def iter_hunks(lines):
+    """Parse unified diff lines into Hunk records as they arrive.
+
+    File headers (diff --git, index, ---/+++) are consumed; a binary file yields
+    a single hunk whose header is the 'Binary files ... differ' line.
+    """
+    path = None
+    header = None
+    body = []
+    for line in lines:
+        if line.startswith("diff --git "):
+            if header is not None:
+                yield Hunk(path, header, body)
+            header, body = None, []
+            # "diff --git a/<path> b/<path>": take the b/ side
+            path = line.rstrip("\n").split(" b/", 1)[-1]
+        elif line.startswith("@@"):
+            if header is not None:
+                yield Hunk(path, header, body)
+            header, body = line.rstrip("\n"), []
+        elif line.startswith("Binary files "):
+            yield Hunk(path, line.rstrip("\n"), [])
+        elif header is not None:
+            body.append(line.rstrip("\n"))
+        elif line.startswith("+++ ") and line[4:].startswith("b/"):
+            path = line[6:].rstrip("\n")
+    if header is not None:
+        yield Hunk(path, header, body)
+
+
+def bounded_hunks(hunks, max_bytes=DEFAULT_MAX_BYTES, max_lines=DEFAULT_MAX_LINES):
+    """Yield hunks until the byte or line budget runs out.
+
+    The hunk that crosses the budget is cut to what still fits. Returns
+    (through StopIteration.value) whether anything was left out.
+    """
+    used_bytes = used_lines = 0
+    for hunk in hunks:
+        used_bytes += len(hunk.header) + 1
+        used_lines += 1
+        if used_bytes > max_bytes or used_lines > max_lines:
+            return True
+        kept = []
+        for line in hunk.lines:
+            used_bytes += len(line) + 1
+            used_lines += 1
+            if used_bytes > max_bytes or used_lines > max_lines:
+                yield Hunk(hunk.path, hunk.header, kept)
+                return True
+            kept.append(line)
+        yield hunk
+    return False
+
+
+def top_stats(stats, max_files=DEFAULT_MAX_FILES, max_bytes=DEFAULT_MAX_BYTES):
+    """Stats of the most changed files, at most max_files and max_bytes of JSON.
+
+    Returns (kept stat dicts, bytes they take).
+    """
+    kept, used_bytes = [], 0
+    for stat in sorted(stats, key=lambda stat: stat.added + stat.removed, reverse=True)[:max_files]:
+        entry = stat._asdict()
+        size = len(json.dumps(entry)) + 1
+        if used_bytes + size > max_bytes:
+            break
+        kept.append(entry)
+        used_bytes += size
+    return kept, used_bytes
+
+
+def structured_diff(repo_path=".", args=(), paths=(), max_bytes=DEFAULT_MAX_BYTES,
+                    max_lines=DEFAULT_MAX_LINES, include_hunks=True, revs=(), max_files=DEFAULT_MAX_FILES):
+    """Bounded diff: stats of the most changed files first, then hunks until the budget runs out
+
+    The file stats count against max_bytes too; files_total and files_omitted
+    tell how many were left out. `args` are trusted diff options; `revs`
+    (commits to compare) may come from the model and are checked not to be options.
+    """
+    backend = get_backend(repo_path)
+    args = [*args, *(check_rev(rev) for rev in revs)]
+    args = [*args, "--", *paths] if paths else args
+    stats = file_stats(backend, args)
+    files, stats_bytes = top_stats(stats, max_files, max_bytes)
+    result = {
+        "files": files,
+        "files_total": len(stats),
+        "files_omitted": len(stats) - len(files),
+        "total_added": sum(stat.added for stat in stats),
+        "total_removed": sum(stat.removed for stat in stats),
+        "hunks": [],
+        "truncated": len(files) < len(stats)
+    }
+    if include_hunks:
+        hunks = bounded_hunks(iter_hunks(backend.diff(args)), max_bytes - stats_bytes, max_lines)
+        while True:
+            try:
+                hunk = next(hunks)
+            except StopIteration as stop:
+                result["truncated"] = result["truncated"] or bool(stop.value)
+                break
+            result["hunks"].append({"path": hunk.path, "header": hunk.header, "lines": hunk.lines})
+        hunks.close()
+    return result
+
+
+def render_diff(repo_path=".", args=(), max_bytes=DEFAULT_MAX_BYTES, max_lines=DEFAULT_MAX_LINES):
+    """Text lines for the terminal: a per-file summary, then hunks within the budget"""
+    backend = get_backend(repo_path)
+    stats = file_stats(backend, args)
+    for stat in stats:
+        change = "binary" if stat.binary else f"+{stat.added} -{stat.removed}"
+        yield f" {stat.path} | {change}\n"
+    yield f" {len(stats)} files changed\n\n"
+
+    hunks = bounded_hunks(iter_hunks(backend.diff(args)), max_bytes, max_lines)
+    current_path = None
+    truncated = False
+    while True:
+        try:
+            hunk = next(hunks)
+        except StopIteration as stop:
+            truncated = bool(stop.value)
+            break
+        if hunk.path != current_path:
+            current_path = hunk.path
+            yield f"=== {current_path}\n"
+        yield hunk.header + "\n"
+        for line in hunk.lines:
+            yield line + "\n"
+    hunks.close()
+    if truncated:
+        yield f"\n... diff truncated at {max_lines} lines / {max_bytes} bytes; pass file paths to see the rest\n"
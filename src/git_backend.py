@@ -0,0 +1,277 @@
+import os
+import subprocess
+import sys
+from collections import namedtuple
+
+# One entry of `git status`: kind is '1' (changed), '2' (renamed/copied),
+# 'u' (unmerged), '?' (untracked), '!' (ignored) or '#' (branch header, text in path)
+StatusEntry = namedtuple("StatusEntry", "kind xy path orig_path")
+
+CHUNK_SIZE = 64 * 1024
+
+
+class GitError(Exception):
+    """A git command failed"""
+
+
+def check_rev(rev):
+    """rev, if it is safe to pass to git as a revision: not empty and not option-shaped.
+
+    Revisions come from the model; one starting with '-' would be read as an
+    option (e.g. --output=<file> makes git diff/log write a file).
+    """
+    if not rev or rev.startswith("-"):
+        raise GitError(f"Invalid revision {rev!r}")
+    return rev
+
+
+def iter_nul_records(stream):
+    """Yield NUL-terminated records from a binary stream without reading it all"""
+    pending = b""
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        pending += chunk
+        *records, pending = pending.split(b"\0")
+        for record in records:
+            yield record.decode("utf-8", errors="replace")
+    if pending:
+        yield pending.decode("utf-8", errors="replace")
+
+
+class SubprocessGitBackend:
+    """Runs the git executable and streams its output instead of buffering it"""
+
+    name = "subprocess"
+
+    def __init__(self, repo_path="."):
+        self.repo_path = repo_path
+
+    def _popen(self, args):
+        return subprocess.Popen(
+            ["git", *args],
+            cwd=self.repo_path,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+
+    def _finish(self, proc, completed):
+        proc.stdout.close()
+        stderr = proc.stderr.read().decode("utf-8", errors="replace")
+        proc.stderr.close()
+        # A consumer that stops early (e.g. quitting the pager) is not an error
+        if proc.wait() != 0 and completed:
+            raise GitError(stderr.strip() or f"git exited with {proc.returncode}")
+
+    def status(self):
+        """Yield StatusEntry records parsed from `git status --porcelain=v2 -z`"""
+        proc = self._popen(["status", "--porcelain=v2", "-z", "--branch"])
+        completed = False
+        try:
+            records = iter_nul_records(proc.stdout)
+            for record in records:
+                kind = record[:1]
+                if kind == "#":
+                    yield StatusEntry("#", None, record[2:], None)
+                elif kind == "1":
+                    fields = record.split(" ", 8)
+                    yield StatusEntry("1", fields[1], fields[8], None)
+                elif kind == "2":
+                    fields = record.split(" ", 9)
+                    # The original path follows as its own NUL-terminated record
+                    yield StatusEntry("2", fields[1], fields[9], next(records, None))
+                elif kind == "u":
+                    fields = record.split(" ", 10)
+                    yield StatusEntry("u", fields[1], fields[10], None)
+                elif kind in ("?", "!"):
+                    yield StatusEntry(kind, kind * 2, record[2:], None)
+            completed = True
+        finally:
+            self._finish(proc, completed)
+
+    def diff(self, args=()):
+        """Yield `git diff` output line by line as it is produced"""
+        proc = self._popen(["diff", *args])
+        completed = False
+        try:
+            for line in proc.stdout:
+                yield line.decode("utf-8", errors="replace")
+            completed = True
+        finally:
+            self._finish(proc, completed)
+
+
+class Pygit2GitBackend:
+    """In-process status/diff through libgit2, without spawning git"""
+
+    name = "pygit2"
+
+    def __init__(self, repo_path="."):
+        import pygit2
+
+        self.pygit2 = pygit2
+        path = pygit2.discover_repository(os.path.abspath(repo_path))
+        if path is None:
+            raise GitError(f"not a git repository: {repo_path}")
+        self.repo = pygit2.Repository(path)
+
+    def _xy(self, flags):
+        p = self.pygit2
+        x = " "
+        if flags & p.GIT_STATUS_INDEX_NEW:
+            x = "A"
+        elif flags & p.GIT_STATUS_INDEX_MODIFIED:
+            x = "M"
+        elif flags & p.GIT_STATUS_INDEX_DELETED:
+            x = "D"
+        elif flags & p.GIT_STATUS_INDEX_RENAMED:
+            x = "R"
+        elif flags & p.GIT_STATUS_INDEX_TYPECHANGE:
+            x = "T"
+        y = " "
+        if flags & p.GIT_STATUS_WT_MODIFIED:
+            y = "M"
+        elif flags & p.GIT_STATUS_WT_DELETED:
+            y = "D"
+        elif flags & p.GIT_STATUS_WT_RENAMED:
+            y = "R"
+        elif flags & p.GIT_STATUS_WT_TYPECHANGE:
+            y = "T"
+        return (x + y).replace(" ", ".")
+
+    def status(self):
+        p = self.pygit2
+        if self.repo.head_is_unborn:
+            yield StatusEntry("#", None, "branch.head (unborn)", None)
+        elif self.repo.head_is_detached:
+            yield StatusEntry("#", None, "branch.head (detached)", None)
+        else:
+            yield StatusEntry("#", None, f"branch.head {self.repo.head.shorthand}", None)
+        for path, flags in sorted(self.repo.status().items()):
+            if flags & p.GIT_STATUS_IGNORED:
+                continue
+            if flags & p.GIT_STATUS_CONFLICTED:
+                yield StatusEntry("u", "UU", path, None)
+            elif flags == p.GIT_STATUS_WT_NEW:
+                yield StatusEntry("?", "??", path, None)
+            else:
+                yield StatusEntry("1", self._xy(flags), path, None)
+
+    def diff(self, args=()):
+        if args:
+            # Arbitrary git diff options are only understood by the git executable
+            yield from SubprocessGitBackend(self.repo.workdir).diff(args)
+            return
+        for patch in self.repo.diff():
+            yield from patch.text.splitlines(keepends=True)
+
+
+BACKENDS = {
+    "subprocess": SubprocessGitBackend,
+    "pygit2": Pygit2GitBackend,
+}
+
+
+def get_backend(repo_path=".", name=None):
+    """Git backend for repo_path.
+
+    VOICEGIT_GIT_BACKEND selects 'subprocess' (default) or 'pygit2'. git's own
+    status is usually faster on large trees (untracked cache, parallel index
+    preload), pygit2 avoids the process spawn for many small calls. Falls back
+    to the git executable when pygit2 is not installed.
+    """
+    name = name or os.getenv("VOICEGIT_GIT_BACKEND", "subprocess")
+    try:
+        return BACKENDS[name](repo_path)
+    except ImportError:
+        return SubprocessGitBackend(repo_path)
+
+
+def repo_location(repo_path="."):
+    """(top-level directory, current branch) of the repository at repo_path; None for either when unknown"""
+    result = subprocess.run(["git", "rev-parse", "--show-toplevel", "--abbrev-ref", "HEAD"],
+                            cwd=repo_path, capture_output=True, text=True)
+    if result.returncode != 0:
+        return None, None
+    toplevel, branch = (result.stdout.splitlines() + ["", ""])[:2]
+    # A detached HEAD has no branch name
+    return toplevel or None, branch if branch and branch != "HEAD" else None
+
+
+def format_status(entries):
+    """Render status entries in `git status --short --branch` style, one line at a time"""
+    branch = {}
+    header_done = False
+    for entry in entries:
+        if entry.kind == "#":
+            key, _, value = entry.path.partition(" ")
+            branch[key] = value
+            continue
+        if not header_done:
+            yield _branch_line(branch)
+            header_done = True
+        xy = (entry.xy or "  ").replace(".", " ")
+        if entry.orig_path:
+            yield f"{xy} {entry.orig_path} -> {entry.path}"
+        else:
+            yield f"{xy} {entry.path}"
+    if not header_done:
+        yield _branch_line(branch)
+        yield "nothing to commit, working tree clean"
+
+
+def _branch_line(branch):
+    line = f"## {branch.get('branch.head', '(unknown)')}"
+    if branch.get("branch.upstream"):
+        line += f"...{branch['branch.upstream']}"
+    ahead_behind = branch.get("branch.ab", "").split()
+    if len(ahead_behind) == 2 and ahead_behind != ["+0", "-0"]:
+        line += f" [ahead {ahead_behind[0][1:]}, behind {ahead_behind[1][1:]}]"
+    return line
+
+
+def benchmark_backends(files=100000, modified=1000):
+    """Time status and diff of each available backend on a synthetic repository"""
+    import shutil
+    import tempfile
+    import time
+
+    repo = tempfile.mkdtemp(prefix="voicegit-bench-")
+    try:
+        print(f"Creating synthetic repository with {files} files in {repo} ...")
+        subprocess.run(["git", "init", "-q"], cwd=repo, check=True)
+        for i in range(files):
+            directory = os.path.join(repo, f"d{i // 1000:03d}")
+            if i % 1000 == 0:
+                os.makedirs(directory)
+            with open(os.path.join(directory, f"f{i}.txt"), "w") as f:
+                f.write(f"line {i}\n" * 5)
+        subprocess.run(["git", "add", "-A"], cwd=repo, check=True)
+        subprocess.run(["git", "-c", "user.name=bench", "-c", "user.email=bench@example.com",
+                        "commit", "-qm", "synthetic"], cwd=repo, check=True)
+        for i in range(0, files, max(files // modified, 1)):
+            with open(os.path.join(repo, f"d{i // 1000:03d}", f"f{i}.txt"), "a") as f:
+                f.write("changed\n")
+
+        for name, backend_class in BACKENDS.items():
+            try:
+                backend = backend_class(repo)
+            except ImportError:
+                print(f"  {name:10} not installed")
+                continue
+            start = time.perf_counter()
+            entries = sum(1 for _ in backend.status())
+            status_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            lines = sum(1 for _ in backend.diff())
+            diff_seconds = time.perf_counter() - start
+            print(f"  {name:10} status {status_seconds * 1000:8.1f} ms ({entries} entries)"
+                  f"   diff {diff_seconds * 1000:8.1f} ms ({lines} lines)")
+    finally:
+        shutil.rmtree(repo, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        benchmark_backends(int(sys.argv[2]) if len(sys.argv) > 2 else 100000)
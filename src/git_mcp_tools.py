@@ -0,0 +1,399 @@
+import asyncio
+import json
+import os
+import subprocess
+from typing import Any, Dict, List, Optional
+from mcp.server.fastmcp import FastMCP
+import commit_index
+from diff_pipeline import DEFAULT_MAX_BYTES, DEFAULT_MAX_FILES, DEFAULT_MAX_LINES, structured_diff
+from git_backend import GitError, check_rev, iter_nul_records
+from git_objects import get_object_reader
+
+# Local git MCP server: answers questions about a repository on disk without
+# going through the GitHub API.
+
+# Repository used when a tool is called without repo_path
+GIT_REPO_PATH = os.getenv("GIT_REPO_PATH", ".")
+
+# Upper bound on commits returned by git_log
+GIT_MAX_LOG_COUNT = 200
+
+# Field/record separators for `git log -z` output
+FIELD_SEP = "\x1f"
+RECORD_START = "\x1e"
+LOG_FORMAT = RECORD_START + FIELD_SEP.join(["%H", "%P", "%an", "%ae", "%at", "%s"])
+
+EMPTY_TREE_SHA = "4b825dc642cb6eb9a060e54bf8d69288fbee4904"
+
+
+def run_git(repo_path: str, args: List[str]) -> str:
+    """Run a short git command and return its stdout"""
+    result = subprocess.run(["git", *args], cwd=repo_path, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise GitError(result.stderr.strip() or f"git {args[0]} failed")
+    return result.stdout
+
+
+def parse_commit(content: bytes) -> Dict[str, Any]:
+    """Parse a raw commit object from cat-file into headers and message"""
+    text = content.decode("utf-8", errors="replace")
+    headers, _, message = text.partition("\n\n")
+    commit: Dict[str, Any] = {"parents": []}
+    for line in headers.splitlines():
+        key, _, value = line.partition(" ")
+        if key == "parent":
+            commit["parents"].append(value)
+        elif key in ("tree", "author", "committer"):
+            commit[key] = value
+    commit["message"] = message.strip()
+    return commit
+
+
+def read_log(repo_path: str, max_count: int, rev: str, path: str, author: str, since: str, include_files: bool) -> List[Dict[str, Any]]:
+    args = ["log", "-z", f"--format={LOG_FORMAT}", f"-n{max_count}"]
+    if include_files:
+        args.append("--name-only")
+    if author:
+        args.append(f"--author={author}")
+    if since:
+        args.append(f"--since={since}")
+    if rev:
+        args.append(check_rev(rev))
+    if path:
+        args.extend(["--", path])
+
+    proc = subprocess.Popen(["git", *args], cwd=repo_path, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    commits = []
+    try:
+        for record in iter_nul_records(proc.stdout):
+            if record.startswith(RECORD_START):
+                sha, parents, name, email, timestamp, subject = record[1:].split(FIELD_SEP, 5)
+                commits.append({
+                    "sha": sha,
+                    "parents": parents.split(),
+                    "author": name,
+                    "email": email,
+                    "timestamp": int(timestamp),
+                    "subject": subject,
+                    "files": [] if include_files else None
+                })
+            elif commits and include_files and record.strip():
+                commits[-1]["files"].append(record.lstrip("\n"))
+    finally:
+        proc.stdout.close()
+        stderr = proc.stderr.read().decode("utf-8", errors="replace")
+        proc.stderr.close()
+        if proc.wait() != 0:
+            raise GitError(stderr.strip() or "git log failed")
+    return commits
+
+
+def read_blame(repo_path: str, path: str, rev: str, start_line: int, end_line: int) -> Dict[str, Any]:
+    args = ["blame", "--porcelain"]
+    if start_line > 0:
+        args.append(f"-L{start_line},{end_line if end_line >= start_line else ''}")
+    if rev:
+        args.append(check_rev(rev))
+    args.extend(["--", path])
+    output = run_git(repo_path, args)
+
+    commits: Dict[str, Dict[str, Any]] = {}
+    lines = []
+    current = None
+    for line in output.splitlines():
+        if line.startswith("\t"):
+            lines.append({"line": current["line"], "commit": current["sha"][:12], "content": line[1:]})
+            continue
+        key, _, value = line.partition(" ")
+        if len(key) == 40 and all(c in "0123456789abcdef" for c in key):
+            current = {"sha": key, "line": int(value.split()[1])}
+            commits.setdefault(key, {"lines": 0})
+            commits[key]["lines"] += 1
+        elif current and key in ("author", "author-time", "summary"):
+            commits[current["sha"]][key.replace("-", "_")] = int(value) if key == "author-time" else value
+
+    authors: Dict[str, int] = {}
+    for info in commits.values():
+        authors[info.get("author", "?")] = authors.get(info.get("author", "?"), 0) + info["lines"]
+    return {
+        "path": path,
+        "authors": dict(sorted(authors.items(), key=lambda item: -item[1])),
+        "commits": {sha[:12]: info for sha, info in commits.items()},
+        "lines": lines
+    }
+
+
+# Initialize FastMCP server
+mcp = FastMCP("Git")
+
+
+@mcp.tool()
+async def get_diff(repo_path: str = GIT_REPO_PATH, paths: Optional[List[str]] = None, staged: bool = False, ref: str = "", stats_only: bool = False, max_bytes: int = DEFAULT_MAX_BYTES, max_lines: int = DEFAULT_MAX_LINES, max_files: int = DEFAULT_MAX_FILES) -> str:
+    """
+    Get a bounded, structured diff of a local repository
+
+    Per-file stats (added/removed lines, binary flag) come first, for the most
+    changed files up to max_files; hunks follow until the byte/line budget is
+    used up. files_total and files_omitted count the files left out. Ask again
+    with specific paths to see files that were cut off.
+
+    Args:
+        repo_path: Path of the local repository
+        paths: Only diff these files/directories
+        staged: Diff the index against HEAD instead of the working tree against the index
+        ref: Compare the working tree (or index with staged) against this commit/branch
+        stats_only: Only return per-file stats, no hunks
+        max_bytes: Maximum bytes of file stats and hunk content returned
+        max_lines: Maximum hunk lines returned
+        max_files: Maximum files with per-file stats
+    """
+    try:
+        args = ["--cached"] if staged else []
+        result = await asyncio.to_thread(
+            structured_diff, repo_path, args, paths or (), max_bytes, max_lines, not stats_only, [ref] if ref else [],
+            max_files
+        )
+        return json.dumps({"repository": os.path.abspath(repo_path), **result}, indent=2)
+    except Exception as e:
+        return f"Error getting diff for {repo_path}: {str(e)}"
+
+
+@mcp.tool()
+async def git_log(repo_path: str = GIT_REPO_PATH, max_count: int = 10, rev: str = "", path: str = "", author: str = "", since: str = "", include_files: bool = True) -> str:
+    """
+    List commits of a local repository, newest first
+
+    Args:
+        repo_path: Path of the local repository
+        max_count: Number of commits (max 200)
+        rev: Branch, tag or range to list (e.g. 'main', 'v1.0..HEAD'); current branch if empty
+        path: Only commits touching this file/directory
+        author: Only commits whose author matches this pattern
+        since: Only commits after this date (e.g. '2 weeks ago', '2024-01-01')
+        include_files: Include the files changed by each commit
+    """
+    try:
+        commits = await asyncio.to_thread(
+            read_log, repo_path, min(max(max_count, 1), GIT_MAX_LOG_COUNT), rev, path, author, since, include_files
+        )
+        return json.dumps({"repository": os.path.abspath(repo_path), "total_commits": len(commits), "commits": commits}, indent=2)
+    except Exception as e:
+        return f"Error getting log for {repo_path}: {str(e)}"
+
+
+@mcp.tool()
+async def git_show(repo_path: str = GIT_REPO_PATH, rev: str = "HEAD", path: str = "", max_bytes: int = DEFAULT_MAX_BYTES, max_lines: int = DEFAULT_MAX_LINES) -> str:
+    """
+    Show a commit (metadata, message and bounded diff) or a file as it was at a commit
+
+    Args:
+        repo_path: Path of the local repository
+        rev: Commit, branch or tag (default: HEAD)
+        path: If set, return the content of this file at rev instead of the commit
+        max_bytes: Maximum bytes of diff/file content returned
+        max_lines: Maximum diff lines returned
+    """
+    try:
+        check_rev(rev)
+        reader = get_object_reader(repo_path)
+        if path:
+            blob = await reader.read(f"{rev}:{path}")
+            if blob is None or blob.type != "blob":
+                return f"Error: {path} not found as a file at {rev}"
+            content = blob.data
+            try:
+                text = content[:max_bytes].decode("utf-8")
+            except UnicodeDecodeError:
+                text = "[Binary file - cannot display as text]"
+            return json.dumps({
+                "rev": rev,
+                "path": path,
+                "size": len(content),
+                "truncated": len(content) > max_bytes,
+                "content": text
+            }, indent=2)
+
+        found = await reader.read(f"{rev}^{{commit}}")
+        if found is None:
+            return f"Error: unknown revision {rev}"
+        commit = parse_commit(found.data)
+        # A root commit is diffed against the empty tree
+        base = commit["parents"][0] if commit["parents"] else EMPTY_TREE_SHA
+        diff = await asyncio.to_thread(structured_diff, repo_path, [], (), max_bytes, max_lines,
+                                       revs=[base, rev])
+        return json.dumps({"rev": rev, **commit, **diff}, indent=2)
+    except Exception as e:
+        return f"Error showing {rev} in {repo_path}: {str(e)}"
+
+
+@mcp.tool()
+async def git_blame(path: str, repo_path: str = GIT_REPO_PATH, rev: str = "", start_line: int = 0, end_line: int = 0) -> str:
+    """
+    Show who last changed each line of a file, with a per-author line count
+
+    Args:
+        path: File path relative to the repository root
+        repo_path: Path of the local repository
+        rev: Blame the file as of this commit (working tree if empty)
+        start_line: First line to blame (whole file if 0)
+        end_line: Last line to blame (to end of file if 0)
+    """
+    try:
+        result = await asyncio.to_thread(read_blame, repo_path, path, rev, start_line, end_line)
+        return json.dumps(result, indent=2)
+    except Exception as e:
+        return f"Error blaming {path} in {repo_path}: {str(e)}"
+
+
+@mcp.tool()
+async def git_branch(repo_path: str = GIT_REPO_PATH, include_remote: bool = False) -> str:
+    """
+    List branches with their last commit, upstream and ahead/behind state
+
+    Args:
+        repo_path: Path of the local repository
+        include_remote: Also list remote-tracking branches
+    """
+    try:
+        refs = ["refs/heads"] + (["refs/remotes"] if include_remote else [])
+        fields = ["%(HEAD)", "%(refname:short)", "%(objectname:short)", "%(upstream:short)",
+                  "%(upstream:track)", "%(committerdate:iso8601)", "%(subject)"]
+        output = await asyncio.to_thread(
+            run_git, repo_path, ["for-each-ref", f"--format={FIELD_SEP.join(fields)}", *refs]
+        )
+        branches = []
+        for line in output.splitlines():
+            head, name, sha, upstream, track, date, subject = line.split(FIELD_SEP, 6)
+            branches.append({
+                "name": name,
+                "current": head == "*",
+                "commit": sha,
+                "upstream": upstream or None,
+                "track": track or None,
+                "last_commit_date": date,
+                "last_commit_subject": subject
+            })
+        return json.dumps({"repository": os.path.abspath(repo_path), "branches": branches}, indent=2)
+    except Exception as e:
+        return f"Error listing branches in {repo_path}: {str(e)}"
+
+
+@mcp.tool()
+async def git_stash(repo_path: str = GIT_REPO_PATH, action: str = "list", message: str = "", index: int = 0) -> str:
+    """
+    List, create, apply, pop or drop stashes
+
+    Args:
+        repo_path: Path of the local repository
+        action: One of list, push, apply, pop, drop
+        message: Message for push
+        index: Stash index for apply, pop and drop (stash@{index})
+    """
+    try:
+        if action == "list":
+            output = await asyncio.to_thread(run_git, repo_path, ["stash", "list", "--format=%gd%x1f%s"])
+            stashes = [dict(zip(("ref", "message"), line.split(FIELD_SEP, 1))) for line in output.splitlines()]
+            return json.dumps({"repository": os.path.abspath(repo_path), "stashes": stashes}, indent=2)
+        if action == "push":
+            args = ["stash", "push"] + (["-m", message] if message else [])
+        elif action in ("apply", "pop", "drop"):
+            args = ["stash", action, f"stash@{{{index}}}"]
+        else:
+            return f"Error: unknown stash action {action}"
+        output = await asyncio.to_thread(run_git, repo_path, args)
+        return output.strip() or f"git stash {action} done"
+    except Exception as e:
+        return f"Error running git stash {action} in {repo_path}: {str(e)}"
+
+
+@mcp.tool()
+async def git_add(paths: List[str], repo_path: str = GIT_REPO_PATH) -> str:
+    """
+    Stage files for the next commit
+
+    Args:
+        paths: Files or directories to stage (use ['.'] for everything)
+        repo_path: Path of the local repository
+    """
+    try:
+        await asyncio.to_thread(run_git, repo_path, ["add", "--", *paths])
+        diff = await asyncio.to_thread(structured_diff, repo_path, ["--cached"], (), DEFAULT_MAX_BYTES, DEFAULT_MAX_LINES, False)
+        return json.dumps({"staged": diff["files"], "staged_total": diff["files_total"]}, indent=2)
+    except Exception as e:
+        return f"Error staging {paths} in {repo_path}: {str(e)}"
+
+
+@mcp.tool()
+async def git_commit(message: str, repo_path: str = GIT_REPO_PATH, all: bool = False) -> str:
+    """
+    Commit the staged changes
+
+    Args:
+        message: Commit message
+        repo_path: Path of the local repository
+        all: Also stage every modified tracked file first (git commit -a)
+    """
+    try:
+        args = ["commit", "-m", message] + (["-a"] if all else [])
+        await asyncio.to_thread(run_git, repo_path, args)
+        commits = await asyncio.to_thread(read_log, repo_path, 1, "HEAD", "", "", "", True)
+        return json.dumps({"committed": commits[0]}, indent=2)
+    except Exception as e:
+        return f"Error committing in {repo_path}: {str(e)}"
+
+
+@mcp.tool()
+async def git_file_authors(path: str, repo_path: str = GIT_REPO_PATH, limit: int = 10) -> str:
+    """
+    Rank the people who changed a file or directory most often (by number of commits)
+
+    Args:
+        path: File or directory relative to the repository root
+        repo_path: Path of the local repository
+        limit: Number of authors returned
+    """
+    try:
+        authors = await asyncio.to_thread(commit_index.query, repo_path, "file_authors", path, limit)
+        return json.dumps({"path": path, "authors": authors}, indent=2)
+    except Exception as e:
+        return f"Error ranking authors of {path} in {repo_path}: {str(e)}"
+
+
+@mcp.tool()
+async def git_commits_since(base: str, repo_path: str = GIT_REPO_PATH, head: str = "HEAD", limit: int = 50) -> str:
+    """
+    Commits on head that are not in base, e.g. everything since tag v1.0
+
+    Args:
+        base: Tag, branch or commit to start from (excluded)
+        repo_path: Path of the local repository
+        head: Branch or commit to end at (default: HEAD)
+        limit: Maximum commits listed; the total count is always returned
+    """
+    try:
+        result = await asyncio.to_thread(commit_index.query, repo_path, "commits_since", base, head, limit)
+        return json.dumps(result, indent=2)
+    except Exception as e:
+        return f"Error listing commits since {base} in {repo_path}: {str(e)}"
+
+
+@mcp.tool()
+async def git_branches_containing(rev: str, repo_path: str = GIT_REPO_PATH, kind: str = "heads") -> str:
+    """
+    List the branches or tags that contain a commit
+
+    Args:
+        rev: Commit sha, tag or branch to look for
+        repo_path: Path of the local repository
+        kind: 'heads' for local branches, 'remotes' for remote branches, 'tags' for tags
+    """
+    try:
+        refs = await asyncio.to_thread(commit_index.query, repo_path, "refs_containing", rev, kind)
+        return json.dumps({"rev": rev, "kind": kind, "refs": refs}, indent=2)
+    except Exception as e:
+        return f"Error finding refs containing {rev} in {repo_path}: {str(e)}"
+
+
+if __name__ == "__main__":
+    # Run as MCP server
+    mcp.run(transport="stdio")
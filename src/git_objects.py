@@ -0,0 +1,238 @@
+import asyncio
+import os
+import re
+import sys
+import time
+from collections import deque, namedtuple
+from git_backend import GitError
+
+# Header of an object as reported by `git cat-file --batch-check`
+ObjectInfo = namedtuple("ObjectInfo", "sha type size")
+# Object with its content as returned by `git cat-file --batch`
+GitObject = namedtuple("GitObject", "sha type size data")
+# SHA-1 or SHA-256 object id
+SHA_PATTERN = re.compile(r"^[0-9a-f]{40}([0-9a-f]{24})?$")
+
+
+class CatFileProcess:
+    """One `git cat-file --batch` or `--batch-check` process.
+
+    cat-file answers requests strictly in order, so requests are pipelined:
+    each one writes its object name and queues a future, and a single reader
+    task resolves the futures as the answers come back.
+    """
+
+    def __init__(self, repo_path, batch_check=False):
+        self.repo_path = repo_path
+        self.batch_check = batch_check
+        self.proc = None
+        self.pending = deque()
+        self._reader = None
+
+    @property
+    def alive(self):
+        return self.proc is not None and self.proc.returncode is None and not self._reader.done()
+
+    async def start(self):
+        self.proc = await asyncio.create_subprocess_exec(
+            "git", "cat-file", "--batch-check" if self.batch_check else "--batch",
+            cwd=self.repo_path,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL
+        )
+        self._reader = asyncio.create_task(self._read_loop())
+
+    async def _read_loop(self):
+        stdout = self.proc.stdout
+        try:
+            while True:
+                header = await stdout.readline()
+                if not header:
+                    raise GitError("git cat-file exited")
+                parts = header.decode(errors="replace").split()
+                if parts and parts[-1] in ("missing", "ambiguous"):
+                    # "<name> missing" / "<name> ambiguous"; the name may itself contain spaces
+                    result = None
+                elif len(parts) != 3 or not SHA_PATTERN.match(parts[0]) or not parts[2].isdigit():
+                    raise GitError(f"unexpected git cat-file header: {header!r}")
+                else:
+                    sha, object_type, size = parts[0], parts[1], int(parts[2])
+                    if self.batch_check:
+                        result = ObjectInfo(sha, object_type, size)
+                    else:
+                        data = await stdout.readexactly(size + 1)
+                        result = GitObject(sha, object_type, size, data[:-1])
+                future = self.pending.popleft()
+                if not future.done():
+                    future.set_result(result)
+        except Exception as e:
+            error = e if isinstance(e, GitError) else GitError(f"git cat-file failed: {e}")
+            while self.pending:
+                future = self.pending.popleft()
+                if not future.done():
+                    future.set_exception(error)
+
+    async def request(self, name):
+        # Writing and queueing the future happen without awaiting in between,
+        # so the order of pending futures always matches the order on stdin
+        future = asyncio.get_running_loop().create_future()
+        self.proc.stdin.write(name.encode() + b"\n")
+        self.pending.append(future)
+        await self.proc.stdin.drain()
+        return await future
+
+    async def close(self):
+        if self.proc is None:
+            return
+        if self.proc.returncode is None:
+            try:
+                self.proc.stdin.close()
+                await asyncio.wait_for(self.proc.wait(), timeout=5)
+            except (asyncio.TimeoutError, ConnectionError):
+                self.proc.kill()
+                await self.proc.wait()
+        if self._reader is not None:
+            await asyncio.gather(self._reader, return_exceptions=True)
+        self.proc = None
+
+
+class GitObjectReader:
+    """Long-lived cat-file processes for one repository, shared by asyncio tasks.
+
+    Keeps up to `processes` `--batch` and `--batch-check` processes each and
+    sends every request to the one with the fewest requests in flight. A
+    process that dies is replaced on the next request, and a request that
+    failed because its process died is retried once on a fresh one.
+    """
+
+    def __init__(self, repo_path=".", processes=2):
+        self.repo_path = os.path.abspath(repo_path)
+        self.processes = max(processes, 1)
+        self._pools = {True: [], False: []}
+        self._lock = asyncio.Lock()
+        self.requests = 0
+        self.restarts = 0
+
+    async def _process(self, batch_check):
+        pool = self._pools[batch_check]
+        idle = [p for p in pool if p.alive and not p.pending]
+        if idle:
+            return idle[0]
+        async with self._lock:
+            for process in [p for p in pool if not p.alive]:
+                pool.remove(process)
+                self.restarts += 1
+                await process.close()
+            if len(pool) < self.processes:
+                process = CatFileProcess(self.repo_path, batch_check)
+                await process.start()
+                pool.append(process)
+                return process
+        return min(pool, key=lambda p: len(p.pending))
+
+    async def _request(self, name, batch_check):
+        if "\n" in name:
+            raise ValueError(f"invalid object name: {name!r}")
+        self.requests += 1
+        process = await self._process(batch_check)
+        try:
+            return await process.request(name)
+        except (GitError, ConnectionError):
+            if process.alive:
+                raise
+            process = await self._process(batch_check)
+            return await process.request(name)
+
+    async def info(self, name):
+        """ObjectInfo for an object name (sha, 'HEAD:path', 'v1.0^{commit}', ...) or None"""
+        return await self._request(name, True)
+
+    async def read(self, name):
+        """GitObject with the object's content, or None if it does not exist"""
+        return await self._request(name, False)
+
+    async def read_many(self, names):
+        """Read several objects concurrently; results are in the order of names"""
+        return await asyncio.gather(*(self.read(name) for name in names))
+
+    async def aclose(self):
+        """Stop every cat-file process"""
+        processes = self._pools[True] + self._pools[False]
+        self._pools = {True: [], False: []}
+        await asyncio.gather(*(process.close() for process in processes))
+
+    def stats(self):
+        return {
+            "repository": self.repo_path,
+            "requests": self.requests,
+            "restarts": self.restarts,
+            "batch_processes": sum(p.alive for p in self._pools[False]),
+            "batch_check_processes": sum(p.alive for p in self._pools[True])
+        }
+
+
+_readers = {}
+
+
+def get_object_reader(repo_path="."):
+    """Shared GitObjectReader for a repository, created on first use"""
+    key = os.path.abspath(repo_path)
+    if key not in _readers:
+        _readers[key] = GitObjectReader(key)
+    return _readers[key]
+
+
+async def close_object_readers():
+    await asyncio.gather(*(reader.aclose() for reader in _readers.values()))
+    _readers.clear()
+
+
+async def benchmark_reader(blobs=50000, per_call_sample=1000):
+    """Read `blobs` blobs through GitObjectReader and a sample through one `git cat-file` per blob"""
+    import shutil
+    import subprocess
+    import tempfile
+
+    repo = tempfile.mkdtemp(prefix="voicegit-bench-")
+    try:
+        print(f"Writing {blobs} blobs to {repo} ...")
+        subprocess.run(["git", "init", "-q"], cwd=repo, check=True)
+        marks = os.path.join(repo, "marks")
+        stream = bytearray()
+        for i in range(blobs):
+            data = f"blob {i}\n".encode() * 8
+            stream += b"blob\nmark :%d\ndata %d\n%s\n" % (i + 1, len(data), data)
+        subprocess.run(["git", "fast-import", "--quiet", f"--export-marks={marks}"],
+                       cwd=repo, input=bytes(stream), check=True)
+        with open(marks) as f:
+            shas = [line.split()[1] for line in f]
+
+        reader = GitObjectReader(repo)
+        try:
+            start = time.perf_counter()
+            objects = []
+            for i in range(0, len(shas), 1000):
+                objects.extend(await reader.read_many(shas[i:i + 1000]))
+            pooled_seconds = time.perf_counter() - start
+        finally:
+            await reader.aclose()
+        assert all(obj is not None and obj.type == "blob" for obj in objects)
+
+        sample = shas[:per_call_sample]
+        start = time.perf_counter()
+        for sha in sample:
+            subprocess.run(["git", "cat-file", "-p", sha], cwd=repo, capture_output=True, check=True)
+        per_call_seconds = (time.perf_counter() - start) / len(sample)
+
+        print(f"  GitObjectReader   {pooled_seconds:8.2f} s for {len(shas)} blobs"
+              f" ({len(shas) / pooled_seconds:,.0f} blobs/s)")
+        print(f"  per-call git      {per_call_seconds * len(shas):8.2f} s for {len(shas)} blobs"
+              f" (extrapolated from {len(sample)}, {1 / per_call_seconds:,.0f} blobs/s)")
+    finally:
+        shutil.rmtree(repo, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        asyncio.run(benchmark_reader(int(sys.argv[2]) if len(sys.argv) > 2 else 50000))
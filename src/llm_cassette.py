@@ -0,0 +1,288 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from typing import Any
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.language_models.chat_models import agenerate_from_stream, generate_from_stream
+from langchain_core.messages import AIMessageChunk, message_chunk_to_message, messages_from_dict, messages_to_dict
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from agent_stream import content_text
+
+# Record/replay of chat model calls. In record mode a CassetteChatModel wraps a
+# provider model and saves every response with its time to first token and
+# total time; in replay mode it needs no provider, credentials or network and
+# streams the recorded responses back with the recorded (or a fixed) latency.
+# Together with github-mcp-custom/cassette.py this makes agent turns
+# repeatable offline, for benchmarks and regression checks.
+
+LLM_CASSETTE = os.getenv("VOICEGIT_LLM_CASSETTE") or None
+LLM_CASSETTE_MODE = os.getenv("VOICEGIT_LLM_CASSETTE_MODE", "replay")
+# "recorded", or seconds to first token (the rest of the response streams at the recorded pace)
+LLM_CASSETTE_LATENCY = os.getenv("VOICEGIT_LLM_CASSETTE_LATENCY", "recorded")
+# 0: answer a request missing from the cassette with the provider's next recording
+LLM_CASSETTE_STRICT = os.getenv("VOICEGIT_LLM_CASSETTE_STRICT", "1") != "0"
+
+
+class CassetteMiss(Exception):
+    """Replay got a request that is not in the cassette"""
+
+
+def request_key(provider, messages, tool_names):
+    """Stable key of a model request: message roles and text, tool calls, bound tool names.
+
+    Only the text of content blocks counts, so provider-only blocks such as
+    Bedrock cache points do not change the key.
+    """
+    shape = [
+        [message.type, content_text(message.content),
+         [[call["name"], call.get("args")] for call in getattr(message, "tool_calls", None) or []],
+         getattr(message, "tool_call_id", None)]
+        for message in messages
+    ]
+    payload = json.dumps([provider, shape, sorted(tool_names)], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:24]
+
+
+class LLMCassette:
+    """Recorded model responses in a JSON file, shared by the providers that use it
+
+    A request is answered by the next unused recording with the same key. When
+    there is none, a strict cassette raises CassetteMiss, so a changed prompt or
+    tool schema fails the replay instead of getting a stale answer. With
+    strict=False it is answered by the next unused recording of the same
+    provider (e.g. when the working directory in the prompt differs from the
+    recording machine), so a session replays in recorded order.
+    """
+
+    def __init__(self, path, strict=LLM_CASSETTE_STRICT):
+        self.path = path
+        self.strict = strict
+        self.interactions = []
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.interactions = json.load(f).get("interactions", [])
+        self._used = set()
+
+    def find(self, provider, key):
+        candidates = [i for i, item in enumerate(self.interactions) if item["provider"] == provider and i not in self._used]
+        for index in candidates:
+            if self.interactions[index]["key"] == key:
+                break
+        else:
+            if self.strict:
+                raise CassetteMiss(f"No recorded {provider} response for request {key} in {self.path}"
+                                   " (prompt, messages or tools changed since recording?)")
+            if not candidates:
+                raise CassetteMiss(f"No recorded {provider} response left in {self.path}")
+            index = candidates[0]
+        self._used.add(index)
+        return self.interactions[index]
+
+    def add(self, provider, key, message, first_token, total):
+        self.interactions.append({
+            "provider": provider,
+            "key": key,
+            "response": messages_to_dict([message])[0],
+            "first_token": round(first_token, 4),
+            "total": round(total, 4)
+        })
+        self.save()
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "interactions": self.interactions}, f, indent=1)
+        os.replace(tmp_path, self.path)
+
+
+_cassettes = {}
+
+
+def get_cassette(path):
+    if path not in _cassettes:
+        _cassettes[path] = LLMCassette(path)
+    return _cassettes[path]
+
+
+class CassetteChatModel(BaseChatModel):
+    """Chat model that records `inner`'s responses, or replays them without it.
+
+    `latency` is 'recorded' or the seconds to wait for the first token in
+    replay; tokens after the first follow at the recorded pace.
+    """
+
+    provider: str
+    cassette: Any
+    mode: str = "replay"
+    inner: Any = None
+    latency: Any = "recorded"
+    tool_names: list = []
+
+    @property
+    def _llm_type(self):
+        return "cassette"
+
+    def bind_tools(self, tools, **kwargs):
+        names = [getattr(tool, "name", None) or (tool.get("name") if isinstance(tool, dict) else None) for tool in tools]
+        inner = self.inner.bind_tools(tools, **kwargs) if self.inner is not None else None
+        return self.model_copy(update={"inner": inner, "tool_names": [name for name in names if name]})
+
+    def _replay_chunks(self, message):
+        """The recorded message as stream chunks: text split at word boundaries, tool calls last"""
+        text = content_text(message.content)
+        pieces = re.findall(r"\S+\s*|\s+", text) or [""]
+        for index, piece in enumerate(pieces):
+            last = index == len(pieces) - 1
+            yield AIMessageChunk(
+                content=piece,
+                tool_call_chunks=[
+                    {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": n}
+                    for n, call in enumerate(message.tool_calls)
+                ] if last else [],
+                usage_metadata=message.usage_metadata if last else None,
+                response_metadata={"cassette": True} if last else {}
+            )
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        key = request_key(self.provider, messages, self.tool_names)
+        if self.mode == "replay":
+            recorded = self.cassette.find(self.provider, key)
+            message = messages_from_dict([recorded["response"]])[0]
+            chunks = list(self._replay_chunks(message))
+            first = recorded["first_token"] if self.latency == "recorded" else float(self.latency)
+            pace = max(recorded["total"] - recorded["first_token"], 0) / max(len(chunks) - 1, 1)
+            await asyncio.sleep(first)
+            for index, chunk in enumerate(chunks):
+                if index:
+                    await asyncio.sleep(pace)
+                yield ChatGenerationChunk(message=chunk)
+            return
+
+        start = time.perf_counter()
+        first_token = None
+        merged = None
+        # "nostream": the chunks reach LangGraph's message stream through this model only
+        async for chunk in self.inner.astream(messages, {"tags": ["nostream"]}, stop=stop, **kwargs):
+            if first_token is None:
+                first_token = time.perf_counter() - start
+            merged = chunk if merged is None else merged + chunk
+            yield ChatGenerationChunk(message=chunk)
+        if merged is not None:
+            self.cassette.add(self.provider, key, message_chunk_to_message(merged), first_token,
+                              time.perf_counter() - start)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        return await agenerate_from_stream(self._astream(messages, stop, run_manager, **kwargs))
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        key = request_key(self.provider, messages, self.tool_names)
+        if self.mode == "replay":
+            recorded = self.cassette.find(self.provider, key)
+            return ChatResult(generations=[ChatGeneration(message=messages_from_dict([recorded["response"]])[0])])
+        start = time.perf_counter()
+        message = self.inner.invoke(messages, {"tags": ["nostream"]}, stop=stop, **kwargs)
+        seconds = time.perf_counter() - start
+        self.cassette.add(self.provider, key, message, seconds, seconds)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+def with_cassette(provider, build):
+    """Provider model from build(), wrapped per VOICEGIT_LLM_CASSETTE[_MODE]; replay never calls build()"""
+    if not LLM_CASSETTE:
+        return build()
+    if LLM_CASSETTE_MODE not in ("record", "replay"):
+        raise ValueError(f"VOICEGIT_LLM_CASSETTE_MODE must be 'record' or 'replay', not {LLM_CASSETTE_MODE!r}")
+    latency = LLM_CASSETTE_LATENCY if LLM_CASSETTE_LATENCY == "recorded" else float(LLM_CASSETTE_LATENCY)
+    return CassetteChatModel(
+        provider=provider,
+        cassette=get_cassette(LLM_CASSETTE),
+        mode=LLM_CASSETTE_MODE,
+        inner=build() if LLM_CASSETTE_MODE == "record" else None,
+        latency=latency
+    )
+
+
+async def benchmark_replay(turns=5, path=None):
+    """Record an agent session against a slow fake provider, then replay it offline at several latencies"""
+    import tempfile
+    from langchain_core.tools import StructuredTool
+    from agent_stream import ToolProgress, stream_agent
+    from tool_execution import build_agent
+
+    class SlowProvider(BaseChatModel):
+        """Stands in for Bedrock: 400 ms to first token, 20 ms per token, one tool call per question"""
+        calls: list = []
+
+        @property
+        def _llm_type(self):
+            return "slow-fake"
+
+        def bind_tools(self, tools, **kwargs):
+            return self
+
+        def _script(self, messages):
+            """(seconds to wait, chunk) pairs of one reply"""
+            self.calls.append(1)
+            if messages[-1].type == "human":
+                yield 0.4, AIMessageChunk(content="Checking.", tool_call_chunks=[
+                    {"name": "list_org_repos", "args": json.dumps({"org": "acme"}), "id": f"call_{len(self.calls)}",
+                     "index": 0}])
+                return
+            for index, word in enumerate(f"acme has {len(messages)} repositories you can access".split()):
+                yield (0.42 if index == 0 else 0.02), AIMessageChunk(content=word + " ")
+
+        def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+            for seconds, chunk in self._script(messages):
+                time.sleep(seconds)
+                yield ChatGenerationChunk(message=chunk)
+
+        def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+            return generate_from_stream(self._stream(messages, stop, run_manager, **kwargs))
+
+        async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+            for seconds, chunk in self._script(messages):
+                await asyncio.sleep(seconds)
+                yield ChatGenerationChunk(message=chunk)
+
+    def list_org_repos(org: str) -> str:
+        """List the repositories of an organization"""
+        return json.dumps([f"{org}/service-api", f"{org}/service-web"])
+
+    tools = [StructuredTool.from_function(list_org_repos)]
+    path = path or os.path.join(tempfile.mkdtemp(), "llm_cassette.json")
+
+    async def session(model):
+        agent = build_agent(model, tools, "Your are a Git Agent")
+        answers, start = [], time.perf_counter()
+        for turn in range(turns):
+            text = ""
+            async for piece in stream_agent(agent, [{"role": "user", "content": f"list repos in acme ({turn})"}]):
+                if not isinstance(piece, ToolProgress):
+                    text += piece
+            answers.append(text)
+        return answers, time.perf_counter() - start
+
+    cassette = LLMCassette(path)
+    recorded, seconds = await session(CassetteChatModel(provider="aws", cassette=cassette, mode="record",
+                                                        inner=SlowProvider()))
+    print(f"{turns} agent turns ({len(cassette.interactions)} model calls) recorded to {path}")
+    print(f"  {'record (live)':22} {seconds:6.2f}s")
+    for latency in ("recorded", 0.05, 0.0):
+        replayed, seconds = await session(CassetteChatModel(provider="aws", cassette=LLMCassette(path),
+                                                            latency=latency))
+        print(f"  replay latency={latency!s:9} {seconds:6.2f}s  identical answers: {replayed == recorded}")
+        assert replayed == recorded
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        asyncio.run(benchmark_replay())
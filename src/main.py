@@ -3,107 +3,22 @@ import os
 import json
 from pathlib import Path
 import time 
-from model import azure_llm,aws_llm
-from langgraph.prebuilt import create_react_agent
-from mcp_tools import client
+from model import get_azure_llm, get_aws_llm, get_llm
+from mcp_tools import client, server_manager, compactor
+from user_config import show_config_location, greet, config, get_config_path, read_config
+from agent_session import AgentSession
+from agent_stream import ToolProgress, stream_agent
+from conversation_memory import ConversationMemory, llm_summarizer
+from git_backend import repo_location
+from answer_cache import AnswerCache, plan_from_messages, repo_state
+from tracing import span
 from colorama import init, Fore, Back, Style
 
 init(autoreset=True)
 
-def show_config_location():
-    """Show where config file is stored"""
-    config_path = get_config_path()
-    print(f"📁 Config file location: {config_path}")
-    if config_path.exists():
-        print("✅ Config file exists")
-    else:
-        print("⚠️ Config file not found")
-    return config_path
-
-def greet():
-    try:
-    
-
-        config_data = read_config()
-
-        if config_data and "user" in config_data:
-            user = config_data["user"]
-            return f"Hello {user["name"]}"
-
-        return "Hello Hemanth you can do it"
-    except Exception as e:
-        print("Error ",e)
-
-
-def config(name,email):
-    try:
-
-        """ Create or update config.json with user details"""
-
-        config_file = Path("src/config.json")
-        import time
-        user_config = { 
-            "user": {
-                "name": name,
-                "email": email,
-                "created_at": str(time.time())
-            }
-        }
-
-        if config_file.exists():
-            with open(config_file,'r',encoding='utf-8') as f:
-                existing_config = json.load(f)
-            
-            existing_config["user"]['name'] = name
-            existing_config["user"]["email"] = email
-
-            with open(config_file,'w',encoding='utf-8') as f:
-                json.dump(existing_config,f,indent=4,ensure_ascii=False)
-
-            print(f" Updated Config for :{name}, {email}")
-        else:
-                # Create new config file
-                with open(config_file, 'w', encoding='utf-8') as f:
-                    json.dump(user_config, f, indent=4, ensure_ascii=False)
-                
-                print(f"✅ Created new config for: {name} ({email})")
-            
-        return config_file
-    except Exception as e:
-        print(f"❌ Error managing config: {e}")
-        return None
-    
-
-
-def  get_config_path():
-    """ Get Consistent COnfig file path regardless of the current directory"""
-
-    return Path(__file__).parent / "config.json"
-
-
-def read_config():
-    
-    """Read and return config data"""
-    config_file = get_config_path()
-    
-    try:
-        if config_file.exists():
-            with open(config_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        else:
-            print("⚠️ Config file not found")
-            return None
-    except Exception as e:
-        print(f"❌ Error reading config: {e}")
-        return None
-    
-
 def llm_call(messages):
 
-    if len(messages) > 5:
-        response = azure_llm.invoke(messages[-5:])
-    else:
-        response = azure_llm.invoke(messages)
+    response = get_azure_llm().invoke(filter(messages))
         
 
     
@@ -113,76 +28,59 @@ def llm_call(messages):
 
 
 def filter(messages):
-    if len(messages)> 5:
-        context_messages = messages[-5:]
-    else:
-        context_messages = messages
-    return context_messages
-
-async def azure_agent(messages):
+    """Context for the next model call: pinned facts, summary of old turns and the
+    newest turns that fit in the token budget (VOICEGIT_CONTEXT_TOKENS)"""
+    if not isinstance(messages, ConversationMemory):
+        messages = ConversationMemory(messages=messages)
+    return messages.context()
 
-    tools = await client.get_tools()
-    # tools = []
+async def azure_agent(messages, session=None, recorder=None, stats=None):
 
-    
+    if session is None:
+        session = AgentSession(get_azure_llm(), client)
 
-    GitAgent = create_react_agent(model=azure_llm,prompt="Your are a Git Agent which does takes for Git Actions if your asks give about me use get_me tool first gather user info ",tools=tools)
+    GitAgent = await session.get_graph()
     context_messages = filter(messages)
-  
-    async for chunk in GitAgent.astream({"messages": context_messages}):
-    # Check if this chunk contains agent messages
-        if "agent" in chunk:
-            if "messages" in chunk["agent"]:
-                for message in chunk["agent"]["messages"]:
-                    if hasattr(message, 'content') and message.content:
-                        yield message.content
 
+    async for chunk in stream_agent(GitAgent, context_messages, recorder, stats):
+        yield chunk
 
 
+async def aws_agent(messages, session=None, recorder=None, stats=None):
 
-async def aws_agent(messages):
+    if session is None:
+        session = AgentSession(get_aws_llm(), client)
 
-    tools = await client.get_tools()
+    GitAgent = await session.get_graph()
+    context_messages = filter(messages)
 
-    # tools = []
+    # Tokens are yielded as the model produces them; tool progress comes as
+    # ToolProgress lines, which are shown but not part of the answer
+    async for chunk in stream_agent(GitAgent, context_messages, recorder, stats):
+        yield chunk
 
-    GitAgent = create_react_agent(model=aws_llm,prompt="Your are a Git Agent which does takes for Git Actions if your asks give about me use get_me tool first gather user info ",tools=tools)
-    context_messages = filter(messages)
-    
-    
-    # return  response["messages"][-1].content
-    async for chunk in GitAgent.astream({"messages": context_messages}):
-        if "agent" in chunk:
-            if "messages" in chunk["agent"]:
-                for message in chunk["agent"]["messages"]:
-                    if hasattr(message, 'content'):
-                        # Handle different content types
-                        if isinstance(message.content, str):
-                            yield message.content
-                        elif isinstance(message.content, list):
-                            for content_item in message.content:
-                                if isinstance(content_item, dict):
-                                    if content_item.get('type') == 'text':
-                                        yield content_item.get('text', '')
-                                else:
-                                    yield str(content_item)
-                        else:
-                            yield str(message.content)
-        # Handle tool execution chunks
-        elif "tools" in chunk:
-                if "messages" in chunk["tools"]:
-                    for message in chunk["tools"]["messages"]:
-                        if hasattr(message, 'content') and message.content:
-                            yield f"\n🔧 Tool executed: {message.content}\n"
-
-
-async def interactive():
-
-    messages = []
-    config_data = read_config()
 
+async def interactive(verbose=False):
+
+    messages = ConversationMemory()
+    messages.pin("working directory", os.getcwd())
+    config_data = read_config()
+    # Tools and agent graph are built on the first turn and reused afterwards
+    # Provider(s) from VOICEGIT_LLM_PROVIDERS, with hedging and failover between them
+    session = AgentSession(get_llm(), server_manager, extra_tools=[compactor.page_tool()])
+    # 'llm' folds evicted turns into the summary with the chat model instead of extracting gists
+    if os.getenv("VOICEGIT_MEMORY_SUMMARIZER", "extractive") == "llm":
+        messages.summarizer = llm_summarizer(session.model)
+    show_timing = verbose or os.getenv("VOICEGIT_TIMING", "0") != "0"
+    # Off unless VOICEGIT_ANSWER_CACHE is 'exact' or 'semantic'
+    answer_cache = AnswerCache(fingerprint=repo_state)
+    # Previous question and answer: follow-ups ("list its branches") are cached per previous turn
+    previous_turn = ""
+
+    user = None
     if config_data and "user" in config_data:
         user = config_data["user"]
+        messages.pin("user", f"{user['name']} <{user['email']}>")
         # return f"Hello {user["name"]}"
 
     print(f"{Fore.CYAN}{Style.BRIGHT} Git Agent Chat started!")
@@ -193,45 +91,128 @@ async def interactive():
 
 
 
-    while True:
+    try:
+        while True:
+
+            ### User chat 
+            try:
+                if user:
+                    user_prompt = f"{Fore.CYAN}{Style.BRIGHT} {user['name']}: {Style.RESET_ALL}"
+                else: 
+                    user_prompt = f"{Fore.CYAN}{Style.BRIGHT} User: {Style.RESET_ALL}"
+                text = input(user_prompt)
+
+                if text.lower() in ["quit", "q", "stop"]:
+                    print(f"{Fore.MAGENTA}{Style.BRIGHT} Goodbye! Thanks for using VoiceGit!{Style.RESET_ALL}")
+                    break
+                elif text.lower() == "/reload":
+                    session.invalidate()
+                    print(f"{Fore.YELLOW}🔄 MCP tools will be reloaded on the next message{Style.RESET_ALL}")
+                    continue
+                elif text.lower() in ("/tools all", "/tools auto"):
+                    # Escape hatch: send every tool's schema instead of the per-turn subset
+                    session.tool_subset = text.lower() == "/tools auto"
+                    if session.selector is not None:
+                        session.selector.enabled = session.tool_subset
+                    print(f"{Fore.YELLOW}🧰 {'Selecting relevant tools per turn' if session.tool_subset else 'Sending every tool'}{Style.RESET_ALL}")
+                    continue
+                elif text.lower().startswith("/pin "):
+                    # "/pin repo acme/platform" keeps a fact in every turn's context
+                    key, _, fact = text[5:].strip().partition(" ")
+                    messages.pin(key, fact or None)
+                    print(f"{Fore.YELLOW}📌 {'Pinned' if fact else 'Unpinned'} {key}{Style.RESET_ALL}")
+                    continue
+                else:
+                    # The repository and branch can change between turns (cd, checkout)
+                    toplevel, branch = repo_location()
+                    messages.pin("repository", toplevel)
+                    messages.pin("branch", branch)
+                    messages.append({"role":"user","content":text})
+                    # Fields the question mentions survive tool result compaction
+                    compactor.intent = text
+
+                # assistant_reply = llm_call(messages)
+                print(f"\n{Fore.GREEN}{Style.BRIGHT} Assistant: {Style.RESET_ALL}")
+                print(f"{Fore.LIGHTGREEN_EX}", end="", flush=True)
+                # Root span of the turn: model, tool and GitHub request spans nest under it
+                with span("turn", query=text) as turn_span:
+                    full_response = ""
+                    builds = session.builds
+                    turn_start = time.perf_counter()
+                    first_token = None
+                    cached = None
+                    turn_stats = {}
+                    if answer_cache.enabled:
+                        await session.get_graph()
+                        cached = await answer_cache.lookup(text, {tool.name: tool for tool in session.tools}, previous_turn)
+                    if cached is not None:
+                        first_token = time.perf_counter() - turn_start
+                        print(cached, end="", flush=True)
+                        print(f"{Style.DIM} (cached answer){Style.RESET_ALL}", end="")
+                        full_response = cached
+                    else:
+                        recorded = []
+                        async for chunk in aws_agent(messages, session, recorded, turn_stats):
+                            if isinstance(chunk, ToolProgress):
+                                # Shown while the tools run, but kept out of the answer and history
+                                print(f"{Style.DIM}{chunk}{Style.RESET_ALL}{Fore.LIGHTGREEN_EX}", end="", flush=True)
+                                continue
+                            if first_token is None:
+                                first_token = time.perf_counter() - turn_start
+                            print(chunk, end="", flush=True)
+
+                            full_response += chunk
+                        plan, results = plan_from_messages(recorded)
+                        answer_cache.store(text, full_response, plan, results, time.perf_counter() - turn_start,
+                                           context=previous_turn)
+                        # Compacted tool results stay available to follow-up questions
+                        messages.remember_tools(plan, results)
+
+                    messages.append({"role": 'assistant',"content":full_response})
+                    previous_turn = f"{text}\n{full_response}"
+                    # print(f"{Fore.GREEN}{Style.BRIGHT} Assistant:{Style.RESET_ALL}")
+                    print(f"{Style.RESET_ALL}")
+                    timing = session.record_turn(first_token, time.perf_counter() - turn_start)
+                    turn_span.set(first_token=timing["first_token"], cached_answer=cached is not None,
+                                  output_tokens=turn_stats.get("output_tokens"), input_tokens=turn_stats.get("input_tokens"),
+                                  cache_read_tokens=turn_stats.get("cache_read_tokens"))
+                if show_timing:
+                    rebuilt = f" (incl. {session.build_seconds:.2f}s tool/graph build)" if session.builds > builds else ""
+                    context = messages.stats()
+                    print(f"{Style.DIM}⏱ first token {timing['first_token']}s{rebuilt} · total {timing['total']}s"
+                          f" · context {context.get('prompt_tokens')}/{context['budget_tokens']} tokens{Style.RESET_ALL}")
+                if verbose and turn_stats:
+                    rate = turn_stats["tokens_per_second"]
+                    print(f"{Style.DIM}⏱ {turn_stats['output_tokens']} output tokens"
+                          f" · {rate if rate is not None else '-'} tokens/s{Style.RESET_ALL}")
+                    if turn_stats.get("input_tokens"):
+                        print(f"{Style.DIM}⏱ input tokens {turn_stats['input_tokens']}:"
+                              f" {turn_stats['cache_read_tokens']} cached, {turn_stats['uncached_input_tokens']} uncached"
+                              f" ({turn_stats['cache_write_tokens']} written to cache){Style.RESET_ALL}")
+                    for tool in turn_stats["tools"]:
+                        print(f"{Style.DIM}  🔧 {tool['tool']} {tool['status']} in {tool['seconds']}s{Style.RESET_ALL}")
+                    if session.selector is not None and session.selector.last_stats:
+                        selection = session.selector.last_stats
+                        print(f"{Style.DIM}  🧰 {selection['tools']}/{selection['total_tools']} tools bound"
+                              f" ({selection['schema_tokens']} schema tokens){Style.RESET_ALL}")
+                    if hasattr(session.model, "stats"):
+                        for name, provider in session.model.stats().items():
+                            print(f"{Style.DIM}  ☁ {name}: {provider['state']}, {provider['wins']}/{provider['requests']} won,"
+                                  f" p95 first token {provider['p95_first_token']}s, hedged {provider['hedged']}{Style.RESET_ALL}")
+                print(f"{Fore.CYAN}{'*' * 50}{Style.RESET_ALL}")
+            except KeyboardInterrupt:
+                print(f"\n{Fore.RED}{Style.BRIGHT}⚠️ Chat interrupted by user{Style.RESET_ALL}")
+                break
+            except Exception as e:
+                print(f"{Fore.RED}{Style.BRIGHT}❌ Error: {e}{Style.RESET_ALL}")
+    finally:
+        # Shut down the MCP server processes started for this session, however the loop ended
+        await server_manager.aclose()
 
-        ### User chat 
-        try:
-            if user:
-                user_prompt = f"{Fore.CYAN}{Style.BRIGHT} {user['name']}: {Style.RESET_ALL}"
-            else: 
-                user_prompt = f"{Fore.CYAN}{Style.BRIGHT} User: {Style.RESET_ALL}"
-            text = input(user_prompt)
 
-            if text.lower() in ["quit", "q", "stop"]:
-                print(f"{Fore.MAGENTA}{Style.BRIGHT} Goodbye! Thanks for using VoiceGit!{Style.RESET_ALL}")
-                break
-            else:
-                messages.append({"role":"user","content":text})
-
-            # assistant_reply = llm_call(messages)
-            print(f"\n{Fore.GREEN}{Style.BRIGHT} Assistant: {Style.RESET_ALL}")
-            print(f"{Fore.LIGHTGREEN_EX}", end="", flush=True)
-            full_response = ""
-            async for chunk in aws_agent(messages):
-                print(chunk, end="", flush=True)
-                
-                full_response += chunk
-
-            messages.append({"role": 'assistant',"content":full_response})
-            # print(f"{Fore.GREEN}{Style.BRIGHT} Assistant:{Style.RESET_ALL}")
-            print(f"{Style.RESET_ALL}")
-            print(f"{Fore.CYAN}{'*' * 50}{Style.RESET_ALL}")
-        except KeyboardInterrupt:
-            print(f"\n{Fore.RED}{Style.BRIGHT}⚠️ Chat interrupted by user{Style.RESET_ALL}")
-            break
-        except Exception as e:
-            print(f"{Fore.RED}{Style.BRIGHT}❌ Error: {e}{Style.RESET_ALL}")
-
-
-
-# interactive()
-asyncio.run(interactive())
+
+if __name__ == "__main__":
+    asyncio.run(interactive())
 
 
 
@@ -0,0 +1,246 @@
+import asyncio
+import sys
+import time
+from langchain_mcp_adapters.sessions import create_session
+from langchain_mcp_adapters.tools import load_mcp_tools
+from tool_policy import is_read_only
+from tracing import span
+
+
+class MCPServerManager:
+    """Long-lived sessions to the configured MCP servers
+
+    MultiServerMCPClient.get_tools() returns tools that open a new session, and
+    for stdio servers spawn a new process, on every call. The manager starts each
+    server once, keeps its session open in a background task, pings it for
+    health and restarts it when it has crashed. Tools returned by get_tools()
+    always call through the current session, so a restart is transparent to the
+    agent graph that holds them.
+    """
+
+    def __init__(self, connections, health_interval=30.0, ping_timeout=5.0, tool_name_prefix=False,
+                 interceptors=()):
+        self.connections = connections
+        # Tool call interceptors run around every call, outermost first
+        self.interceptors = list(interceptors)
+        self.health_interval = health_interval
+        self.ping_timeout = ping_timeout
+        self.tool_name_prefix = tool_name_prefix
+        self._sessions = {}
+        self._tasks = {}
+        self._stop_events = {}
+        self._locks = {}
+        self._health_task = None
+        self.starts = {name: 0 for name in connections}
+        self.restarts = {name: 0 for name in connections}
+        self.calls = {name: 0 for name in connections}
+
+    async def start(self):
+        """Start every configured server and the health check loop"""
+        await asyncio.gather(*(self.get_session(name) for name in self.connections))
+
+    def _start_health_loop(self):
+        # Started with the first session, so every caller of get_session/get_tools gets health checks
+        if self._health_task is None and self.health_interval:
+            self._health_task = asyncio.create_task(self._health_loop())
+
+    async def _run_server(self, name, ready):
+        # The session context must be entered and exited by the same task
+        try:
+            async with create_session(self.connections[name]) as session:
+                await session.initialize()
+                self._sessions[name] = session
+                ready.set_result(session)
+                await self._stop_events[name].wait()
+        except Exception as e:
+            if not ready.done():
+                ready.set_exception(e)
+            else:
+                print(f"MCP server '{name}' stopped: {e}", file=sys.stderr)
+        finally:
+            self._sessions.pop(name, None)
+
+    def _alive(self, name):
+        task = self._tasks.get(name)
+        return task is not None and not task.done() and name in self._sessions
+
+    async def get_session(self, name):
+        """Return the running session of a server, starting it if needed"""
+        self._start_health_loop()
+        if self._alive(name):
+            return self._sessions[name]
+        lock = self._locks.setdefault(name, asyncio.Lock())
+        async with lock:
+            if self._alive(name):
+                return self._sessions[name]
+            if name in self._tasks:
+                self.restarts[name] += 1
+            self._stop_events[name] = asyncio.Event()
+            ready = asyncio.get_running_loop().create_future()
+            self._tasks[name] = asyncio.create_task(self._run_server(name, ready))
+            self.starts[name] += 1
+            return await ready
+
+    async def stop(self, name):
+        """Shut down one server's session and process"""
+        task = self._tasks.get(name)
+        if task is None:
+            return
+        self._stop_events[name].set()
+        try:
+            await asyncio.wait_for(task, timeout=self.ping_timeout)
+        except Exception:
+            # Wait for the cancellation too, so the session context closes and the stdio process exits
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        self._sessions.pop(name, None)
+
+    async def restart(self, name):
+        """Stop a server and start it again"""
+        await self.stop(name)
+        return await self.get_session(name)
+
+    async def ping(self, name):
+        """True if the server answers an MCP ping within ping_timeout"""
+        if not self._alive(name):
+            return False
+        try:
+            await asyncio.wait_for(self._sessions[name].send_ping(), timeout=self.ping_timeout)
+            return True
+        except Exception:
+            return False
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            for name in self.connections:
+                starting = name in self._locks and self._locks[name].locked()
+                if name in self._tasks and not starting and not await self.ping(name):
+                    print(f"MCP server '{name}' failed health check, restarting", file=sys.stderr)
+                    try:
+                        await self.restart(name)
+                    except Exception as e:
+                        print(f"Error restarting MCP server '{name}': {e}", file=sys.stderr)
+
+    async def call_tool(self, name, tool_name, arguments):
+        """Call a tool on the server's live session, restarting the server if the call fails.
+
+        Only read-only tools are retried after a restart: a write (git_commit,
+        create_issue, ...) may have been applied before the connection dropped,
+        so its error is returned to the model instead of running it twice.
+        """
+        self.calls[name] += 1
+        with span("mcp_call", server=name, tool=tool_name, args_bytes=len(str(arguments).encode())) as call_span:
+            session = await self.get_session(name)
+            try:
+                result = await session.call_tool(tool_name, arguments)
+            except Exception:
+                if await self.ping(name):
+                    raise
+                call_span.set(restarted=True)
+                session = await self.restart(name)
+                if not is_read_only(tool_name):
+                    raise
+                result = await session.call_tool(tool_name, arguments)
+            call_span.set(result_bytes=sum(len(getattr(block, "text", "") or "") for block in result.content),
+                          is_error=bool(result.isError))
+            return result
+
+    def _interceptor(self, name):
+        async def route_to_live_session(request, handler):
+            return await self.call_tool(name, request.name, request.args)
+        return route_to_live_session
+
+    async def get_tools(self, server_name=None):
+        """LangChain tools of all servers (or one), bound to the managed sessions"""
+        names = [server_name] if server_name else list(self.connections)
+        tools = []
+        for name in names:
+            session = await self.get_session(name)
+            tools.extend(await load_mcp_tools(
+                session,
+                tool_interceptors=[*self.interceptors, self._interceptor(name)],
+                server_name=name,
+                tool_name_prefix=self.tool_name_prefix
+            ))
+        return tools
+
+    async def aclose(self):
+        """Stop the health loop and every server"""
+        if self._health_task is not None:
+            self._health_task.cancel()
+            await asyncio.gather(self._health_task, return_exceptions=True)
+            self._health_task = None
+        await asyncio.gather(*(self.stop(name) for name in list(self._tasks)))
+
+    def stats(self):
+        return {
+            name: {
+                "running": self._alive(name),
+                "starts": self.starts[name],
+                "restarts": self.restarts[name],
+                "tool_calls": self.calls[name]
+            }
+            for name in self.connections
+        }
+
+
+DUMMY_SERVER = '''
+from mcp.server.fastmcp import FastMCP
+mcp = FastMCP("dummy")
+
+@mcp.tool()
+async def echo(text: str) -> str:
+    """Echo text back"""
+    return text
+
+mcp.run(transport="stdio")
+'''
+
+
+async def benchmark_sessions(calls=20):
+    """Compare per-call spawning (MultiServerMCPClient) with managed sessions on a dummy server"""
+    import os
+    import tempfile
+    from langchain_mcp_adapters.client import MultiServerMCPClient
+
+    with tempfile.NamedTemporaryFile("w", suffix=".py", delete=False) as f:
+        f.write(DUMMY_SERVER)
+        script = f.name
+    connections = {"dummy": {"command": sys.executable, "args": [script], "transport": "stdio"}}
+
+    async def measure(get_tools):
+        start = time.perf_counter()
+        tools = await get_tools()
+        startup = time.perf_counter() - start
+        echo = next(tool for tool in tools if tool.name == "echo")
+        latencies = []
+        for i in range(calls):
+            start = time.perf_counter()
+            await echo.ainvoke({"text": str(i)})
+            latencies.append((time.perf_counter() - start) * 1000)
+        latencies.sort()
+        return {
+            "startup_ms": round(startup * 1000, 1),
+            "p50_ms": round(latencies[len(latencies) // 2], 1),
+            "p99_ms": round(latencies[int(0.99 * (len(latencies) - 1))], 1)
+        }
+
+    manager = MCPServerManager(connections, health_interval=0)
+    try:
+        results = {
+            "per_call_spawn": await measure(MultiServerMCPClient(connections).get_tools),
+            "managed_session": await measure(manager.get_tools)
+        }
+    finally:
+        await manager.aclose()
+        os.unlink(script)
+    print(f"{calls} tool calls against a local dummy MCP server")
+    for mode, result in results.items():
+        print(f"  {mode:16} startup {result['startup_ms']}ms  p50 {result['p50_ms']}ms  p99 {result['p99_ms']}ms")
+    return results
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        asyncio.run(benchmark_sessions())
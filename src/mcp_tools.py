@@ -1,4 +1,5 @@
 import os
+import sys
 from langchain_mcp_adapters.client import MultiServerMCPClient
 from langgraph.prebuilt import create_react_agent
 
@@ -6,10 +7,12 @@ from langgraph.prebuilt import create_react_agent
 
 from langchain_mcp_adapters.client import MultiServerMCPClient
 from langgraph.prebuilt import create_react_agent
+from mcp_sessions import MCPServerManager
+from tool_results import ToolResultCompactor
 
 
 
-client = MultiServerMCPClient({
+servers = {
 
       "github": {
         "command": "C:/Users/Hemanth/Desktop/assistantagent/github-mcp-server/github-mcp-server.exe",
@@ -18,6 +21,24 @@ client = MultiServerMCPClient({
           "GITHUB_PERSONAL_ACCESS_TOKEN": "ACCESS_TOKEN"
         },
         "transport": "stdio"
+      },
+
+      # Local repository tools (git_mcp_tools.py), no network needed
+      "git": {
+        "command": sys.executable,
+        "args": [os.path.join(os.path.dirname(os.path.abspath(__file__)), "git_mcp_tools.py")],
+        "env": {
+          "GIT_REPO_PATH": os.getcwd()
+        },
+        "transport": "stdio"
       }
-})
+}
+
+client = MultiServerMCPClient(servers)
+
+# Tool results are compacted before they reach the agent; the full results
+# stay available through the page_tool_result tool
+compactor = ToolResultCompactor()
 
+# One long-lived session per server, reused for every tool listing and call
+server_manager = MCPServerManager(servers, interceptors=[compactor.interceptor])
@@ -1,23 +1,82 @@
-from  langchain_openai import AzureChatOpenAI
-from langchain_aws import ChatBedrockConverse
-
-from langchain_aws import ChatBedrockConverse
-
-aws_llm = ChatBedrockConverse(
-    model="anthropic.claude-3-5-sonnet-20241022-v2:0",
-    temperature=0,
-    max_tokens=None,
-    # other params...
-)
-
-azure_llm = AzureChatOpenAI(
-    azure_deployment="gpt-4.1-mini",  # or your deployment
-    api_version="2024-12-01-preview",  # or your api version
-    temperature=0,
-    max_tokens=None,
-    azure_endpoint="openai",
-    api_key="hello",
-    timeout=None,
-    max_retries=6,
-    top_p=0.8
-)
\ No newline at end of file
+# Chat models are built on first use: importing langchain_openai / langchain_aws
+# and constructing the clients is the bulk of VoiceGit's startup time.
+
+import os
+
+LLM_TIMEOUT = float(os.getenv("VOICEGIT_LLM_TIMEOUT", "60"))
+
+_models = {}
+
+
+def _build(provider, build):
+    # Recorded / replayed through llm_cassette when VOICEGIT_LLM_CASSETTE is set
+    if os.getenv("VOICEGIT_LLM_CASSETTE"):
+        from llm_cassette import with_cassette
+
+        return with_cassette(provider, build)
+    return build()
+
+
+def _aws_llm():
+    from langchain_aws import ChatBedrockConverse
+
+    return ChatBedrockConverse(
+        model="anthropic.claude-3-5-sonnet-20241022-v2:0",
+        temperature=0,
+        max_tokens=None,
+        # other params...
+    )
+
+
+def _azure_llm():
+    from langchain_openai import AzureChatOpenAI
+
+    return AzureChatOpenAI(
+        azure_deployment="gpt-4.1-mini",  # or your deployment
+        api_version="2024-12-01-preview",  # or your api version
+        temperature=0,
+        max_tokens=None,
+        azure_endpoint="openai",
+        api_key="hello",
+        # Bounded: a slow or failing request is failed over by the router
+        # instead of being retried here for minutes
+        timeout=LLM_TIMEOUT,
+        max_retries=1,
+        top_p=0.8
+    )
+
+
+def get_aws_llm():
+    if "aws" not in _models:
+        _models["aws"] = _build("aws", _aws_llm)
+    return _models["aws"]
+
+
+def get_azure_llm():
+    if "azure" not in _models:
+        _models["azure"] = _build("azure", _azure_llm)
+    return _models["azure"]
+
+
+PROVIDERS = {"aws": get_aws_llm, "azure": get_azure_llm}
+
+
+def get_llm():
+    """Chat model for the agent: a router over the providers in VOICEGIT_LLM_PROVIDERS"""
+    if "router" not in _models:
+        from model_router import LLM_PROVIDERS, ProviderRouter
+
+        unknown = [name for name in LLM_PROVIDERS if name not in PROVIDERS]
+        if unknown or not LLM_PROVIDERS:
+            raise ValueError(f"VOICEGIT_LLM_PROVIDERS: unknown provider(s) {unknown}, choose from {list(PROVIDERS)}")
+        _models["router"] = ProviderRouter(providers={name: PROVIDERS[name]() for name in LLM_PROVIDERS})
+    return _models["router"]
+
+
+def __getattr__(name):
+    # Keep `from model import aws_llm, azure_llm` working, built lazily
+    if name == "aws_llm":
+        return get_aws_llm()
+    if name == "azure_llm":
+        return get_azure_llm()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,362 @@
+import asyncio
+import math
+import os
+import sys
+import time
+from collections import deque
+from typing import Any
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.language_models.chat_models import agenerate_from_stream
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+import prompt_cache
+
+# Routing of chat requests over the configured providers (aws, azure). The
+# preferred provider gets the request; if it has not produced its first token
+# within its own p95 time to first token, the next provider gets the same
+# request and whichever answers first wins. Providers that keep failing are
+# skipped for a cooldown period (circuit breaker).
+
+LLM_PROVIDERS = [name.strip() for name in os.getenv("VOICEGIT_LLM_PROVIDERS", "aws").split(",") if name.strip()]
+LLM_HEDGE = os.getenv("VOICEGIT_LLM_HEDGE", "1") != "0"
+# Hedge delay used until a provider has enough latency samples for a p95
+LLM_HEDGE_AFTER = float(os.getenv("VOICEGIT_LLM_HEDGE_AFTER", "3"))
+LLM_FAILURE_THRESHOLD = int(os.getenv("VOICEGIT_LLM_FAILURE_THRESHOLD", "3"))
+LLM_COOLDOWN = float(os.getenv("VOICEGIT_LLM_COOLDOWN", "30"))
+
+
+class ProviderHealth:
+    """Time-to-first-token samples and circuit breaker state of one provider
+
+    The circuit opens after `failure_threshold` consecutive failures. Once
+    `cooldown` seconds have passed the provider is tried again (half-open) by
+    a single probe request, taken with begin(); other callers see the circuit
+    open until the probe ends. A success closes the circuit, a failure opens
+    it for another cooldown.
+    """
+
+    def __init__(self, name, failure_threshold=LLM_FAILURE_THRESHOLD, cooldown=LLM_COOLDOWN,
+                 window=100, min_samples=20, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.min_samples = min_samples
+        self.clock = clock
+        self.latencies = deque(maxlen=window)
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.requests = 0
+        self.errors = 0
+        self.wins = 0
+        # Requests also sent to another provider because this one was slow to start
+        self.hedged = 0
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if self.probing or self.clock() - self.opened_at < self.cooldown:
+            return "open"
+        return "half-open"
+
+    def available(self):
+        return self.state != "open"
+
+    def begin(self):
+        """Take the right to send a request: always when closed, once (the probe) when half-open"""
+        state = self.state
+        if state == "half-open":
+            self.probing = True
+        return state != "open"
+
+    def release(self):
+        """The request ended without a verdict (cancelled); a half-open circuit can be probed again"""
+        self.probing = False
+
+    def p95(self):
+        if len(self.latencies) < self.min_samples:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(math.ceil(0.95 * len(ordered)) - 1, len(ordered) - 1)]
+
+    def hedge_delay(self, default=LLM_HEDGE_AFTER):
+        p95 = self.p95()
+        return default if p95 is None else p95
+
+    def record_success(self, first_token_seconds):
+        self.latencies.append(first_token_seconds)
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def record_failure(self):
+        self.errors += 1
+        self.failures += 1
+        if self.failures >= self.failure_threshold or self.probing:
+            self.opened_at = self.clock()
+        self.probing = False
+
+    def stats(self):
+        p95 = self.p95()
+        ordered = sorted(self.latencies)
+        return {
+            "state": self.state,
+            "requests": self.requests,
+            "wins": self.wins,
+            "errors": self.errors,
+            "hedged": self.hedged,
+            "p50_first_token": round(ordered[len(ordered) // 2], 3) if ordered else None,
+            "p95_first_token": round(p95, 3) if p95 is not None else None
+        }
+
+
+class ProviderRouter(BaseChatModel):
+    """Chat model that sends each request to one of several provider models.
+
+    `providers` maps names to chat models in order of preference. With
+    `hedge`, a request the current provider has not started answering within
+    its p95 time to first token is also sent to the next available provider;
+    the first to stream a chunk wins and the other request is cancelled.
+    Providers failing before their first token are failed over to.
+    bind_tools() binds every provider and shares the health state.
+    """
+
+    providers: dict
+    hedge: bool = LLM_HEDGE
+    hedge_after: float = LLM_HEDGE_AFTER
+    health: dict = {}
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        if not self.health:
+            self.health = {name: ProviderHealth(name) for name in self.providers}
+
+    @property
+    def _llm_type(self):
+        return "provider-router"
+
+    def bind_tools(self, tools, **kwargs):
+        bound = {name: prompt_cache.bind_tools(model, tools, **kwargs) for name, model in self.providers.items()}
+        return self.model_copy(update={"providers": bound})
+
+    def _request(self, name, messages):
+        # Cache points are provider specific, so they are added per provider
+        if prompt_cache.PROMPT_CACHE and prompt_cache.supports_prompt_cache(self.providers[name]):
+            return prompt_cache.mark_prefix(messages)
+        return messages
+
+    def _order(self):
+        """(providers to try in order, whether their circuits are bypassed)"""
+        names = [name for name in self.providers if self.health[name].available()]
+        if not names:
+            # Every circuit is open: try the one that opened first rather than fail outright
+            return sorted(self.providers, key=lambda name: self.health[name].opened_at)[:1], True
+        return names, False
+
+    def _next_provider(self, queue, forced):
+        """Pop providers off queue until one may be sent a request (a half-open one may already be probed)"""
+        while queue:
+            name = queue.pop(0)
+            if forced or self.health[name].begin():
+                return name
+        return None
+
+    async def _first_chunk(self, messages, stop, **kwargs):
+        """Start providers until one streams a chunk; returns (name, first chunk, rest of its stream)"""
+        queue, forced = self._order()
+        pending = {}
+        errors = []
+
+        def launch(name):
+            self.health[name].requests += 1
+            # "nostream": the router streams the winner's chunks itself, so the provider
+            # calls must not show up in LangGraph's message stream as well
+            stream = aiter(self.providers[name].astream(self._request(name, messages), {"tags": ["nostream"]},
+                                                        stop=stop, **kwargs))
+            pending[asyncio.ensure_future(anext(stream))] = (name, stream, time.perf_counter())
+
+        winner = None
+        try:
+            name = self._next_provider(queue, forced)
+            if name is not None:
+                launch(name)
+            while pending and winner is None:
+                slow = None
+                if self.hedge and queue and len(pending) == 1:
+                    slow = self.health[next(iter(pending.values()))[0]]
+                delay = slow.hedge_delay(self.hedge_after) if slow else None
+                done, _ = await asyncio.wait(set(pending), timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    name = self._next_provider(queue, forced)
+                    if name is not None:
+                        slow.hedged += 1
+                        launch(name)
+                    continue
+                for task in done:
+                    name, stream, started = pending.pop(task)
+                    try:
+                        chunk = task.result()
+                    except Exception as e:
+                        self.health[name].record_failure()
+                        errors.append(e)
+                        await stream.aclose()
+                        continue
+                    # Started answering, so healthy, whether or not it won
+                    self.health[name].record_success(time.perf_counter() - started)
+                    if winner is None:
+                        self.health[name].wins += 1
+                        winner = (name, chunk, stream)
+                    else:
+                        await stream.aclose()
+                if winner is None and not pending:
+                    name = self._next_provider(queue, forced)
+                    if name is not None:
+                        launch(name)
+        finally:
+            for task, (name, stream, started) in pending.items():
+                # Lost the race: the time waited is a lower bound on its time to
+                # first token, kept so a slow provider's p95 does not drift down
+                self.health[name].latencies.append(time.perf_counter() - started)
+                self.health[name].release()
+                task.cancel()
+            for task, (name, stream, started) in pending.items():
+                try:
+                    await task
+                except BaseException:
+                    pass
+                await stream.aclose()
+        if winner is None:
+            if errors:
+                raise errors[-1]
+            raise RuntimeError("No chat model provider returned a response")
+        return winner
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        name, chunk, stream = await self._first_chunk(messages, stop, **kwargs)
+        try:
+            while True:
+                yield ChatGenerationChunk(message=chunk)
+                try:
+                    chunk = await anext(stream)
+                except StopAsyncIteration:
+                    break
+        except Exception:
+            # Failing mid-answer cannot be hedged, but counts against the provider
+            self.health[name].record_failure()
+            raise
+        finally:
+            await stream.aclose()
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        return await agenerate_from_stream(self._astream(messages, stop, run_manager, **kwargs))
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        # Synchronous callers get failover in preference order, without hedging
+        error = None
+        queue, forced = self._order()
+        while queue:
+            name = self._next_provider(queue, forced)
+            if name is None:
+                break
+            health = self.health[name]
+            health.requests += 1
+            start = time.perf_counter()
+            try:
+                message = self.providers[name].invoke(self._request(name, messages), {"tags": ["nostream"]},
+                                                      stop=stop, **kwargs)
+            except Exception as e:
+                health.record_failure()
+                error = e
+                continue
+            health.record_success(time.perf_counter() - start)
+            health.wins += 1
+            return ChatResult(generations=[ChatGeneration(message=message)])
+        raise error or RuntimeError("No chat model provider returned a response")
+
+    def stats(self):
+        return {name: health.stats() for name, health in self.health.items()}
+
+
+class _FakeProvider(BaseChatModel):
+    """Chat model streaming a fixed reply after a latency drawn from `latencies`"""
+
+    reply: str = "ok"
+    latencies: list = [0.1]
+    fail_every: int = 0
+    calls: list = []
+
+    @property
+    def _llm_type(self):
+        return "fake-provider"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _next_call(self):
+        """Latency of the next call and whether it fails"""
+        self.calls.append(1)
+        index = len(self.calls)
+        return self.latencies[index % len(self.latencies)], bool(self.fail_every and index % self.fail_every == 0)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        latency, fails = self._next_call()
+        time.sleep(latency)
+        if fails:
+            raise ConnectionError(f"{self.reply}: injected failure")
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.reply))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        latency, fails = self._next_call()
+        await asyncio.sleep(latency)
+        if fails:
+            raise ConnectionError(f"{self.reply}: injected failure")
+        for word in self.reply.split(" "):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+
+
+async def benchmark_router(requests=100):
+    """Time to first token with a provider that has a slow tail, with and without a second provider"""
+    # aws-like: 80 ms usually, 1.5 s one request in 25; azure-like: steady 150 ms
+    slow_tail = [0.08] * 24 + [1.5]
+    results = {}
+    for label, providers, hedge in (
+        ("single provider", {"primary": _FakeProvider(reply="primary", latencies=slow_tail, calls=[])}, False),
+        ("failover only", {"primary": _FakeProvider(reply="primary", latencies=slow_tail, calls=[]),
+                           "secondary": _FakeProvider(reply="secondary", latencies=[0.15], calls=[])}, False),
+        ("hedged at p95", {"primary": _FakeProvider(reply="primary", latencies=slow_tail, calls=[]),
+                           "secondary": _FakeProvider(reply="secondary", latencies=[0.15], calls=[])}, True),
+    ):
+        router = ProviderRouter(providers=providers, hedge=hedge, hedge_after=0.3)
+        for health in router.health.values():
+            health.min_samples = 10
+        latencies = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            async for chunk in router.astream("hello"):
+                latencies.append(time.perf_counter() - start)
+                break
+        ordered = sorted(latencies)
+        results[label] = ordered
+        print(f"  {label:16} first token p50 {ordered[len(ordered) // 2] * 1000:5.0f} ms"
+              f"  mean {sum(ordered) / len(ordered) * 1000:5.0f} ms"
+              f"  p99 {ordered[int(0.99 * (len(ordered) - 1))] * 1000:5.0f} ms"
+              f"  max {ordered[-1] * 1000:6.0f} ms  hedged {sum(h.hedged for h in router.health.values())}")
+
+    # Circuit breaker: a provider failing every request is skipped after 3 failures
+    failing = _FakeProvider(reply="primary", latencies=[0.01], fail_every=1, calls=[])
+    backup = _FakeProvider(reply="secondary", latencies=[0.02], calls=[])
+    router = ProviderRouter(providers={"primary": failing, "secondary": backup}, hedge=False)
+    for _ in range(10):
+        await router.ainvoke("hello")
+    print(f"  circuit breaker  failing provider called {len(failing.calls)} of 10 times,"
+          f" state {router.health['primary'].state}")
+    assert len(failing.calls) == LLM_FAILURE_THRESHOLD
+    return results
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        asyncio.run(benchmark_router())
@@ -0,0 +1,74 @@
+import os
+
+# Prompt-prefix caching. Every model call of a turn starts with the same tool
+# schemas and agent prompt; on Bedrock a cachePoint block after them lets the
+# provider reuse that prefix instead of processing it again. The prefix only
+# hits when it is byte-identical, so tools are sent in name order and the fixed
+# agent prompt always comes before the per-turn system message (pinned facts,
+# summary) from ConversationMemory. Bedrock puts the tools ahead of the system
+# prompt, so a caller binding a per-turn tool subset puts a CACHE_POINT of its
+# own after the tools every turn shares (see ToolSelector.bound_model); that
+# part of the prefix then still hits when the rest of the subset changes.
+
+PROMPT_CACHE = os.getenv("VOICEGIT_PROMPT_CACHE", "1") != "0"
+
+CACHE_POINT = {"cachePoint": {"type": "default"}}
+
+
+def supports_prompt_cache(model):
+    """True for Bedrock Converse models of the families that accept cachePoint blocks"""
+    model = getattr(model, "bound", model)  # tool-bound RunnableBinding
+    if getattr(model, "inner", None) is not None:
+        # Recording cassette (llm_cassette): the request goes to the model it wraps
+        return supports_prompt_cache(model.inner)
+    if type(model).__name__ != "ChatBedrockConverse":
+        return False
+    model_id = str(getattr(model, "model_id", "")).lower()
+    return "anthropic" in model_id or "amazon.nova" in model_id
+
+
+def stable_tools(tools):
+    """Tools in a fixed order, so reloading the MCP servers does not change the prefix"""
+    return sorted(tools, key=lambda tool: getattr(tool, "name", ""))
+
+
+def is_cache_point(tool):
+    return isinstance(tool, dict) and "cachePoint" in tool
+
+
+def bind_tools(model, tools, **kwargs):
+    """model.bind_tools, with a cache point after the tool definitions where supported
+
+    Cache points already among the tools are kept where supported and
+    dropped for every other model.
+    """
+    tools = list(tools)
+    if getattr(model, "providers", None) is not None:
+        # ProviderRouter binds each of its providers through this function
+        return model.bind_tools(tools, **kwargs)
+    if PROMPT_CACHE and supports_prompt_cache(model):
+        return model.bind_tools([*tools, CACHE_POINT], **kwargs)
+    return model.bind_tools([tool for tool in tools if not is_cache_point(tool)], **kwargs)
+
+
+def mark_prefix(messages):
+    """Messages with a cache point closing the leading (fixed) system message"""
+    if not messages or getattr(messages[0], "type", None) != "system":
+        return messages
+    system = messages[0]
+    content = system.content
+    if isinstance(content, str):
+        content = [{"type": "text", "text": content}]
+    if any(isinstance(block, dict) and "cachePoint" in block for block in content):
+        return messages
+    return [system.model_copy(update={"content": [*content, CACHE_POINT]}), *messages[1:]]
+
+
+def cache_usage(usage):
+    """Cached / uncached split of a message's input tokens (LangChain usage_metadata)"""
+    details = (usage or {}).get("input_token_details") or {}
+    read = details.get("cache_read") or 0
+    write = details.get("cache_creation") or 0
+    total = (usage or {}).get("input_tokens") or 0
+    return {"input_tokens": total, "cache_read_tokens": read, "cache_write_tokens": write,
+            "uncached_input_tokens": max(total - read, 0)}
@@ -0,0 +1,13 @@
+import re
+
+# Word splitting and filler words of user questions, shared by the answer
+# cache (normalised cache keys) and tool selection (BM25 query terms)
+
+STOPWORDS = {"a", "an", "the", "please", "can", "could", "would", "you", "me", "i", "to", "of", "for", "in",
+             "on", "is", "are", "what", "which", "does", "do", "have", "has", "all", "tell", "give", "about",
+             "that", "this", "there", "any", "now", "again", "pls", "hey", "just"}
+
+
+def words(text):
+    """Lowercased words of text; dots, slashes and dashes stay inside words (paths, branch names)"""
+    return re.findall(r"[\w./-]+", text.lower())
@@ -0,0 +1,157 @@
+import asyncio
+import os
+import sys
+import time
+from prompt_cache import stable_tools
+from tracing import span
+
+# Concurrent execution of the tool calls a model emits in one step. LangGraph's
+# ToolNode already gathers the calls of one step; ToolCallLimiter adds a cap on
+# calls in flight and a timeout per tool, so one slow GitHub call cannot hold
+# up the turn indefinitely.
+
+TOOL_CONCURRENCY = int(os.getenv("VOICEGIT_TOOL_CONCURRENCY", "4"))
+TOOL_TIMEOUT = float(os.getenv("VOICEGIT_TOOL_TIMEOUT", "60"))
+
+
+class ToolCallLimiter:
+    """awrap_tool_call hook for ToolNode: concurrency cap and per-tool timeouts
+
+    `timeouts` overrides the default timeout for individual tool names. A call
+    that times out returns an error ToolMessage, so the model can retry or
+    answer without it.
+    """
+
+    def __init__(self, max_concurrency=TOOL_CONCURRENCY, timeout=TOOL_TIMEOUT, timeouts=None):
+        self.max_concurrency = max(max_concurrency, 1)
+        self.timeout = timeout
+        self.timeouts = timeouts or {}
+        self._semaphore = None
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = 0
+        self.timed_out = 0
+
+    def _get_semaphore(self):
+        # Created lazily so it belongs to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def __call__(self, request, execute):
+        from langchain_core.messages import ToolMessage
+
+        name = request.tool_call["name"]
+        timeout = self.timeouts.get(name, self.timeout)
+        # Progress events for graph.astream(stream_mode="custom") consumers
+        write = getattr(request.runtime, "stream_writer", None) or (lambda event: None)
+        event = {"tool": name, "id": request.tool_call["id"]}
+        async with self._get_semaphore():
+            self.calls += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            write({**event, "status": "start", "args": request.tool_call.get("args")})
+            start = time.perf_counter()
+            status = "error"
+            with span("tool_call", tool=name, args_bytes=len(str(request.tool_call.get("args")).encode())) as tool_span:
+                try:
+                    result = await asyncio.wait_for(execute(request), timeout)
+                    status = "failed" if getattr(result, "status", None) == "error" else "done"
+                    tool_span.set(result_bytes=len(str(getattr(result, "content", "")).encode()))
+                    return result
+                except asyncio.TimeoutError:
+                    self.timed_out += 1
+                    status = "timed out"
+                    return ToolMessage(
+                        content=f"Error: {name} did not finish within {timeout:g}s",
+                        name=name,
+                        tool_call_id=request.tool_call["id"],
+                        status="error"
+                    )
+                finally:
+                    self.in_flight -= 1
+                    tool_span.set(status=status)
+                    write({**event, "status": status, "seconds": round(time.perf_counter() - start, 3)})
+
+    def stats(self):
+        return {
+            "max_concurrency": self.max_concurrency,
+            "calls": self.calls,
+            "timed_out": self.timed_out,
+            "max_in_flight": self.max_in_flight
+        }
+
+
+def build_tool_node(tools, limiter=None):
+    """ToolNode that runs one step's tool calls concurrently under `limiter`.
+
+    Results come back as ToolMessages in the order the model emitted the calls.
+    """
+    from langgraph.prebuilt import ToolNode
+
+    return ToolNode(tools, awrap_tool_call=limiter or ToolCallLimiter())
+
+
+def build_agent(model, tools, prompt, limiter=None, selector=None):
+    """ReAct agent whose tool step is a single concurrent ToolNode
+
+    With a ToolSelector, the tool node still runs every tool but each model
+    call is bound to the subset the selector picks.
+    """
+    from langgraph.prebuilt import create_react_agent
+
+    # Same tool order every build, so the tool schemas stay a cacheable prompt prefix
+    tools = stable_tools(tools)
+    if selector is not None:
+        tools = stable_tools([*tools, selector.find_tools_tool()])
+        model = selector.dynamic_model(model)
+
+    # v1 runs all calls of a step inside one ToolNode (one gather, messages in
+    # call order) instead of fanning out a graph task per call
+    return create_react_agent(model=model, tools=build_tool_node(tools, limiter), prompt=prompt, version="v1")
+
+
+async def benchmark_parallel_tools(calls=4, seconds=0.5):
+    """Wall time of one agent step with `calls` slow tool calls, sequential vs concurrent"""
+    from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+    from langchain_core.messages import AIMessage
+    from langchain_core.tools import StructuredTool
+
+    def slow_tool(index):
+        async def run(org: str) -> str:
+            await asyncio.sleep(seconds)
+            return f"result {index} for {org}"
+        return StructuredTool.from_function(coroutine=run, name=f"slow_tool_{index}",
+                                            description=f"Slow fake tool {index}")
+
+    tools = [slow_tool(i) for i in range(calls)]
+
+    class FakeModel(GenericFakeChatModel):
+        def bind_tools(self, tools, **kwargs):
+            return self
+
+    def fake_model():
+        return FakeModel(messages=iter([
+            AIMessage(content="", tool_calls=[
+                {"id": f"call_{i}", "name": f"slow_tool_{i}", "args": {"org": "acme"}} for i in range(calls)
+            ]),
+            AIMessage(content="done")
+        ]))
+
+    results = {}
+    for label, limit in (("sequential (cap 1)", 1), (f"concurrent (cap {calls})", calls)):
+        agent = build_agent(fake_model(), tools, "test", ToolCallLimiter(max_concurrency=limit))
+        start = time.perf_counter()
+        state = await agent.ainvoke({"messages": [{"role": "user", "content": "go"}]})
+        results[label] = time.perf_counter() - start
+        order = [message.tool_call_id for message in state["messages"] if message.type == "tool"]
+        assert order == [f"call_{i}" for i in range(calls)], order
+    print(f"{calls} tool calls of {seconds}s each in one agent step")
+    for label, wall in results.items():
+        print(f"  {label:20} {wall:5.2f}s")
+    return results
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        asyncio.run(benchmark_parallel_tools())
@@ -0,0 +1,11 @@
+# Which tool calls only read state. The answer cache stores only turns made of
+# such calls, and the MCP session manager only retries those after restarting a
+# server: a write (git_commit, create_issue, ...) may already have been applied.
+
+READ_ONLY_PREFIXES = ("get_", "list_", "search_", "scan_")
+READ_ONLY_TOOLS = {"git_log", "git_show", "git_blame", "git_branch", "git_file_authors", "git_commits_since",
+                   "git_branches_containing"}
+
+
+def is_read_only(tool_name):
+    return tool_name in READ_ONLY_TOOLS or tool_name.startswith(READ_ONLY_PREFIXES)
@@ -0,0 +1,374 @@
+import json
+import os
+import re
+import sys
+from collections import OrderedDict
+from conversation_memory import count_tokens
+
+# Compaction of MCP tool results before they enter the agent's context:
+# drop fields nobody asked for, encode lists of records as a table when that
+# is shorter than JSON, and cut long results with a handle the agent can pass
+# to page_tool_result to read the rest.
+
+DEFAULT_MAX_RESULT_TOKENS = int(os.getenv("VOICEGIT_TOOL_RESULT_TOKENS", "1500"))
+
+# API plumbing that is almost never what a question is about. A field is kept
+# anyway when the current question mentions it ("what's the ssh url of ...").
+NOISY_FIELDS = {"node_id", "gravatar_id", "avatar_url", "events_url", "received_events_url", "followers_url",
+                "following_url", "gists_url", "starred_url", "subscriptions_url", "organizations_url", "repos_url",
+                "permissions", "site_admin", "user_view_type", "temp_clone_token", "has_downloads", "has_pages",
+                "has_projects", "has_wiki", "has_discussions", "has_issues", "web_commit_signoff_required",
+                "security_and_analysis", "disabled", "mirror_url", "is_template", "allow_forking", "visibility",
+                # self links into api.github.com
+                "url"}
+KEPT_URL_FIELDS = {"html_url"}
+# GitHub's duplicated counters, dropped only when the record also has the twin they duplicate
+DUPLICATE_COUNTERS = {"forks": "forks_count", "open_issues": "open_issues_count", "watchers": "watchers_count",
+                      "watchers_count": "stargazers_count"}
+# Characters that would make a comma-joined list cell ambiguous
+LIST_CELL_UNSAFE = re.compile(r"[,|\s]")
+
+
+def field_words(name):
+    return set(re.split(r"[_\W]+", name.lower())) - {""}
+
+
+class ToolResultCompactor:
+    """Shrinks tool results and keeps the full versions for paging.
+
+    `intent` is the user's current question; fields it mentions survive the
+    projection. `projections` optionally maps a tool name to the only fields
+    worth keeping for that tool.
+    """
+
+    def __init__(self, max_result_tokens=DEFAULT_MAX_RESULT_TOKENS, projections=None, max_handles=50,
+                 page_size=20):
+        self.max_result_tokens = max_result_tokens
+        self.projections = projections or {}
+        self.max_handles = max_handles
+        self.page_size = page_size
+        self.intent = ""
+        self._handles = OrderedDict()
+        self._next_handle = 1
+        self.stats_by_tool = {}
+
+    def _wanted(self, field, tool_name, record):
+        intent_words = field_words(self.intent)
+        if (field_words(field) - {"url", "count", "at"}) & intent_words:
+            return True
+        allowed = self.projections.get(tool_name)
+        if allowed is not None:
+            return field in allowed
+        if field in NOISY_FIELDS or DUPLICATE_COUNTERS.get(field) in record:
+            return False
+        if field.endswith("_url") and field not in KEPT_URL_FIELDS:
+            return False
+        return True
+
+    def project(self, value, tool_name=""):
+        """Drop unwanted fields and empty values, recursively"""
+        if isinstance(value, dict):
+            projected = {}
+            for key, item in value.items():
+                if not self._wanted(key, tool_name, value):
+                    continue
+                item = self.project(item, tool_name)
+                if item is None or item == "" or item == [] or item == {}:
+                    continue
+                projected[key] = item
+            return projected
+        if isinstance(value, list):
+            return [self.project(item, tool_name) for item in value]
+        return value
+
+    def encode(self, value):
+        """Shortest of minified JSON and, for lists of flat records, a pipe-separated table"""
+        minified = json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+        table = self._table(value)
+        if table is not None and count_tokens(table) < count_tokens(minified):
+            return table
+        return minified
+
+    def _table(self, value):
+        if isinstance(value, dict):
+            lists = [key for key, item in value.items() if _records(_flatten_all(item))]
+            if len(lists) != 1:
+                return None
+            key = lists[0]
+            rest = {k: v for k, v in value.items() if k != key}
+            head = json.dumps(rest, separators=(",", ":"), ensure_ascii=False) + "\n" if rest else ""
+            return f"{head}{key}:\n{self._table(value[key])}"
+        value = _flatten_all(value)
+        if not _records(value):
+            return None
+        columns = []
+        for record in value:
+            columns.extend(key for key in record if key not in columns)
+        rows = ["|".join(columns)]
+        for record in value:
+            rows.append("|".join(_cell(record.get(column)) for column in columns))
+        return "\n".join(rows)
+
+    def _store(self, tool_name, value):
+        handle = f"r{self._next_handle}"
+        self._next_handle += 1
+        self._handles[handle] = (tool_name, value)
+        while len(self._handles) > self.max_handles:
+            self._handles.popitem(last=False)
+        return handle
+
+    def compact(self, text, tool_name=""):
+        """Compact one tool result text"""
+        try:
+            value = json.loads(text)
+        except (ValueError, TypeError):
+            value = None
+        if not isinstance(value, (dict, list)):
+            compacted = self._cut_text(text, tool_name)
+        else:
+            compacted = self._cut_records(value, tool_name)
+
+        stats = self.stats_by_tool.setdefault(tool_name, {"calls": 0, "tokens_in": 0, "tokens_out": 0})
+        stats["calls"] += 1
+        stats["tokens_in"] += count_tokens(text)
+        stats["tokens_out"] += count_tokens(compacted)
+        return compacted
+
+    def _cut_records(self, value, tool_name):
+        encoded = self.encode(self.project(value, tool_name))
+        if count_tokens(encoded) <= self.max_result_tokens:
+            return encoded
+        # Page the largest list of records; everything else is kept
+        container, key, items = _largest_list(value)
+        if items is None:
+            return self._cut_text(encoded, tool_name)
+        handle = self._store(tool_name, value)
+        shown = len(items)
+        while shown > 1:
+            shown = max(1, shown // 2) if shown > 2 * self.page_size else shown - 1
+            head = _with_items(value, container, key, items[:shown])
+            encoded = self.encode(self.project(head, tool_name))
+            # ~40 tokens stay free for the paging note
+            if count_tokens(encoded) <= self.max_result_tokens - 40:
+                break
+        return (f"{encoded}\n[showing {shown} of {len(items)} items; "
+                f"call page_tool_result(handle='{handle}', offset={shown}) for more, "
+                f"or pass fields=[...] for fields left out]")
+
+    def _cut_text(self, text, tool_name):
+        if count_tokens(text) <= self.max_result_tokens:
+            return text
+        lines = text.splitlines()
+        handle = self._store(tool_name, lines)
+        shown = 0
+        used = 0
+        for line in lines:
+            used += count_tokens(line) + 1
+            if used > self.max_result_tokens:
+                break
+            shown += 1
+        if shown == 0:
+            return (text[:self.max_result_tokens * 4] +
+                    f"\n[result cut; call page_tool_result(handle='{handle}') for the full text]")
+        return ("\n".join(lines[:shown]) + f"\n[showing lines 1-{shown} of {len(lines)}; "
+                f"call page_tool_result(handle='{handle}', offset={shown}) for more]")
+
+    def page(self, handle, offset=0, limit=None, fields=None):
+        """Items (or lines) of a stored result from offset; fields selects exactly which fields to show"""
+        if handle not in self._handles:
+            return f"Error: unknown or expired result handle {handle}"
+        tool_name, value = self._handles[handle]
+        self._handles.move_to_end(handle)
+        limit = limit or self.page_size
+        if isinstance(value, list) and all(isinstance(line, str) for line in value):
+            chunk = value[offset:offset + limit * 5]
+            more = offset + len(chunk) < len(value)
+            return "\n".join(chunk) + (f"\n[next: offset={offset + len(chunk)}]" if more else "")
+        container, key, items = _largest_list(value)
+        chunk = items[offset:offset + limit]
+        if fields:
+            chunk = [{field: item.get(field) for field in fields} if isinstance(item, dict) else item
+                     for item in chunk]
+        else:
+            chunk = self.project(chunk, tool_name)
+        more = offset + len(chunk) < len(items)
+        return self.encode(chunk) + (f"\n[{offset + len(chunk)} of {len(items)}; next: offset={offset + len(chunk)}]"
+                                     if more else f"\n[{offset + len(chunk)} of {len(items)}]")
+
+    async def interceptor(self, request, handler):
+        """MCP tool interceptor: compacts the text content of successful results"""
+        from mcp.types import CallToolResult, TextContent
+
+        result = await handler(request)
+        if not isinstance(result, CallToolResult) or result.isError:
+            return result
+        content = [
+            TextContent(type="text", text=self.compact(item.text, request.name))
+            if isinstance(item, TextContent) else item
+            for item in result.content
+        ]
+        return result.model_copy(update={"content": content})
+
+    def page_tool(self):
+        """LangChain tool that lets the agent read the rest of a compacted result"""
+        from langchain_core.tools import StructuredTool
+
+        def page_tool_result(handle: str, offset: int = 0, limit: int = 20, fields: list = None) -> str:
+            """Read more of a tool result that was cut short.
+
+            Args:
+                handle: The handle given in the cut result, e.g. 'r3'
+                offset: Index of the first item (or line) to return
+                limit: Number of items to return
+                fields: Only return these fields of each item; use it to see fields that were left out
+            """
+            return self.page(handle, offset, limit, fields)
+
+        return StructuredTool.from_function(page_tool_result)
+
+    def stats(self):
+        return {
+            tool: {**stats, "saved_pct": round(100 * (1 - stats["tokens_out"] / max(stats["tokens_in"], 1)), 1)}
+            for tool, stats in self.stats_by_tool.items()
+        }
+
+
+def _records(value):
+    return (isinstance(value, list) and len(value) > 1 and all(isinstance(item, dict) for item in value)
+            and all(not isinstance(v, (dict, list)) or _flat_list(v) for item in value for v in item.values()))
+
+
+def _flatten(record, prefix=""):
+    """Nested objects become dotted columns: {"owner": {"login": x}} -> {"owner.login": x}"""
+    flat = {}
+    for key, value in record.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        else:
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def _flatten_all(value):
+    if isinstance(value, list) and all(isinstance(item, dict) for item in value):
+        return [_flatten(item) for item in value]
+    return value
+
+
+def _flat_list(value):
+    """Lists that survive a comma-joined cell: scalars without commas, pipes or whitespace (names, paths, SHAs)"""
+    return isinstance(value, list) and all(
+        not isinstance(item, (dict, list)) and not LIST_CELL_UNSAFE.search(str(item)) for item in value)
+
+
+def _cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        value = ",".join(str(item) for item in value)
+    return str(value).replace("|", "\\|").replace("\n", " ")
+
+
+def _largest_list(value):
+    """(container, key, items) of the longest list at the top level of a result"""
+    if isinstance(value, list):
+        return None, None, value
+    best = (None, None, None)
+    for key, item in value.items():
+        if isinstance(item, list) and (best[2] is None or len(item) > len(best[2])):
+            best = (value, key, item)
+    return best
+
+
+def _with_items(value, container, key, items):
+    if container is None:
+        return items
+    return {**value, key: items}
+
+
+def fixture_results():
+    """Tool results shaped like the GitHub and git servers' output, for the benchmark"""
+    def user(i):
+        login = f"dev{i}"
+        return {
+            "login": login, "id": 1000 + i, "node_id": f"MDQ6VXNlcj{i:08d}",
+            "avatar_url": f"https://avatars.githubusercontent.com/u/{1000 + i}?v=4", "gravatar_id": "",
+            "url": f"https://api.github.com/users/{login}", "html_url": f"https://github.com/{login}",
+            **{f"{name}_url": f"https://api.github.com/users/{login}/{name}" for name in (
+                "followers", "following", "gists", "starred", "subscriptions", "organizations", "repos",
+                "events", "received_events")},
+            "type": "User", "user_view_type": "public", "site_admin": False
+        }
+
+    def repo(i):
+        name = f"service-{i}"
+        full = f"acme/{name}"
+        return {
+            "id": 5000 + i, "node_id": f"R_kgDOH{i:06d}", "name": name, "full_name": full, "private": i % 3 == 0,
+            "owner": user(i % 5), "html_url": f"https://github.com/{full}",
+            "description": f"Service {i} of the acme platform", "fork": False,
+            "url": f"https://api.github.com/repos/{full}",
+            **{f"{name_}_url": f"https://api.github.com/repos/{full}/{name_}" for name_ in (
+                "forks", "keys", "collaborators", "teams", "hooks", "issue_events", "events", "assignees",
+                "branches", "tags", "blobs", "git_tags", "git_refs", "trees", "statuses", "languages",
+                "stargazers", "contributors", "subscribers", "subscription", "commits", "git_commits",
+                "comments", "issue_comment", "contents", "compare", "merges", "archive", "downloads", "issues",
+                "pulls", "milestones", "notifications", "labels", "releases", "deployments")},
+            "created_at": "2023-01-02T10:00:00Z", "updated_at": "2024-05-06T10:00:00Z",
+            "pushed_at": "2024-05-06T09:00:00Z", "git_url": f"git://github.com/{full}.git",
+            "ssh_url": f"git@github.com:{full}.git", "clone_url": f"https://github.com/{full}.git",
+            "svn_url": f"https://github.com/{full}", "homepage": None, "size": 1000 + i * 37,
+            "stargazers_count": i * 3, "watchers_count": i * 3, "language": ["Python", "Go", "TypeScript"][i % 3],
+            "has_issues": True, "has_projects": True, "has_downloads": True, "has_wiki": False,
+            "has_pages": False, "has_discussions": False, "forks_count": i, "mirror_url": None,
+            "archived": False, "disabled": False, "open_issues_count": i % 7, "license": None,
+            "allow_forking": True, "is_template": False, "web_commit_signoff_required": False,
+            "topics": ["platform", "internal"], "visibility": "private" if i % 3 == 0 else "public",
+            "forks": i, "open_issues": i % 7, "watchers": i * 3, "default_branch": "main",
+            "permissions": {"admin": False, "maintain": False, "push": True, "triage": True, "pull": True}
+        }
+
+    yield "list_org_repos (raw API, 30 repos)", "list_org_repos", json.dumps([repo(i) for i in range(30)], indent=2)
+    yield "get_org_members (raw API, 60 members)", "get_org_members", json.dumps(
+        [user(i) for i in range(60)], indent=2)
+    yield "list_org_repos (summarised, 100 repos)", "list_org_repos", json.dumps({
+        "organization": "acme", "truncated": False,
+        "repositories": [{key: repo(i)[key] for key in (
+            "name", "full_name", "description", "language", "stargazers_count", "forks_count", "private",
+            "created_at", "updated_at", "default_branch", "topics", "html_url", "clone_url", "ssh_url", "git_url")}
+            for i in range(100)]
+    }, indent=2)
+    yield "git_log (50 commits)", "git_log", json.dumps({
+        "repository": "/work/acme", "total_commits": 50,
+        "commits": [{"sha": f"{i:040x}", "parents": [f"{i + 1:040x}"], "author": f"dev{i % 4}",
+                     "email": f"dev{i % 4}@acme.dev", "timestamp": 1714000000 - i * 3600,
+                     "subject": f"Fix issue #{100 + i} in the request pipeline",
+                     "files": [f"src/module_{i % 9}.py", "tests/test_pipeline.py"]} for i in range(50)]
+    }, indent=2)
+    yield "get_repo_tree (800 paths)", "get_repo_tree", json.dumps({
+        "repository": "acme/platform", "ref": "main",
+        "entries": [{"path": f"src/pkg{i // 40}/module_{i}.py", "type": "blob", "size": 1200 + i,
+                     "sha": f"{i:040x}"} for i in range(800)]
+    }, indent=2)
+
+
+def benchmark_compaction(max_result_tokens=DEFAULT_MAX_RESULT_TOKENS):
+    """Tokens per tool result before and after compaction on the fixtures"""
+    compactor = ToolResultCompactor(max_result_tokens=max_result_tokens)
+    unbounded = ToolResultCompactor(max_result_tokens=sys.maxsize)
+    print(f"Tokens per tool result: raw -> projected+encoded -> with {max_result_tokens}-token cut")
+    for label, tool_name, text in fixture_results():
+        before = count_tokens(text)
+        encoded = count_tokens(unbounded.compact(text, tool_name))
+        compacted = compactor.compact(text, tool_name)
+        after = count_tokens(compacted)
+        mode = "table" if "|" in compacted.split("\n", 2)[-1][:200] else "json"
+        paged = " +handle" if "page_tool_result" in compacted else ""
+        print(f"  {label:40} {before:7} -> {encoded:6} ({100 * (1 - encoded / before):4.1f}% saved, {mode})"
+              f" -> {after:5}{paged}")
+    return compactor.stats()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        benchmark_compaction()
@@ -0,0 +1,379 @@
+import asyncio
+import json
+import math
+import os
+import re
+import sys
+import time
+from collections import Counter, OrderedDict
+from conversation_memory import count_tokens
+from prompt_cache import CACHE_POINT, bind_tools, stable_tools
+from query_text import STOPWORDS
+
+# Per-turn tool subsetting. Every MCP tool's schema goes into every model call,
+# so the prompt grows with each server added. ToolSelector scores the tools
+# against the question with a local keyword index (BM25 over tool names,
+# descriptions and parameter names) and binds only the best matches to the
+# model. The tool node keeps every tool, and the model can load more through
+# find_tools when none of the ones it was given fit. The core tools are bound
+# on every call ahead of the per-turn matches, so they stay a cached prompt
+# prefix while the rest of the subset changes from turn to turn.
+
+TOOL_SUBSET = os.getenv("VOICEGIT_TOOL_SUBSET", "1") != "0"
+TOOL_SUBSET_SIZE = int(os.getenv("VOICEGIT_TOOL_SUBSET_SIZE", "12"))
+# Always bound: the escape hatch, result paging and the agent prompt's get_me
+ALWAYS_TOOLS = {"find_tools", "page_tool_result", "get_me"}
+# Also always bound: the tools most questions end up calling (comma-separated names)
+CORE_TOOLS = {name.strip() for name in os.getenv(
+    "VOICEGIT_CORE_TOOLS", "git_status,git_log,get_diff,list_user_organizations,list_org_repos").split(",")
+    if name.strip()}
+
+# Filler words on top of the shared question stopwords; they appear in descriptions too and only add noise
+FILLER = STOPWORDS | {"and", "or", "with", "by", "from", "how", "who", "why", "my", "it", "its", "them", "at",
+                      "be", "last", "one", "two", "each", "other", "another", "out", "off"}
+
+SYNONYMS = {"repository": "repo", "repositories": "repo", "organization": "org", "organisation": "org",
+            "organizations": "org", "organisations": "org", "pr": "pull", "prs": "pull", "mr": "pull",
+            "ticket": "issue", "tickets": "issue", "member": "user", "members": "user", "people": "user",
+            "folder": "directory", "dir": "directory", "delete": "remove", "del": "remove", "rm": "remove",
+            "make": "create", "new": "create", "add": "create", "modify": "update", "edit": "update"}
+
+
+def terms(text):
+    """Index terms of text: words split at underscores and camelCase, synonyms folded, plurals stemmed"""
+    text = re.sub(r"([a-z])([A-Z])", r"\1 \2", text).replace("_", " ").lower()
+    result = []
+    for word in re.findall(r"[a-z0-9]+", text):
+        if word in FILLER:
+            continue
+        word = SYNONYMS.get(word, word)
+        if len(word) > 4 and word.endswith("ies"):
+            word = word[:-3] + "y"
+        elif len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        result.append(word)
+    return result
+
+
+def tool_schema(tool):
+    """OpenAI-format schema of a tool, as sent to the model"""
+    from langchain_core.utils.function_calling import convert_to_openai_tool
+
+    return convert_to_openai_tool(tool)
+
+
+class ToolIndex:
+    """BM25 index over tool names (weighted double), descriptions and parameter names"""
+
+    def __init__(self, tools, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.docs = {}
+        for tool in tools:
+            parameters = " ".join((getattr(tool, "args", None) or {}).keys())
+            self.docs[tool.name] = Counter(terms(tool.name) * 2 + terms(tool.description or "") + terms(parameters))
+        self.average_length = sum(sum(doc.values()) for doc in self.docs.values()) / max(len(self.docs), 1)
+        frequency = Counter(term for doc in self.docs.values() for term in doc)
+        count = len(self.docs)
+        self.idf = {term: math.log(1 + (count - n + 0.5) / (n + 0.5)) for term, n in frequency.items()}
+
+    def scores(self, query):
+        words = set(terms(query))
+        scores = {}
+        for name, doc in self.docs.items():
+            length = sum(doc.values())
+            score = 0.0
+            for word in words & doc.keys():
+                tf = doc[word]
+                score += self.idf[word] * tf * (self.k1 + 1) / (
+                    tf + self.k1 * (1 - self.b + self.b * length / self.average_length))
+            if score > 0:
+                scores[name] = score
+        return scores
+
+    def search(self, query, limit):
+        ranked = sorted(self.scores(query).items(), key=lambda item: (-item[1], item[0]))
+        return [name for name, _ in ranked[:limit]]
+
+
+class ToolSelector:
+    """Picks the tools bound to the model for each call of a turn.
+
+    The subset is the `max_tools` best matches for the last two user messages,
+    plus ALWAYS_TOOLS and the `core` tools, tools already called in the turn
+    and tools the model loaded with find_tools. With `enabled` off
+    (VOICEGIT_TOOL_SUBSET=0 or the /tools all command) every tool is bound.
+    Bound models are cached per subset.
+    """
+
+    def __init__(self, tools, max_tools=TOOL_SUBSET_SIZE, enabled=TOOL_SUBSET, always=ALWAYS_TOOLS,
+                 core=CORE_TOOLS):
+        self.tools = {tool.name: tool for tool in tools}
+        self.max_tools = max_tools
+        self.enabled = enabled
+        self.always = set(always) | set(core)
+        self.index = ToolIndex(tools)
+        self._bound = OrderedDict()
+        self._schema_tokens = {}
+        self.last_stats = None
+
+    def find_tools_tool(self):
+        """Escape hatch: LangChain tool the model calls to get more tools bound"""
+        from langchain_core.tools import StructuredTool
+
+        def find_tools(need: str) -> str:
+            """Load more tools when none of the available ones can do what is needed.
+
+            Args:
+                need: What the tool should do, e.g. 'merge a pull request', or 'all' for every tool
+            """
+            names = self._found(need)
+            return "Loaded tools: " + ", ".join(names) if names else "No matching tools; try other words or 'all'"
+
+        tool = StructuredTool.from_function(find_tools)
+        self.tools[tool.name] = tool
+        return tool
+
+    def _found(self, need):
+        if need.strip().lower() == "all":
+            return sorted(self.tools)
+        return self.index.search(need, self.max_tools)
+
+    def select(self, messages):
+        """Names of the tools to bind for a model call on these messages"""
+        if not self.enabled or len(self.tools) <= self.max_tools + len(self.always & self.tools.keys()):
+            return sorted(self.tools)
+        human = [message for message in messages if getattr(message, "type", None) == "human"]
+        scores = Counter()
+        for weight, message in zip((1.0, 0.5), reversed(human[-2:])):
+            for name, score in self.index.scores(str(message.content)).items():
+                scores[name] += weight * score
+        selected = {name for name, _ in sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:self.max_tools]}
+        selected |= self.always
+        # Tools called since the question keep their schema, and find_tools results are added
+        turn_start = max((i for i, message in enumerate(messages) if getattr(message, "type", None) == "human"),
+                         default=0)
+        for message in messages[turn_start:]:
+            for call in getattr(message, "tool_calls", None) or []:
+                selected.add(call["name"])
+                if call["name"] == "find_tools":
+                    selected.update(self._found(str(call.get("args", {}).get("need", ""))))
+        return sorted(name for name in selected if name in self.tools)
+
+    def schema_tokens(self, names):
+        total = 0
+        for name in names:
+            if name not in self._schema_tokens:
+                self._schema_tokens[name] = count_tokens(json.dumps(tool_schema(self.tools[name])))
+            total += self._schema_tokens[name]
+        return total
+
+    def bound_tools(self, names):
+        """Tools to bind for names: the always-bound ones, a cache point, then the per-turn matches"""
+        shared = stable_tools(self.tools[name] for name in names if name in self.always)
+        matched = stable_tools(self.tools[name] for name in names if name not in self.always)
+        if not self.enabled or not shared or not matched:
+            return stable_tools(self.tools[name] for name in names)
+        return [*shared, CACHE_POINT, *matched]
+
+    def bound_model(self, model, names):
+        key = (id(model), tuple(names))
+        if key not in self._bound:
+            self._bound[key] = bind_tools(model, self.bound_tools(names))
+            while len(self._bound) > 32:
+                self._bound.popitem(last=False)
+        self._bound.move_to_end(key)
+        return self._bound[key]
+
+    def dynamic_model(self, model):
+        """create_react_agent model callable binding the selected subset per model call"""
+        def select_model(state, runtime):
+            start = time.perf_counter()
+            names = self.select(state["messages"])
+            bound = self.bound_model(model, names)
+            self.last_stats = {
+                "tools": len(names),
+                "total_tools": len(self.tools),
+                "schema_tokens": self.schema_tokens(names),
+                "select_ms": round((time.perf_counter() - start) * 1000, 3)
+            }
+            return bound
+        return select_model
+
+    def stats(self):
+        return {"enabled": self.enabled, "max_tools": self.max_tools, **(self.last_stats or {})}
+
+
+# Fake registry for the benchmark: 10 MCP servers of 10 tools each
+REGISTRY = {
+    "github": ["list_org_repos: List the repositories of a GitHub organization",
+               "list_org_repos_branches: List the branches of a repository in an organization",
+               "get_me: Get the authenticated GitHub user",
+               "list_user_organizations: List the organizations the user belongs to",
+               "create_pull_request: Open a pull request from a branch",
+               "merge_pull_request: Merge an open pull request",
+               "list_pull_requests: List pull requests of a repository",
+               "create_issue: Create an issue in a repository",
+               "list_issues: List open issues of a repository",
+               "get_file_contents: Read a file from a repository at a ref"],
+    "git": ["git_status: Show the working tree status of the local repository",
+            "git_diff: Show unstaged changes in the local repository",
+            "git_log: Show the commit history of the local repository",
+            "git_show: Show a commit or a file at a revision",
+            "git_blame: Show which commit last changed each line of a file",
+            "git_branch: List local branches",
+            "git_stash: List, push, apply or drop stashes",
+            "git_add: Stage files for commit",
+            "git_commit: Record staged changes as a commit",
+            "git_file_authors: Authors who changed a file and how often"],
+    "jira": ["jira_search: Search Jira tickets with JQL", "jira_create: Create a Jira ticket",
+             "jira_transition: Move a Jira ticket to another status", "jira_comment: Comment on a Jira ticket",
+             "jira_assign: Assign a Jira ticket to a user", "jira_sprint: Show the active sprint of a board",
+             "jira_boards: List Jira boards", "jira_projects: List Jira projects",
+             "jira_worklog: Log work on a Jira ticket", "jira_link: Link two Jira tickets"],
+    "slack": ["slack_post: Post a message to a Slack channel", "slack_channels: List Slack channels",
+              "slack_history: Read recent messages of a Slack channel", "slack_thread: Reply in a Slack thread",
+              "slack_users: List Slack workspace users", "slack_react: Add an emoji reaction to a message",
+              "slack_search: Search Slack messages", "slack_upload: Upload a file to a Slack channel",
+              "slack_status: Set the user's Slack status", "slack_dm: Send a direct message to a user"],
+    "kubernetes": ["k8s_pods: List pods in a namespace", "k8s_logs: Read the logs of a pod",
+                   "k8s_deployments: List deployments in a namespace", "k8s_scale: Scale a deployment",
+                   "k8s_rollout_restart: Restart a deployment rollout", "k8s_describe: Describe a resource",
+                   "k8s_events: List recent cluster events", "k8s_namespaces: List namespaces",
+                   "k8s_apply: Apply a manifest", "k8s_delete: Delete a resource"],
+    "ci": ["ci_runs: List workflow runs of a repository", "ci_run_logs: Download the logs of a workflow run",
+           "ci_rerun: Re-run a failed workflow run", "ci_cancel: Cancel a running workflow",
+           "ci_workflows: List workflows of a repository", "ci_artifacts: List artifacts of a workflow run",
+           "ci_secrets: List the names of repository secrets", "ci_dispatch: Trigger a workflow dispatch",
+           "ci_status: Combined CI status of a commit", "ci_cache: List Actions caches of a repository"],
+    "docs": ["docs_search: Search the engineering wiki", "docs_page: Read a wiki page",
+             "docs_create: Create a wiki page", "docs_update: Update a wiki page",
+             "docs_recent: Recently changed wiki pages", "docs_spaces: List wiki spaces",
+             "docs_comments: Comments on a wiki page", "docs_attach: Attach a file to a wiki page",
+             "docs_move: Move a wiki page", "docs_export: Export a wiki page as PDF"],
+    "monitoring": ["metrics_query: Run a PromQL query", "alerts_list: List firing alerts",
+                   "alerts_silence: Silence an alert", "dashboards_list: List Grafana dashboards",
+                   "dashboard_panel: Render a dashboard panel", "incidents_list: List open incidents",
+                   "incident_create: Declare an incident", "oncall_who: Who is on call for a service",
+                   "slo_status: Error budget of a service SLO", "traces_search: Search distributed traces"],
+    "cloud": ["s3_list: List objects in an S3 bucket", "s3_get: Download an S3 object",
+              "ec2_instances: List EC2 instances", "ec2_stop: Stop an EC2 instance",
+              "lambda_list: List Lambda functions", "lambda_invoke: Invoke a Lambda function",
+              "iam_whoami: Show the current AWS identity", "cost_report: Monthly AWS cost by service",
+              "rds_instances: List RDS databases", "cloudwatch_logs: Query CloudWatch log groups"],
+    "packages": ["npm_info: Show npm package metadata", "pypi_info: Show PyPI package metadata",
+                 "deps_outdated: List outdated dependencies of a repository",
+                 "deps_audit: Known vulnerabilities in dependencies", "license_check: Licenses of dependencies",
+                 "sbom_generate: Generate an SBOM for a repository", "renovate_prs: List dependency update PRs",
+                 "lockfile_diff: Diff two lockfiles", "docker_tags: List tags of a container image",
+                 "image_scan: Scan a container image for vulnerabilities"],
+}
+
+BENCH_QUERIES = [
+    ("list the repos in acme", "list_org_repos"),
+    ("what branches does service-api have", "list_org_repos_branches"),
+    ("open a PR from feature-x to main", "create_pull_request"),
+    ("which organizations am I in", "list_user_organizations"),
+    ("show me the last 10 commits", "git_log"),
+    ("who last changed line 40 of main.py", "git_blame"),
+    ("stage README.md and commit it", "git_add"),
+    ("create a Jira ticket for the login bug", "jira_create"),
+    ("post 'deploy done' to #releases on slack", "slack_post"),
+    ("restart the api deployment", "k8s_rollout_restart"),
+    ("why did the last workflow run fail, show logs", "ci_run_logs"),
+    ("what are the firing alerts", "alerts_list"),
+    ("who is on call for payments", "oncall_who"),
+    ("list outdated dependencies in service-web", "deps_outdated"),
+    ("merge pull request 42", "merge_pull_request"),
+    ("show the pods in the staging namespace", "k8s_pods"),
+]
+
+
+def fake_registry():
+    """100 LangChain tools with realistic names, descriptions and parameters"""
+    from langchain_core.tools import StructuredTool
+
+    def make(name, description):
+        def run(repo: str = "", org: str = "", query: str = "", limit: int = 20) -> str:
+            return f"{name} result"
+        return StructuredTool.from_function(run, name=name, description=description)
+
+    return [make(*line.split(": ", 1)) for lines in REGISTRY.values() for line in lines]
+
+
+def cached_prefix_tokens(tools, schema_tokens, prompt_tokens, seen):
+    """Prompt tokens a Bedrock-style prefix cache would serve for one call, recording its cache points in seen
+
+    Cache points sit where the bound tools have one, after the last tool and
+    after the agent prompt; a point hits when an earlier call had the same
+    prefix up to it.
+    """
+    points, names, tokens = [], (), 0
+    for tool in tools:
+        if isinstance(tool, dict):
+            points.append((names, tokens))
+        else:
+            names += (tool.name,)
+            tokens += schema_tokens[tool.name]
+    points += [(names, tokens), (names + ("<system>",), tokens + prompt_tokens)]
+    cached = max((tokens for key, tokens in points if key in seen), default=0)
+    seen.update(key for key, _ in points)
+    return cached
+
+
+async def benchmark_selection(ms_per_1k_tokens=25.0, base_ms=250.0):
+    """Prompt tokens, prefix cache hits, recall and simulated time to first token per binding mode.
+
+    Each query is a turn of two model calls (the tool call, then the answer).
+    Time to first token is modelled as base_ms plus ms_per_1k_tokens per 1000
+    prompt tokens not served from the prefix cache (prefill), on a fake model
+    whose latency is injected. Billed input counts cache reads at 10% of the
+    input price, as on Bedrock.
+    """
+    from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+    from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+    tools = fake_registry()
+    prompt_tokens = count_tokens("Your are a Git Agent which does takes for Git Actions")
+
+    class FakeModel(GenericFakeChatModel):
+        def bind_tools(self, tools, **kwargs):
+            return self.bind(tool_count=len(tools))
+
+    modes = (("all 100 tools", False, CORE_TOOLS),
+             (f"subset (top {TOOL_SUBSET_SIZE}), no core", True, ()),
+             ("subset + core tools", True, CORE_TOOLS))
+    for label, enabled, core in modes:
+        selector = ToolSelector(tools, enabled=enabled, core=core)
+        selector.find_tools_tool()
+        select_model = selector.dynamic_model(FakeModel(messages=iter([AIMessage(content="ok")] * 100)))
+        schema_tokens = {name: selector.schema_tokens([name]) for name in selector.tools}
+        seen = set()
+        tokens, cached, first_token, hits = [], [], [], 0
+        for query, expected in BENCH_QUERIES:
+            call = {"id": "call_1", "name": expected, "args": {}}
+            for messages in ([HumanMessage(query)],
+                             [HumanMessage(query), AIMessage(content="", tool_calls=[call]),
+                              ToolMessage(content="result", tool_call_id="call_1")]):
+                start = time.perf_counter()
+                model = select_model({"messages": messages}, None)
+                names = selector.select(messages)
+                total = prompt_tokens + selector.last_stats["schema_tokens"] + count_tokens(query)
+                hit = cached_prefix_tokens(selector.bound_tools(names), schema_tokens, prompt_tokens, seen)
+                await asyncio.sleep((base_ms + ms_per_1k_tokens * (total - hit) / 1000) / 1000)
+                await model.ainvoke(messages)
+                first_token.append(time.perf_counter() - start)
+                tokens.append(total)
+                cached.append(hit)
+            hits += expected in selector.select([HumanMessage(query)])
+        print(f"  {label:26} prompt tokens mean {sum(tokens) / len(tokens):6.0f}"
+              f"  cached {100 * sum(cached) / sum(tokens):4.1f}%"
+              f"  uncached mean {(sum(tokens) - sum(cached)) / len(tokens):6.0f}"
+              f"  billed input mean {(sum(tokens) - 0.9 * sum(cached)) / len(tokens):6.0f}"
+              f"  first token mean {sum(first_token) / len(first_token) * 1000:5.0f} ms"
+              f"  right tool bound {hits}/{len(BENCH_QUERIES)}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        asyncio.run(benchmark_selection())
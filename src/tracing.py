@@ -0,0 +1,357 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Span tracing of chat turns. Spans (turn, llm_call, tool_call, mcp_call, and
+# http_request from the GitHub MCP server process) are appended to a JSONL file
+# with OTLP span field names; `voicegit trace summarize` reads it back and
+# prints the critical path of the slowest turns. The MCP server writes to the
+# same file without a parent id, and is attached to the tool call whose time
+# window contains it.
+
+TRACE_ENABLED = os.getenv("VOICEGIT_TRACE", "1") != "0"
+TRACE_FILE = os.getenv("VOICEGIT_TRACE_FILE") or os.path.join(os.path.expanduser("~"), ".voicegit", "traces.jsonl")
+TRACE_MAX_BYTES = int(os.getenv("VOICEGIT_TRACE_MAX_MB", "20")) * 1024 * 1024
+
+_current = contextvars.ContextVar("voicegit_span", default=None)
+
+
+class Span:
+    """One timed operation; ended (and written) by Tracer.span or end()"""
+
+    def __init__(self, tracer, name, trace_id, parent_id, attributes):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.attributes = dict(attributes)
+        self.start_ns = time.time_ns()
+        self._start = time.perf_counter()
+        self.end_ns = None
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def end(self, error=None):
+        if self.end_ns is not None:
+            return
+        # Duration from the monotonic clock, anchored at the wall-clock start
+        self.end_ns = self.start_ns + int((time.perf_counter() - self._start) * 1e9)
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        self.tracer.write(self)
+
+    @property
+    def seconds(self):
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+    def to_dict(self):
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id,
+            "name": self.name,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "attributes": self.attributes,
+            "status": {"code": "ERROR", "message": self.error} if self.error else {"code": "OK"},
+            "resource": {"service.name": self.tracer.service}
+        }
+
+
+class Tracer:
+    """Writes finished spans as JSON lines; the file is rotated to .1 past max_bytes
+
+    The file is opened once and kept open. Another process rotating the same
+    file leaves this one writing to the .1 file until its own next rotation;
+    load_spans reads both.
+    """
+
+    def __init__(self, path=TRACE_FILE, service="voicegit", enabled=TRACE_ENABLED, max_bytes=TRACE_MAX_BYTES):
+        self.path = path
+        self.service = service
+        self.enabled = enabled
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._file = None
+        self._size = 0
+
+    def start_span(self, name, parent=None, **attributes):
+        """Span under `parent` (default: the current span); a new trace when there is none"""
+        parent = parent if parent is not None else _current.get()
+        trace_id = parent.trace_id if parent is not None else os.urandom(16).hex()
+        return Span(self, name, trace_id, parent.span_id if parent is not None else None, attributes)
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """Context manager: the span is current (parent of new spans) inside the block"""
+        span = self.start_span(name, **attributes)
+        token = _current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.end(error=e)
+            raise
+        finally:
+            _current.reset(token)
+            span.end()
+
+    def _open(self):
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        else:
+            self._file.close()
+        if os.path.exists(self.path) and os.path.getsize(self.path) > self.max_bytes:
+            try:
+                os.replace(self.path, self.path + ".1")
+            except OSError:
+                # Still open in another process (Windows); try again at the next rotation
+                pass
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._size = self._file.tell()
+
+    def write(self, span):
+        if not self.enabled:
+            return
+        line = json.dumps(span.to_dict(), default=str) + "\n"
+        with self._lock:
+            try:
+                if self._file is None or self._size > self.max_bytes:
+                    self._open()
+                self._file.write(line)
+                # Flushed per span, so `trace summarize` sees turns that are still running
+                self._file.flush()
+                self._size += len(line.encode("utf-8"))
+            except OSError:
+                # Tracing must never break a turn
+                self.enabled = False
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+tracer = Tracer()
+
+
+def span(name, **attributes):
+    return tracer.span(name, **attributes)
+
+
+def current_span():
+    return _current.get()
+
+
+_llm_handler_class = None
+
+
+def llm_callback():
+    """LangChain callback handler recording an llm_call span per chat model run
+
+    Spans carry the model class, first-token time, message count and bytes
+    sent, and the token usage the provider reports. Provider calls made by
+    the router (or a cassette) nest under the router's span; a hedged request
+    shows one provider span per provider raced.
+    """
+    global _llm_handler_class
+    if _llm_handler_class is None:
+        from langchain_core.callbacks import BaseCallbackHandler
+
+        class LLMSpanHandler(BaseCallbackHandler):
+            run_inline = True
+
+            def __init__(self):
+                self.spans = {}
+
+            def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, tags=None, **kwargs):
+                parent = None
+                if "nostream" in (tags or []):
+                    # Provider call of a router/cassette: its run is a sibling of the wrapping
+                    # model's (astream passes no run manager on), so nest it under that one
+                    parent = next((span for span, parent_id, wrapped in reversed(self.spans.values())
+                                   if parent_id == parent_run_id and not wrapped and span.end_ns is None), None)
+                batch = messages[0] if messages else []
+                model = (serialized or {}).get("name") or ((serialized or {}).get("id") or ["?"])[-1]
+                span = tracer.start_span("llm_call", parent=parent, model=model, messages=len(batch),
+                                         request_bytes=sum(len(str(message.content).encode()) for message in batch))
+                self.spans[run_id] = (span, parent_run_id, parent is not None)
+
+            def on_llm_new_token(self, token, *, run_id, **kwargs):
+                span = self.spans.get(run_id, (None,))[0]
+                if span is not None and "first_token" not in span.attributes:
+                    span.set(first_token=round(span.seconds, 3))
+
+            def on_llm_end(self, response, *, run_id, **kwargs):
+                span = self.spans.pop(run_id, (None,))[0]
+                if span is None:
+                    return
+                try:
+                    message = response.generations[0][0].message
+                    usage = message.usage_metadata or {}
+                    details = usage.get("input_token_details") or {}
+                    span.set(input_tokens=usage.get("input_tokens"), output_tokens=usage.get("output_tokens"),
+                             cache_read_tokens=details.get("cache_read"),
+                             tool_calls=len(getattr(message, "tool_calls", None) or []),
+                             response_bytes=len(str(message.content).encode()))
+                except (AttributeError, IndexError):
+                    pass
+                span.end()
+
+            def on_llm_error(self, error, *, run_id, **kwargs):
+                span = self.spans.pop(run_id, (None,))[0]
+                if span is not None:
+                    span.end(error=error)
+
+        _llm_handler_class = LLMSpanHandler
+    return _llm_handler_class()
+
+
+def load_spans(path=TRACE_FILE):
+    spans = []
+    for file_path in (path + ".1", path):
+        try:
+            with open(file_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        spans.append(json.loads(line))
+                    except ValueError:
+                        continue
+        except OSError:
+            continue
+    return spans
+
+
+def build_trees(spans):
+    """Children per span id, with parentless spans of other services attached by time window"""
+    by_id = {span["spanId"]: span for span in spans}
+    children = {span_id: [] for span_id in by_id}
+    windows = [span for span in spans if span["name"] in ("mcp_call", "tool_call")]
+    for span in spans:
+        parent = span.get("parentSpanId")
+        if parent is None and span["resource"]["service.name"] != "voicegit":
+            # Innermost tool/MCP call that was running for the whole of this span
+            holders = [w for w in windows
+                       if w["startTimeUnixNano"] <= span["startTimeUnixNano"]
+                       and w["endTimeUnixNano"] >= span["endTimeUnixNano"]]
+            if holders:
+                parent = max(holders, key=lambda w: (w["startTimeUnixNano"], w["name"] == "mcp_call"))["spanId"]
+                span["traceId"] = by_id[parent]["traceId"]
+                span["parentSpanId"] = parent
+        if parent in children:
+            children[parent].append(span)
+    return children
+
+
+def duration(span):
+    return (span["endTimeUnixNano"] - span["startTimeUnixNano"]) / 1e9
+
+
+def critical_path(span, children):
+    """(span, [critical path of child, ...]): walking back from the end, the child that finished last, then
+    the last one to finish before it started, and so on"""
+    path = []
+    cursor = span["endTimeUnixNano"]
+    for child in sorted(children.get(span["spanId"], []), key=lambda c: c["endTimeUnixNano"], reverse=True):
+        if child["endTimeUnixNano"] <= cursor:
+            path.append(critical_path(child, children))
+            cursor = child["startTimeUnixNano"]
+    return span, list(reversed(path))
+
+
+def describe(span):
+    attributes = span.get("attributes", {})
+    if span["name"] == "llm_call":
+        details = [f"{attributes.get('input_tokens')} in / {attributes.get('output_tokens')} out tokens"
+                   if attributes.get("output_tokens") is not None else f"{attributes.get('request_bytes', 0)} B sent",
+                   f"first token {attributes['first_token']}s" if "first_token" in attributes else None]
+        return f"llm_call {attributes.get('model', '')}", details
+    if span["name"] in ("tool_call", "mcp_call"):
+        return (f"{span['name']} {attributes.get('tool', '')}",
+                [f"{attributes.get('server')}" if attributes.get("server") else None,
+                 f"{attributes.get('result_bytes')} B result" if attributes.get("result_bytes") is not None else None])
+    if span["name"] == "http_request":
+        return (f"http_request {attributes.get('method', '')} {attributes.get('endpoint', '')}",
+                [str(attributes.get("status", "")), f"{attributes.get('response_bytes', 0)} B"])
+    if span["name"] == "turn":
+        return "turn", [repr(attributes.get("query", ""))[:60]]
+    return span["name"], []
+
+
+def summarize(path=TRACE_FILE, top=3, echo=print):
+    """Print the critical path of the `top` slowest turns in the trace file"""
+    spans = [span for span in load_spans(path) if span.get("endTimeUnixNano")]
+    children = build_trees(spans)
+    turns = sorted((span for span in spans if span["name"] == "turn"), key=duration, reverse=True)
+    if not turns:
+        echo(f"No turns traced in {path}")
+        return []
+    echo(f"{len(turns)} turns traced in {path}; slowest {min(top, len(turns))}:")
+
+    def show(node, total, depth):
+        span, path = node
+        label, details = describe(span)
+        details = ", ".join(detail for detail in details if detail)
+        error = "  ❌ " + span["status"].get("message", "") if span.get("status", {}).get("code") == "ERROR" else ""
+        echo(f"  {'  ' * depth}{label:<{48 - 2 * depth}} {duration(span):7.2f}s {duration(span) / total:5.0%}"
+             f"{'  (' + details + ')' if details else ''}{error}")
+        for child in path:
+            show(child, total, depth + 1)
+
+    for turn in turns[:top]:
+        total = duration(turn) or 1e-9
+        started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(turn["startTimeUnixNano"] / 1e9))
+        echo(f"\n{started}  trace {turn['traceId'][:12]}")
+        root = critical_path(turn, children)
+        show(root, total, 0)
+        # Time per kind on the critical path, spans not counting their children
+        kinds = {}
+
+        def tally(node):
+            span, path = node
+            own = duration(span) - sum(duration(child[0]) for child in path)
+            kinds[span["name"]] = kinds.get(span["name"], 0) + own
+            for child in path:
+                tally(child)
+        tally(root)
+        echo("  by kind: " + " · ".join(f"{name} {seconds:.2f}s" for name, seconds in
+                                        sorted(kinds.items(), key=lambda item: -item[1])))
+    return turns[:top]
+
+
+def to_otlp(spans):
+    """OTLP/JSON (ExportTraceServiceRequest) document of spans, grouped by service"""
+    def value(v):
+        if isinstance(v, bool):
+            return {"boolValue": v}
+        if isinstance(v, int):
+            return {"intValue": str(v)}
+        if isinstance(v, float):
+            return {"doubleValue": v}
+        return {"stringValue": str(v)}
+
+    services = {}
+    for span in spans:
+        services.setdefault(span["resource"]["service.name"], []).append({
+            "traceId": span["traceId"],
+            "spanId": span["spanId"],
+            **({"parentSpanId": span["parentSpanId"]} if span.get("parentSpanId") else {}),
+            "name": span["name"],
+            "kind": 3 if span["name"] in ("http_request", "llm_call") else 1,  # CLIENT / INTERNAL
+            "startTimeUnixNano": str(span["startTimeUnixNano"]),
+            "endTimeUnixNano": str(span["endTimeUnixNano"]),
+            "attributes": [{"key": k, "value": value(v)} for k, v in span.get("attributes", {}).items() if v is not None],
+            "status": {"code": 2, "message": span["status"].get("message", "")}
+            if span.get("status", {}).get("code") == "ERROR" else {"code": 1}
+        })
+    return {"resourceSpans": [
+        {"resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service}}]},
+         "scopeSpans": [{"scope": {"name": "voicegit"}, "spans": service_spans}]}
+        for service, service_spans in services.items()
+    ]}
@@ -0,0 +1,92 @@
+import json
+from pathlib import Path
+
+# User configuration helpers. Kept free of the LLM/MCP stack so that
+# non-chat CLI commands can use them without paying its import cost.
+
+def show_config_location():
+    """Show where config file is stored"""
+    config_path = get_config_path()
+    print(f"📁 Config file location: {config_path}")
+    if config_path.exists():
+        print("✅ Config file exists")
+    else:
+        print("⚠️ Config file not found")
+    return config_path
+
+def greet():
+    try:
+    
+
+        config_data = read_config()
+
+        if config_data and "user" in config_data:
+            user = config_data["user"]
+            return f"Hello {user['name']}"
+
+        return "Hello Hemanth you can do it"
+    except Exception as e:
+        print("Error ",e)
+
+
+def config(name,email):
+    try:
+
+        """ Create or update config.json with user details"""
+
+        config_file = Path("src/config.json")
+        import time
+        user_config = { 
+            "user": {
+                "name": name,
+                "email": email,
+                "created_at": str(time.time())
+            }
+        }
+
+        if config_file.exists():
+            with open(config_file,'r',encoding='utf-8') as f:
+                existing_config = json.load(f)
+            
+            existing_config["user"]['name'] = name
+            existing_config["user"]["email"] = email
+
+            with open(config_file,'w',encoding='utf-8') as f:
+                json.dump(existing_config,f,indent=4,ensure_ascii=False)
+
+            print(f" Updated Config for :{name}, {email}")
+        else:
+                # Create new config file
+                with open(config_file, 'w', encoding='utf-8') as f:
+                    json.dump(user_config, f, indent=4, ensure_ascii=False)
+                
+                print(f"✅ Created new config for: {name} ({email})")
+            
+        return config_file
+    except Exception as e:
+        print(f"❌ Error managing config: {e}")
+        return None
+    
+
+
+def  get_config_path():
+    """ Get Consistent COnfig file path regardless of the current directory"""
+
+    return Path(__file__).parent / "config.json"
+
+
+def read_config():
+    
+    """Read and return config data"""
+    config_file = get_config_path()
+    
+    try:
+        if config_file.exists():
+            with open(config_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        else:
+            print("⚠️ Config file not found")
+            return None
+    except Exception as e:
+        print(f"❌ Error reading config: {e}")
+        return None
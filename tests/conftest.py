@@ -0,0 +1,76 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+# The CLI (src) and the GitHub MCP server (github-mcp-custom) are run from
+# their own directories and import their modules by plain name
+# Tests never write traces to the user's ~/.voicegit
+os.environ.setdefault("VOICEGIT_TRACE", "0")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for directory in ("github-mcp-custom", "src"):
+    path = os.path.join(ROOT, directory)
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+def git(repo, *args):
+    return subprocess.run(["git", *args], cwd=repo, check=True, capture_output=True, text=True).stdout
+
+
+@pytest.fixture
+def repo(tmp_path):
+    """Repository with two commits on main and a modified working tree"""
+    path = tmp_path / "repo"
+    path.mkdir()
+    git(path, "init", "-q", "-b", "main")
+    git(path, "config", "user.name", "Test")
+    git(path, "config", "user.email", "test@example.com")
+    (path / "a.txt").write_text("one\n")
+    git(path, "add", "a.txt")
+    git(path, "commit", "-q", "-m", "first")
+    (path / "a.txt").write_text("one\ntwo\n")
+    git(path, "commit", "-q", "-am", "second")
+    (path / "a.txt").write_text("one\ntwo\nthree\n")
+    return path
+
+
+class Cassettes:
+    """Record/replay files of one test, tests/cassettes/<test>.llm.json and <test>.github.json
+
+    Tests replay them offline with no latency. VOICEGIT_RECORD=1 records them
+    again, from the model build() returns and from `transport` (the network
+    when it is None).
+    """
+
+    def __init__(self, name, record=False):
+        self.base = os.path.join(ROOT, "tests", "cassettes", name)
+        self.record = record
+        for path in (f"{self.base}.llm.json", f"{self.base}.github.json"):
+            if record and os.path.exists(path):
+                os.remove(path)
+
+    def chat_model(self, provider, build):
+        from llm_cassette import CassetteChatModel, LLMCassette
+
+        return CassetteChatModel(
+            provider=provider,
+            cassette=LLMCassette(f"{self.base}.llm.json"),
+            mode="record" if self.record else "replay",
+            inner=build() if self.record else None,
+            latency=0.0
+        )
+
+    def github_transport(self, transport=None):
+        from cassette import CassetteTransport
+
+        return CassetteTransport(f"{self.base}.github.json", mode="record" if self.record else "replay",
+                                 latency=0.0, transport=transport)
+
+
+@pytest.fixture
+def cassette(request):
+    """Cassettes named after the test; recorded again with VOICEGIT_RECORD=1"""
+    return Cassettes(request.node.name, os.getenv("VOICEGIT_RECORD", "0") != "0")
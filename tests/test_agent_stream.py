@@ -0,0 +1,60 @@
+import asyncio
+import json
+import re
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGenerationChunk
+from langchain_core.tools import StructuredTool
+
+from agent_stream import ToolProgress, stream_agent
+from tool_execution import ToolCallLimiter, build_agent
+
+
+class FakeModel(GenericFakeChatModel):
+    """Streams its scripted replies word by word, tool calls included (GenericFakeChatModel drops them)"""
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        message = next(self.messages)
+        words = re.split(r"(\s)", message.content) if message.content else [""]
+        for index, word in enumerate(words):
+            last = index == len(words) - 1
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word, id=message.id, tool_call_chunks=[
+                {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": n}
+                for n, call in enumerate(message.tool_calls)] if last else []))
+
+
+def list_org_repos(org: str) -> str:
+    """List the repositories of an organization"""
+    return f"{org}/service-api\n{org}/service-web"
+
+
+def test_stream_yields_tokens_tool_progress_and_stats():
+    model = FakeModel(messages=iter([
+        AIMessage(content="", tool_calls=[{"id": "call_1", "name": "list_org_repos", "args": {"org": "acme"}}]),
+        AIMessage(content="acme has two repositories: service-api and service-web")
+    ]))
+    agent = build_agent(model, [StructuredTool.from_function(list_org_repos)], "test", ToolCallLimiter())
+
+    async def run():
+        recorded, stats, pieces = [], {}, []
+        async for piece in stream_agent(agent, [{"role": "user", "content": "list repos in acme"}], recorded, stats):
+            pieces.append(piece)
+        return pieces, recorded, stats
+
+    pieces, recorded, stats = asyncio.run(run())
+    progress = [piece for piece in pieces if isinstance(piece, ToolProgress)]
+    tokens = [piece for piece in pieces if not isinstance(piece, ToolProgress)]
+    # The answer arrives token by token, after the tool has run
+    assert "".join(tokens) == "acme has two repositories: service-api and service-web"
+    assert len(tokens) > 1 and pieces.index(tokens[0]) > pieces.index(progress[-1])
+    assert progress[0] == '\n🔧 list_org_repos(org="acme") …\n'
+    assert progress[1].startswith("🔧 list_org_repos done in ")
+    assert [message.type for message in recorded] == ["ai", "tool", "ai"]
+
+    assert 0 < stats["first_token"] <= stats["total"]
+    assert stats["output_tokens"] > 0 and stats["tokens_per_second"] > 0
+    assert [(tool["tool"], tool["status"]) for tool in stats["tools"]] == [("list_org_repos", "done")]
@@ -0,0 +1,86 @@
+import asyncio
+import json
+
+import pytest
+
+from answer_cache import AnswerCache, normalize
+
+
+class CountingTool:
+    def __init__(self, data):
+        self.data = data
+        self.calls = 0
+
+    async def ainvoke(self, args):
+        self.calls += 1
+        return json.dumps({"args": args, "data": self.data})
+
+
+def ask(cache, query, tools=None, context=""):
+    return asyncio.run(cache.lookup(query, tools, context))
+
+
+@pytest.mark.parametrize("mode", ["exact", "semantic"])
+def test_rephrased_question_hits(mode):
+    cache = AnswerCache(mode=mode)
+    cache.store("list my orgs", "acme, globex")
+    assert ask(cache, "List my orgs please!") == "acme, globex"
+
+
+@pytest.mark.parametrize("mode", ["exact", "semantic"])
+@pytest.mark.parametrize("first, reversed_query", [
+    ("diff from main to dev", "diff from dev to main"),
+    ("is main ahead of dev", "is dev ahead of main"),
+])
+def test_reversed_question_misses(mode, first, reversed_query):
+    assert normalize(first) != normalize(reversed_query)
+    cache = AnswerCache(mode=mode)
+    cache.store(first, "answer to the first question")
+    assert ask(cache, reversed_query) is None
+
+
+def test_follow_up_is_keyed_on_previous_turn():
+    tools = {"list_org_repos_branches": CountingTool(["main"])}
+    plan = [{"name": "list_org_repos_branches", "args": {"org": "acme", "repo": "service-api"}}]
+    cache = AnswerCache(mode="semantic")
+    cache.store("list its branches", "service-api: main", plan, [asyncio.run(tools["list_org_repos_branches"]
+                                                                              .ainvoke(plan[0]["args"]))],
+                context="tell me about service-api\nservice-api is the API")
+    assert ask(cache, "list its branches", tools, "tell me about service-web\nservice-web is the site") is None
+    assert ask(cache, "list its branches", tools, "tell me about service-api\nservice-api is the API") \
+        == "service-api: main"
+
+
+def test_stale_results_are_not_reused():
+    tool = CountingTool(["acme"])
+    plan = [{"name": "list_user_organizations", "args": {}}]
+    cache = AnswerCache(mode="exact")
+    cache.store("list my orgs", "acme", plan, [asyncio.run(tool.ainvoke({}))])
+    tool.data = ["acme", "globex"]
+    assert ask(cache, "list my orgs", {"list_user_organizations": tool}) is None
+    assert cache.stats()["stale"] == 1
+
+
+def test_slow_revalidation_is_a_miss():
+    class SlowTool(CountingTool):
+        delay = 0.0
+
+        async def ainvoke(self, args):
+            await asyncio.sleep(self.delay)
+            return await super().ainvoke(args)
+
+    tool = SlowTool(["acme"])
+    plan = [{"name": "list_user_organizations", "args": {}}]
+    cache = AnswerCache(mode="exact", revalidate_timeout=0.05)
+    cache.store("list my orgs", "acme", plan, [asyncio.run(tool.ainvoke({}))])
+    tool.delay = 1.0
+    assert ask(cache, "list my orgs", {"list_user_organizations": tool}) is None
+    assert cache.stats()["timeouts"] == 1 and cache.stats()["stale"] == 0
+    # The entry is kept: once the tool answers in time, it hits again
+    tool.delay = 0.0
+    assert ask(cache, "list my orgs", {"list_user_organizations": tool}) == "acme"
+
+
+def test_write_turns_are_not_cached():
+    cache = AnswerCache(mode="exact")
+    assert not cache.store("commit it", "done", [{"name": "git_commit", "args": {"message": "x"}}], ["ok"])
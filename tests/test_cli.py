@@ -0,0 +1,13 @@
+from click.testing import CliRunner
+
+from cli import cli
+from conftest import git
+
+
+def test_diff_passes_git_options_through(repo, monkeypatch):
+    git(repo, "add", "a.txt")
+    monkeypatch.chdir(repo)
+    result = CliRunner().invoke(cli, ["diff", "--cached", "--stat"])
+    assert result.exit_code == 0 and result.output.startswith(" a.txt | 1 +")
+    # Nothing left unstaged
+    assert CliRunner().invoke(cli, ["diff"]).output == ""
@@ -0,0 +1,74 @@
+import subprocess
+
+import pytest
+
+from commit_index import CommitIndex
+from conftest import git
+from git_backend import GitError
+
+
+@pytest.fixture
+def index(repo, tmp_path):
+    index = CommitIndex(str(repo), str(tmp_path / "index.sqlite3"))
+    yield index
+    index.close()
+
+
+def commit(repo, path, text, author="Test"):
+    (repo / path).parent.mkdir(parents=True, exist_ok=True)
+    (repo / path).write_text(text)
+    git(repo, "add", path)
+    git(repo, "-c", f"user.name={author}", "-c", f"user.email={author.lower()}@example.com",
+        "commit", "-q", "-m", f"{author} edits {path}")
+    return git(repo, "rev-parse", "HEAD").strip()
+
+
+def test_update_only_indexes_new_commits(repo, index):
+    assert index.update() == 2
+    assert index.update() == 0
+    commit(repo, "b.txt", "b\n")
+    assert index.update() == 1
+    assert index.stats()["commits"] == 3 and index.stats()["refs"] == 2
+
+
+def test_failed_git_log_records_nothing(repo, index, monkeypatch):
+    popen = subprocess.Popen
+
+    def failing_log(cmd, *args, **kwargs):
+        if cmd[:2] == ["git", "log"]:
+            # Real output, then a failure as if the walk hit a corrupt object
+            cmd = ["sh", "-c", 'git "$@"; echo "fatal: bad object" >&2; exit 128', "sh", *cmd[1:]]
+        return popen(cmd, *args, **kwargs)
+
+    monkeypatch.setattr(subprocess, "Popen", failing_log)
+    with pytest.raises(GitError, match="bad object"):
+        index.update()
+    assert index.stats()["commits"] == 0 and index.stats()["refs"] == 0
+
+    monkeypatch.setattr(subprocess, "Popen", popen)
+    assert index.update() == 2
+
+
+def test_file_authors_ranks_by_commits(repo, index):
+    commit(repo, "src/app.py", "1\n", author="Alice")
+    commit(repo, "src/app.py", "2\n", author="Alice")
+    commit(repo, "src/util.py", "1\n", author="Bob")
+    index.update()
+    assert [(row["author"], row["commits"]) for row in index.file_authors("src")] == [("Alice", 2), ("Bob", 1)]
+    assert [row["author"] for row in index.file_authors("src/util.py")] == ["Bob"]
+    assert index.file_authors("sr") == []
+
+
+def test_commits_since_and_refs_containing(repo, index):
+    first = git(repo, "rev-parse", "HEAD~1").strip()
+    git(repo, "tag", "v1.0", "HEAD")
+    git(repo, "checkout", "-q", "-b", "feature")
+    newest = commit(repo, "b.txt", "b\n")
+    index.update()
+
+    since = index.commits_since("v1.0", "feature")
+    assert since["total"] == 1 and [c["sha"] for c in since["commits"]] == [newest]
+    assert index.commits_since("main", "feature", limit=0)["total"] == 1
+    assert index.refs_containing(first) == ["feature", "main"]
+    assert index.refs_containing(newest) == ["feature"]
+    assert index.refs_containing(first, kind="tags") == ["v1.0"]
@@ -0,0 +1,68 @@
+from conftest import git
+from conversation_memory import ConversationMemory, count_tokens, extractive_summary
+from git_backend import repo_location
+
+
+def chat(memory, turns, answer_words=60):
+    for i in range(turns):
+        memory.add("user", f"question {i} about repo-{i}")
+        memory.add("assistant", f"answer {i} " + "word " * answer_words)
+
+
+def test_context_stays_within_budget_and_keeps_newest_turns():
+    memory = ConversationMemory(budget_tokens=600, summary_tokens=100)
+    chat(memory, 20)
+    context = memory.context()
+    assert memory.last_stats["prompt_tokens"] <= 600
+    assert context[-2:] == memory.messages[-2:]
+    # Turns are evicted whole: the oldest kept message is a question
+    assert context[1]["role"] == "user"
+
+
+def test_evicted_turns_are_summarised_exactly_once():
+    calls = []
+
+    def summarizer(previous, evicted, max_tokens):
+        calls.append([message["content"] for message in evicted])
+        return extractive_summary(previous, evicted, max_tokens)
+
+    memory = ConversationMemory(budget_tokens=600, summary_tokens=100, summarizer=summarizer)
+    chat(memory, 20)
+    memory.context()
+    memory.context()
+    evicted = [content for call in calls for content in call]
+    assert len(calls) == 1 and len(evicted) == len(set(evicted)) == memory._summarized
+    assert "Summary of earlier conversation:" in memory.context()[0]["content"]
+    assert count_tokens(memory.summary) <= 100
+
+
+def test_pinned_facts_survive_eviction_and_can_be_unpinned():
+    memory = ConversationMemory(budget_tokens=600, summary_tokens=100)
+    memory.pin("repository", "/work/acme")
+    memory.pin("branch", "feature-42")
+    chat(memory, 20)
+    header = memory.context()[0]["content"]
+    assert "- repository: /work/acme" in header and "- branch: feature-42" in header
+    memory.pin("branch", None)
+    assert "feature-42" not in memory.context()[0]["content"]
+
+
+def test_tool_results_are_kept_newest_first_within_their_budget():
+    memory = ConversationMemory(tool_result_tokens=120)
+    calls = [{"id": str(i), "name": "get_diff", "args": {"ref": f"v{i}"}} for i in range(5)]
+    memory.remember_tools(calls, [f"diff of v{i}: " + "line " * 30 for i in range(5)])
+    memory.remember_tools([{"name": "git_status", "args": {}}], [None])
+    assert list(memory.tool_results)[-1] == "get_diff(ref=v4)" and "git_status()" not in memory.tool_results
+    assert "get_diff(ref=v0)" not in memory.tool_results
+    memory.add("user", "and what about v4?")
+    assert "- get_diff(ref=v4): diff of v4" in memory.context()[0]["content"]
+    assert memory.last_stats["prompt_tokens"] <= memory.budget_tokens
+
+
+def test_repo_location_names_the_repository_and_branch(repo, tmp_path):
+    assert repo_location(str(repo)) == (str(repo), "main")
+    git(repo, "checkout", "-q", "--detach")
+    assert repo_location(str(repo)) == (str(repo), None)
+    outside = tmp_path / "outside"
+    outside.mkdir()
+    assert repo_location(str(outside)) == (None, None)
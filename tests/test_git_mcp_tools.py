@@ -0,0 +1,75 @@
+import asyncio
+import json
+
+import pytest
+
+import commit_index
+import git_mcp_tools
+from conftest import git
+from diff_pipeline import structured_diff
+from git_backend import GitError
+
+
+@pytest.fixture(autouse=True)
+def index_dir(tmp_path, monkeypatch):
+    # Commit indexes go to the test's directory instead of next to the user config
+    monkeypatch.setattr(commit_index, "index_path", lambda repo_path: tmp_path / "index.sqlite3")
+    monkeypatch.setattr(commit_index, "_indexes", {})
+
+
+def test_get_diff_against_ref(repo):
+    result = json.loads(asyncio.run(git_mcp_tools.get_diff(str(repo), ref="HEAD~1")))
+    assert result["files"] == [{"path": "a.txt", "added": 2, "removed": 0, "binary": False}]
+
+
+def test_get_diff_refuses_option_shaped_ref(repo, tmp_path):
+    target = tmp_path / "pwned"
+    result = asyncio.run(git_mcp_tools.get_diff(str(repo), ref=f"--output={target}"))
+    assert result.startswith("Error")
+    assert not target.exists()
+
+
+def test_structured_diff_checks_revs(repo):
+    with pytest.raises(GitError):
+        structured_diff(str(repo), revs=["--no-index"])
+
+
+def test_git_log_and_show(repo):
+    log = json.loads(asyncio.run(git_mcp_tools.git_log(str(repo), rev="main")))
+    assert [commit["subject"] for commit in log["commits"]] == ["second", "first"]
+    shown = json.loads(asyncio.run(git_mcp_tools.git_show(str(repo), rev="HEAD")))
+    assert shown["message"] == "second" and shown["total_added"] == 1
+
+
+@pytest.mark.parametrize("tool, kwargs", [
+    (git_mcp_tools.git_log, {}),
+    (git_mcp_tools.git_show, {}),
+    (git_mcp_tools.git_blame, {"path": "a.txt"}),
+    (git_mcp_tools.git_commits_since, {"head": "HEAD"}),
+    (git_mcp_tools.git_branches_containing, {}),
+])
+def test_revisions_refuse_options(repo, tmp_path, tool, kwargs):
+    target = tmp_path / "pwned"
+    rev = f"--output={target}"
+    if tool is git_mcp_tools.git_commits_since:
+        kwargs = {**kwargs, "base": rev}
+    else:
+        kwargs = {**kwargs, "rev": rev}
+    result = asyncio.run(tool(repo_path=str(repo), **kwargs))
+    assert result.startswith("Error")
+    assert not target.exists()
+
+
+def test_file_stats_are_capped_by_count_and_bytes(repo):
+    for i in range(50):
+        (repo / f"file_{i:02}.txt").write_text("x\n" * (i + 1))
+    git(repo, "add", ".")
+    result = structured_diff(str(repo), ["--cached"], max_files=10)
+    assert result["files_total"] == 51 and result["files_omitted"] == 41 and result["truncated"]
+    # The most changed files are kept
+    assert [stat["path"] for stat in result["files"][:2]] == ["file_49.txt", "file_48.txt"]
+    assert result["total_added"] == sum(range(1, 51)) + 1
+
+    small = structured_diff(str(repo), ["--cached"], max_bytes=500)
+    assert 0 < len(small["files"]) < 10
+    assert len(json.dumps(small["files"])) + len(json.dumps(small["hunks"])) <= 600
@@ -0,0 +1,18 @@
+import asyncio
+
+from git_objects import GitObjectReader
+
+
+def test_missing_names_with_spaces_do_not_break_the_pipe(repo):
+    async def run():
+        reader = GitObjectReader(str(repo), processes=1)
+        try:
+            results = await reader.read_many(["HEAD:a.txt", "HEAD:no such", "HEAD:no such file", "HEAD:a.txt"])
+            info = await reader.info("HEAD:no such")
+            return results, info, reader.restarts
+        finally:
+            await reader.aclose()
+
+    results, info, restarts = asyncio.run(run())
+    assert [result and result.data for result in results] == [b"one\ntwo\n", None, None, b"one\ntwo\n"]
+    assert info is None and restarts == 0
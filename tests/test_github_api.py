@@ -0,0 +1,222 @@
+import asyncio
+import base64
+import json
+
+import httpx
+import pytest
+
+import tools
+from blob_store import BlobStore, git_blob_sha
+from tools import GitHubAPI
+
+
+def paged_handler(total, calls):
+    """List endpoint of `total` numbered items, paginated with a Link header"""
+    def handler(request):
+        calls.append(request)
+        page = int(request.url.params.get("page", 1))
+        per_page = int(request.url.params.get("per_page", 30))
+        last = -(-total // per_page)
+        items = [{"name": f"repo-{i}"} for i in range((page - 1) * per_page, min(page * per_page, total))]
+        link = f'<{request.url.copy_merge_params({"page": last})}>; rel="last"'
+        return httpx.Response(200, json=items, headers={"Link": link})
+    return handler
+
+
+def make_api(handler, **kwargs):
+    return GitHubAPI("test", base_url="https://api.test", transport=httpx.MockTransport(handler), **kwargs)
+
+
+def test_all_pages_in_order():
+    calls = []
+    api = make_api(paged_handler(250, calls))
+    items, truncated = asyncio.run(api.get_all_pages("/orgs/acme/repos", {"per_page": 100}))
+    assert [item["name"] for item in items] == [f"repo-{i}" for i in range(250)]
+    assert not truncated and len(calls) == 3
+
+
+def test_early_stop_leaves_no_pending_page_tasks():
+    async def stop_after_second_page():
+        handler = paged_handler(1000, [])
+
+        async def slow_after_second_page(request):
+            if int(request.url.params.get("page", 1)) > 2:
+                await asyncio.sleep(10)
+            return handler(request)
+
+        api = make_api(slow_after_second_page)
+        pages = api.iter_pages("/orgs/acme/repos", {"per_page": 100}, concurrency=2)
+        async for page in pages:
+            if page[0]["name"] != "repo-0":
+                # Pages 3.. are still being fetched
+                break
+        await pages.aclose()
+        pending = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        await api.aclose()
+        return pending
+
+    assert asyncio.run(stop_after_second_page()) == []
+
+
+class FakeOrg:
+    """GitHub REST and GraphQL endpoints for one org of `repos` repositories, counting requests"""
+
+    def __init__(self, repos, members=3, graphql=True):
+        self.repos = [f"repo-{i}" for i in range(repos)]
+        self.members = [f"user-{i}" for i in range(members)]
+        self.graphql = graphql
+        self.requests = []
+
+    def repo_node(self, name):
+        return {"name": name, "defaultBranchRef": {"name": "main"},
+                "refs": {"totalCount": 2, "nodes": [{"name": "main"}, {"name": "dev"}]}}
+
+    def connection(self, items, after, first, node):
+        start = int(after or 0)
+        page = items[start:start + first]
+        return {"pageInfo": {"hasNextPage": start + first < len(items), "endCursor": str(start + first)},
+                "nodes": [node(item) for item in page]}
+
+    def __call__(self, request):
+        self.requests.append(request)
+        path = request.url.path
+        if path == "/graphql":
+            if not self.graphql:
+                return httpx.Response(404, json={"message": "Not Found"})
+            body = json.loads(request.content)
+            query, variables = body["query"], body["variables"]
+            if "membersWithRole" in query:
+                members = self.connection(self.members, variables["after"], 100, lambda login: {"login": login})
+                return httpx.Response(200, json={"data": {"organization": {"membersWithRole": members}}})
+            if "repositories(" in query:
+                repos = self.connection(self.repos, variables["after"], variables["first"], self.repo_node)
+                return httpx.Response(200, json={"data": {"organization": {"repositories": repos}}})
+            aliases = {key: value for key, value in variables.items() if key.startswith("r")}
+            return httpx.Response(200, json={"data": {
+                alias: self.repo_node(name) if name in self.repos else None for alias, name in aliases.items()}})
+        if path == "/orgs/acme/repos":
+            return paged_handler(len(self.repos), [])(request)
+        if path == "/orgs/acme/members":
+            return httpx.Response(200, json=[{"login": login} for login in self.members])
+        if path.startswith("/repos/acme/") and path.endswith("/branches"):
+            return httpx.Response(200, json=[{"name": "main"}, {"name": "dev"}])
+        return httpx.Response(404, json={"message": "Not Found"})
+
+
+def scan(fake, **kwargs):
+    async def run():
+        api = make_api(fake)
+        try:
+            return await api.scan_org("acme", **kwargs)
+        finally:
+            await api.aclose()
+    return asyncio.run(run())
+
+
+def test_scan_org_batches_named_repos_into_graphql_chunks():
+    fake = FakeOrg(120)
+    result = scan(fake, repos=fake.repos + ["missing"], include_members=False)
+    # 121 repositories in chunks of 50 instead of one branches request per repository
+    assert result["backend"] == "graphql" and result["requests"] == len(fake.requests) == 3
+    assert len(result["repositories"]) == 121
+    assert result["repositories"][0] == {"name": "repo-0", "default_branch": "main", "branches": ["main", "dev"],
+                                         "branches_truncated": False}
+    assert result["repositories"][-1] == {"name": "missing", "error": "not found"}
+
+
+def test_scan_org_paginates_past_50_repos():
+    fake = FakeOrg(120)
+    result = scan(fake)
+    # Three pages of repositories and one of members
+    assert result["backend"] == "graphql" and result["requests"] == 4
+    assert [repo["name"] for repo in result["repositories"]] == fake.repos
+    assert result["members"] == fake.members
+
+
+def test_scan_org_falls_back_to_rest():
+    fake = FakeOrg(120, graphql=False)
+    result = scan(fake)
+    # Failed GraphQL call, two pages of repositories, one branches call per repository, one of members
+    assert result["backend"] == "rest" and result["requests"] == 1 + 2 + 120 + 1
+    assert [repo["name"] for repo in result["repositories"]] == fake.repos
+    assert result["repositories"][0]["branches"] == ["main", "dev"]
+    assert result["members"] == fake.members
+
+
+def test_blob_store_is_indexed_once_and_evicts_least_recently_read(tmp_path, monkeypatch):
+    store = BlobStore(str(tmp_path / "blobs"), max_bytes=10)
+    assert not (tmp_path / "blobs").exists()
+    blobs = {data: git_blob_sha(data) for data in (b"aaaa", b"bbbb", b"cccc")}
+    store.put(blobs[b"aaaa"], b"aaaa")
+    monkeypatch.setattr(store, "_scan", lambda: pytest.fail("directory rescanned"))
+    store.put(blobs[b"bbbb"], b"bbbb")
+    assert store.get(blobs[b"aaaa"]) == b"aaaa"
+    store.put(blobs[b"cccc"], b"cccc")
+    assert store.get(blobs[b"bbbb"]) is None
+    assert store.get(blobs[b"aaaa"]) == b"aaaa"
+    assert store.stats()["total_bytes"] == 8 and store.evictions == 1
+
+
+def test_scan_org_keeps_graphql_after_a_transient_error():
+    fake = FakeOrg(3)
+    calls = []
+
+    def flaky(request):
+        calls.append(request.url.path)
+        if request.url.path == "/graphql" and calls.count("/graphql") == 1:
+            return httpx.Response(502, json={"message": "Bad Gateway"})
+        return fake(request)
+
+    async def run():
+        api = make_api(flaky)
+        try:
+            first = await api.scan_org("acme", include_members=False)
+            second = await api.scan_org("acme", include_members=False)
+            return first, second, api.graphql_enabled
+        finally:
+            await api.aclose()
+
+    first, second, enabled = asyncio.run(run())
+    assert first["backend"] == "rest" and second["backend"] == "graphql" and enabled
+
+
+def test_file_contents_are_downloaded_once_across_refs(tmp_path, monkeypatch):
+    content = b"print('hi')\n"
+    sha = git_blob_sha(content)
+    commit = "c" * 40
+    requests = []
+
+    def handler(request):
+        requests.append(request.url.path)
+        if request.url.path == "/repos/acme/api/contents/src/app.py":
+            return httpx.Response(200, json={
+                "type": "file", "path": "src/app.py", "name": "app.py", "sha": sha, "size": len(content),
+                "encoding": "base64", "content": base64.b64encode(content).decode()})
+        if request.url.path == f"/repos/acme/api/git/trees/{commit}":
+            return httpx.Response(200, json={"sha": "t" * 40, "tree": [
+                {"path": "src/app.py", "type": "blob", "sha": sha, "size": len(content)}]})
+        return httpx.Response(404, json={"message": "Not Found"})
+
+    api = make_api(handler, blob_store=BlobStore(str(tmp_path / "blobs")))
+    monkeypatch.setattr(tools, "github_api", api)
+
+    async def read(ref):
+        return json.loads(await tools.get_org_file_contents("acme", "api", "src/app.py", ref))
+
+    async def run():
+        # One contents request stores the blob under its SHA
+        assert (await read("main"))["content"] == content.decode()
+        await api.get_tree("acme", "api", commit)
+        # The cached tree names the same blob, so no request at all
+        assert (await read(commit))["content"] == content.decode()
+
+    asyncio.run(run())
+    assert requests == ["/repos/acme/api/contents/src/app.py", f"/repos/acme/api/git/trees/{commit}"]
+
+
+def test_list_org_repos_replays_offline(cassette, monkeypatch):
+    transport = cassette.github_transport(httpx.MockTransport(paged_handler(150, [])))
+    monkeypatch.setattr(tools, "github_api", GitHubAPI("test", transport=transport))
+    result = json.loads(asyncio.run(tools.list_org_repos("acme", all_pages=True)))
+    assert [repo["name"] for repo in result["repositories"]] == [f"repo-{i}" for i in range(150)]
+    assert transport.stats()["replayed" if transport.mode == "replay" else "recorded"] == 2
@@ -0,0 +1,72 @@
+import asyncio
+import json
+
+import pytest
+from langchain_core.language_models import BaseChatModel
+from langchain_core.language_models.chat_models import generate_from_stream
+from langchain_core.messages import AIMessageChunk, HumanMessage
+from langchain_core.outputs import ChatGenerationChunk
+from langchain_core.tools import StructuredTool
+
+from llm_cassette import CassetteMiss, LLMCassette, request_key
+from tool_execution import build_agent
+
+
+class ScriptedProvider(BaseChatModel):
+    """Stands in for a provider when recording: one tool call, then an answer from its result"""
+
+    @property
+    def _llm_type(self):
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        if messages[-1].type == "human":
+            yield ChatGenerationChunk(message=AIMessageChunk(content="", tool_call_chunks=[
+                {"name": "list_org_repos", "args": json.dumps({"org": "acme"}), "id": "call_1", "index": 0}]))
+            return
+        repos = json.loads(messages[-1].content)
+        yield ChatGenerationChunk(message=AIMessageChunk(content=f"acme has {len(repos)} repositories: "))
+        yield ChatGenerationChunk(message=AIMessageChunk(content=", ".join(repos)))
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        return generate_from_stream(self._stream(messages, stop, run_manager, **kwargs))
+
+
+def list_org_repos(org: str) -> str:
+    """List the repositories of an organization"""
+    return json.dumps([f"{org}/service-api", f"{org}/service-web"])
+
+
+def test_agent_turn_replays_offline(cassette):
+    model = cassette.chat_model("aws", build=ScriptedProvider)
+    agent = build_agent(model, [StructuredTool.from_function(list_org_repos)], "Your are a Git Agent")
+    state = asyncio.run(agent.ainvoke({"messages": [{"role": "user", "content": "list repos in acme"}]}))
+    assert state["messages"][-1].content == "acme has 2 repositories: acme/service-api, acme/service-web"
+    assert [message.type for message in state["messages"]] == ["human", "ai", "tool", "ai"]
+
+
+def test_changed_request_is_a_miss(tmp_path):
+    path = str(tmp_path / "llm.json")
+    recorded = request_key("aws", [HumanMessage("list repos in acme")], ["list_org_repos"])
+    LLMCassette(path).add("aws", recorded, AIMessageChunk(content="acme has 2 repositories"), 0.1, 0.2)
+    # A new tool schema changes the key: strict replay fails instead of answering with the old recording
+    changed = request_key("aws", [HumanMessage("list repos in acme")], ["list_org_repos", "get_repo_tree"])
+    with pytest.raises(CassetteMiss):
+        LLMCassette(path).find("aws", changed)
+    assert LLMCassette(path, strict=False).find("aws", changed)["key"] == recorded
+    assert LLMCassette(path).find("aws", recorded)["key"] == recorded
+
+
+def test_synchronous_calls_record_and_replay(tmp_path):
+    from llm_cassette import CassetteChatModel
+
+    path = str(tmp_path / "llm.json")
+    question = [HumanMessage("list repos in acme")]
+    recorder = CassetteChatModel(provider="aws", cassette=LLMCassette(path), mode="record", inner=ScriptedProvider())
+    recorded = recorder.invoke(question)
+    assert recorded.tool_calls[0]["args"] == {"org": "acme"}
+    replayed = CassetteChatModel(provider="aws", cassette=LLMCassette(path)).invoke(question)
+    assert replayed.tool_calls == recorded.tool_calls
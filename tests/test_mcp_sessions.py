@@ -0,0 +1,111 @@
+import asyncio
+import sys
+
+from mcp_sessions import MCPServerManager
+
+ECHO_SERVER = '''
+from mcp.server.fastmcp import FastMCP
+mcp = FastMCP("echo")
+
+@mcp.tool()
+async def echo(text: str) -> str:
+    """Echo text back"""
+    return text
+
+mcp.run(transport="stdio")
+'''
+
+
+def test_health_loop_restarts_stopped_server(tmp_path):
+    script = tmp_path / "echo_server.py"
+    script.write_text(ECHO_SERVER)
+    connections = {"echo": {"command": sys.executable, "args": [str(script)], "transport": "stdio"}}
+
+    async def run():
+        manager = MCPServerManager(connections, health_interval=0.1)
+        try:
+            tools = await manager.get_tools()
+            assert manager._health_task is not None
+            # The server goes away without the manager stopping it
+            manager._stop_events["echo"].set()
+            await manager._tasks["echo"]
+            for _ in range(50):
+                await asyncio.sleep(0.1)
+                if manager._alive("echo"):
+                    break
+            assert manager.restarts["echo"] == 1
+            result = await tools[0].ainvoke({"text": "hi"})
+            assert "hi" in str(result)
+        finally:
+            await manager.aclose()
+
+    asyncio.run(run())
+
+
+class DroppingSession:
+    """Session whose first call fails as if the connection dropped after the server ran it"""
+
+    def __init__(self):
+        self.calls = []
+
+    async def call_tool(self, tool_name, arguments):
+        self.calls.append(tool_name)
+        if len(self.calls) == 1:
+            raise ConnectionError("connection closed")
+        return type("Result", (), {"content": [], "isError": False})()
+
+
+def fake_manager(session):
+    manager = MCPServerManager({"github": {}}, health_interval=0)
+
+    async def get_session(name):
+        return session
+
+    async def ping(name):
+        return False
+
+    manager.get_session = get_session
+    manager.ping = ping
+    manager.restart = get_session
+    return manager
+
+
+def test_write_is_not_retried_after_restart():
+    session = DroppingSession()
+    manager = fake_manager(session)
+
+    async def run():
+        try:
+            await manager.call_tool("github", "create_issue", {"title": "bug"})
+        except ConnectionError:
+            return
+        raise AssertionError("create_issue was retried")
+
+    asyncio.run(run())
+    assert session.calls == ["create_issue"]
+
+
+def test_read_is_retried_after_restart():
+    session = DroppingSession()
+    asyncio.run(fake_manager(session).call_tool("github", "list_issues", {"repo": "api"}))
+    assert session.calls == ["list_issues", "list_issues"]
+
+
+def test_stop_waits_for_a_server_that_ignores_the_stop_event():
+    async def run():
+        manager = MCPServerManager({"stuck": {}}, health_interval=0, ping_timeout=0.05)
+        closed = []
+
+        async def stuck_server():
+            try:
+                await asyncio.sleep(60)
+            finally:
+                # Where the session context closes and the stdio process is reaped
+                closed.append(True)
+
+        manager._stop_events["stuck"] = asyncio.Event()
+        manager._tasks["stuck"] = task = asyncio.create_task(stuck_server())
+        await manager.stop("stuck")
+        return task.done(), closed
+
+    assert asyncio.run(run()) == (True, [True])
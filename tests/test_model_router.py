@@ -0,0 +1,82 @@
+import asyncio
+import time
+
+from model_router import ProviderHealth, ProviderRouter, _FakeProvider
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def router(providers, clock=None, **kwargs):
+    health = {name: ProviderHealth(name, failure_threshold=2, cooldown=30, clock=clock or FakeClock())
+              for name in providers}
+    return ProviderRouter(providers=providers, health=health, **kwargs)
+
+
+def test_hedged_request_to_a_faster_provider_wins():
+    primary = _FakeProvider(reply="primary", latencies=[2.0], calls=[])
+    secondary = _FakeProvider(reply="secondary", latencies=[0.05], calls=[])
+    chat = router({"primary": primary, "secondary": secondary}, hedge=True, hedge_after=0.1)
+    start = time.perf_counter()
+    answer = asyncio.run(chat.ainvoke("hello"))
+    assert answer.content.strip() == "secondary" and time.perf_counter() - start < 1
+    stats = chat.stats()
+    assert stats["primary"]["hedged"] == 1 and stats["secondary"]["wins"] == 1
+    assert stats["primary"]["state"] == "closed"
+
+
+def test_failover_to_next_provider():
+    primary = _FakeProvider(reply="primary", latencies=[0.01], fail_every=1, calls=[])
+    secondary = _FakeProvider(reply="secondary", latencies=[0.01], calls=[])
+    chat = router({"primary": primary, "secondary": secondary}, hedge=False)
+    assert asyncio.run(chat.ainvoke("hello")).content.strip() == "secondary"
+    assert chat.invoke("hello").content == "secondary"
+    assert chat.stats()["primary"]["errors"] == 2
+
+
+def test_breaker_opens_then_probes_once_then_closes():
+    clock = FakeClock()
+    primary = _FakeProvider(reply="primary", latencies=[0.01], fail_every=1, calls=[])
+    secondary = _FakeProvider(reply="secondary", latencies=[0.01], calls=[])
+    chat = router({"primary": primary, "secondary": secondary}, clock, hedge=False)
+    health = chat.health["primary"]
+
+    for _ in range(4):
+        asyncio.run(chat.ainvoke("hello"))
+    # Open after two failures: the next requests skip it
+    assert health.state == "open" and len(primary.calls) == 2
+
+    clock.now += 30
+    assert health.state == "half-open"
+    # One caller gets the probe; the others see the circuit open until it ends
+    assert health.begin() and health.state == "open" and not health.begin()
+    health.release()
+
+    # A failed probe opens the circuit for another cooldown
+    asyncio.run(chat.ainvoke("hello"))
+    assert len(primary.calls) == 3 and health.state == "open"
+    clock.now += 30
+    primary.fail_every = 0
+    assert asyncio.run(chat.ainvoke("hello")).content.strip() == "primary"
+    assert health.state == "closed" and not health.probing
+
+
+def test_concurrent_requests_send_one_probe():
+    clock = FakeClock()
+    primary = _FakeProvider(reply="primary", latencies=[0.2], calls=[])
+    secondary = _FakeProvider(reply="secondary", latencies=[0.01], calls=[])
+    chat = router({"primary": primary, "secondary": secondary}, clock, hedge=False)
+    health = chat.health["primary"]
+    health.opened_at = clock.now - 30
+
+    async def burst():
+        return await asyncio.gather(*(chat.ainvoke("hello") for _ in range(5)))
+
+    answers = [answer.content.strip() for answer in asyncio.run(burst())]
+    assert len(primary.calls) == 1 and answers.count("primary") == 1 and answers.count("secondary") == 4
+    assert health.state == "closed"
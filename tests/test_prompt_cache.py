@@ -0,0 +1,44 @@
+from langchain_core.messages import HumanMessage, SystemMessage
+
+import prompt_cache
+from prompt_cache import CACHE_POINT, bind_tools, mark_prefix
+
+
+class Bound:
+    def __init__(self, tools):
+        self.tools = tools
+
+
+class ChatBedrockConverse:
+    """Stands in for the Bedrock Converse model: only the class name and model_id matter"""
+
+    def __init__(self, model_id):
+        self.model_id = model_id
+
+    def bind_tools(self, tools, **kwargs):
+        return Bound(tools)
+
+
+class OtherModel(ChatBedrockConverse):
+    pass
+
+
+def test_cache_point_closes_the_tool_definitions_on_bedrock():
+    model = ChatBedrockConverse("anthropic.claude-3-5-sonnet")
+    assert bind_tools(model, ["b", CACHE_POINT, "c"]).tools == ["b", CACHE_POINT, "c", CACHE_POINT]
+
+
+def test_cache_points_are_dropped_for_other_models(monkeypatch):
+    assert bind_tools(OtherModel("gpt-4o"), ["b", CACHE_POINT, "c"]).tools == ["b", "c"]
+    assert bind_tools(ChatBedrockConverse("meta.llama3"), ["b", CACHE_POINT]).tools == ["b"]
+    monkeypatch.setattr(prompt_cache, "PROMPT_CACHE", False)
+    assert bind_tools(ChatBedrockConverse("anthropic.claude"), ["b", CACHE_POINT]).tools == ["b"]
+
+
+def test_mark_prefix_closes_the_leading_system_message_once():
+    messages = [SystemMessage("You are a Git Agent"), SystemMessage("Facts"), HumanMessage("hi")]
+    marked = mark_prefix(messages)
+    assert marked[0].content == [{"type": "text", "text": "You are a Git Agent"}, CACHE_POINT]
+    assert marked[1:] == messages[1:]
+    assert mark_prefix(marked) == marked
+    assert mark_prefix([HumanMessage("hi")]) == [HumanMessage("hi")]
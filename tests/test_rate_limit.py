@@ -0,0 +1,110 @@
+import asyncio
+
+import httpx
+import pytest
+
+from rate_limit import RateLimitExceeded, RateLimitScheduler
+from tools import GitHubAPI
+
+
+class FakeClock:
+    """Clock and sleep for the scheduler: sleeping advances the clock and is recorded"""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.sleeps.append(round(seconds, 3))
+        self.now += seconds
+
+
+def limited(status=200, remaining=None, reset=None, limit=100, resource=None, **headers):
+    if remaining is not None:
+        headers.update({"X-RateLimit-Limit": str(limit), "X-RateLimit-Remaining": str(remaining),
+                        "X-RateLimit-Reset": str(reset)})
+    if resource:
+        headers["X-RateLimit-Resource"] = resource
+    return httpx.Response(status, json={"message": "ok" if status == 200 else "API rate limit exceeded"},
+                          headers=headers)
+
+
+def run_requests(responses, endpoints, clock, **scheduler_kwargs):
+    """Make one request per endpoint; responses(request, n) answers the n-th request"""
+    count = []
+
+    def handler(request):
+        count.append(request)
+        return responses(request, len(count))
+
+    scheduler = RateLimitScheduler(clock=clock, sleep=clock.sleep, **scheduler_kwargs)
+    api = GitHubAPI("test", base_url="https://api.test", transport=httpx.MockTransport(handler),
+                    scheduler=scheduler)
+
+    async def run():
+        try:
+            return [await api.make_request(endpoint) for endpoint in endpoints]
+        finally:
+            await api.aclose()
+    return asyncio.run(run()), scheduler, count
+
+
+def test_low_budget_is_spread_until_reset():
+    clock = FakeClock()
+    # 5 requests left for the next 50 seconds: one every 10 seconds
+    run_requests(lambda request, n: limited(remaining=6 - n, reset=1050), ["/user"] * 4, clock)
+    assert clock.sleeps == [10.0, 10.0]
+
+
+def test_exhausted_budget_waits_for_reset():
+    clock = FakeClock()
+    run_requests(lambda request, n: limited(remaining=0, reset=1030), ["/user"] * 2, clock)
+    assert clock.sleeps == [30.0]
+
+
+def test_wait_past_max_wait_raises():
+    clock = FakeClock()
+    with pytest.raises(RateLimitExceeded):
+        run_requests(lambda request, n: limited(remaining=0, reset=1600), ["/user"] * 2, clock, max_wait=60)
+
+
+def test_retry_after_is_honoured():
+    clock = FakeClock()
+    responses = lambda request, n: limited(429, **{"Retry-After": "7"}) if n == 1 else limited()
+    results, scheduler, count = run_requests(responses, ["/user"], clock)
+    assert results == [{"message": "ok"}] and len(count) == 2
+    assert clock.sleeps == [7.0] and scheduler.stats()["core"]["retries"] == 1
+
+
+def test_429_backs_off_exponentially_then_gives_up():
+    clock = FakeClock()
+    with pytest.raises(httpx.HTTPStatusError):
+        run_requests(lambda request, n: limited(429), ["/user"], clock, max_retries=3, backoff_base=1.0)
+    assert clock.sleeps == [1.0, 2.0, 4.0]
+
+
+def test_permission_error_is_not_retried():
+    clock = FakeClock()
+    forbidden = lambda request, n: httpx.Response(403, json={"message": "Resource not accessible"})
+    with pytest.raises(httpx.HTTPStatusError):
+        run_requests(forbidden, ["/user"], clock)
+    assert clock.sleeps == []
+
+
+def test_budget_is_paced_under_the_resource_the_server_names():
+    clock = FakeClock()
+
+    def responses(request, n):
+        if request.url.path == "/search/code":
+            return limited(remaining=0, reset=1020, limit=10, resource="code_search")
+        return limited(remaining=29, reset=1060, limit=30, resource="search")
+
+    _, scheduler, _ = run_requests(responses, ["/search/code", "/search/repositories", "/search/code"], clock)
+    # The code search budget is exhausted; repository search is a separate budget
+    assert clock.sleeps == [20.0]
+    assert scheduler.resource_for("/search/code") == "code_search"
+    assert scheduler.resource_for("/search/repositories") == "search"
+    assert set(scheduler.stats()) == {"code_search", "search"}
@@ -0,0 +1,61 @@
+import asyncio
+import time
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.tools import StructuredTool
+
+from tool_execution import ToolCallLimiter, build_agent
+
+
+class FakeModel(GenericFakeChatModel):
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+
+def sleeping_tool(index, seconds):
+    async def run(org: str) -> str:
+        await asyncio.sleep(seconds)
+        return f"result {index} for {org}"
+    return StructuredTool.from_function(coroutine=run, name=f"slow_tool_{index}", description=f"Slow fake tool {index}")
+
+
+def run_step(durations, limiter):
+    """One agent step calling every tool at once; returns (wall seconds, tool messages)"""
+    tools = [sleeping_tool(i, seconds) for i, seconds in enumerate(durations)]
+    model = FakeModel(messages=iter([
+        AIMessage(content="", tool_calls=[
+            {"id": f"call_{i}", "name": f"slow_tool_{i}", "args": {"org": "acme"}} for i in range(len(durations))
+        ]),
+        AIMessage(content="done")
+    ]))
+    agent = build_agent(model, tools, "test", limiter)
+    start = time.perf_counter()
+    state = asyncio.run(agent.ainvoke({"messages": [{"role": "user", "content": "go"}]}))
+    wall = time.perf_counter() - start
+    return wall, [message for message in state["messages"] if message.type == "tool"]
+
+
+def test_calls_of_one_step_run_concurrently():
+    durations = [0.1, 0.2, 0.3, 0.4]
+    wall, messages = run_step(durations, ToolCallLimiter(max_concurrency=4))
+    # About the slowest call, not the sum of all of them
+    assert max(durations) <= wall < max(durations) + 0.2 < sum(durations)
+    assert [message.tool_call_id for message in messages] == [f"call_{i}" for i in range(4)]
+    assert [message.content for message in messages] == [f"result {i} for acme" for i in range(4)]
+
+
+def test_concurrency_cap():
+    limiter = ToolCallLimiter(max_concurrency=2)
+    wall, messages = run_step([0.2] * 4, limiter)
+    assert limiter.max_in_flight == 2 and limiter.calls == 4
+    # Two rounds of two calls
+    assert 0.4 <= wall < 0.6 and len(messages) == 4
+
+
+def test_slow_call_times_out_without_holding_up_the_step():
+    limiter = ToolCallLimiter(max_concurrency=4, timeout=5, timeouts={"slow_tool_1": 0.1})
+    wall, messages = run_step([0.1, 10, 0.1], limiter)
+    assert wall < 1 and limiter.timed_out == 1
+    assert messages[1].status == "error" and "did not finish within 0.1s" in messages[1].content
+    assert messages[0].content == "result 0 for acme" and messages[2].content == "result 2 for acme"
@@ -0,0 +1,82 @@
+import asyncio
+import json
+
+import git_mcp_tools
+from conftest import git
+from tool_results import ToolResultCompactor
+
+
+def repo_record(i, **extra):
+    return {"name": f"service-{i}", "node_id": f"R_{i}", "url": f"https://api.github.com/repos/acme/service-{i}",
+            "hooks_url": "https://api.github.com/hooks", "html_url": f"https://github.com/acme/service-{i}",
+            "description": "", "homepage": None, **extra}
+
+
+def test_projection_drops_api_plumbing_and_empty_values():
+    compactor = ToolResultCompactor()
+    assert compactor.project(repo_record(1)) == {"name": "service-1", "html_url": "https://github.com/acme/service-1"}
+
+
+def test_projection_keeps_fields_the_question_mentions():
+    compactor = ToolResultCompactor()
+    compactor.intent = "what is the node id of service-1?"
+    assert "node_id" in compactor.project(repo_record(1))
+
+
+def test_duplicate_counter_is_dropped_only_next_to_its_twin():
+    compactor = ToolResultCompactor()
+    raw = compactor.project({"forks": 3, "forks_count": 3, "open_issues": 2, "open_issues_count": 2})
+    assert raw == {"forks_count": 3, "open_issues_count": 2}
+    # Summaries that only carry the short name keep it
+    assert compactor.project({"name": "api", "forks": 3, "watchers": 5}) == {"name": "api", "forks": 3, "watchers": 5}
+
+
+def test_records_become_a_table_with_dotted_columns():
+    compactor = ToolResultCompactor()
+    records = [{"name": f"service-{i}", "owner": {"login": f"dev{i}"}, "topics": ["platform", "internal"]}
+               for i in range(5)]
+    table = compactor.encode({"organization": "acme", "repositories": records})
+    assert table.splitlines()[:3] == ['{"organization":"acme"}', "repositories:", "name|owner.login|topics"]
+    assert table.splitlines()[3] == "service-0|dev0|platform,internal"
+
+
+def test_multi_hunk_diff_keeps_line_boundaries(repo):
+    (repo / "b.py").write_text("".join(f"x{i} = f(a, b)\n" for i in range(20)))
+    git(repo, "add", "b.py")
+    git(repo, "commit", "-qm", "b")
+    lines = (repo / "b.py").read_text().splitlines()
+    lines[1] = "x1 = g(a, b)"
+    lines[18] = "x18 = g(a, b)"
+    (repo / "b.py").write_text("\n".join(lines) + "\n")
+
+    result = asyncio.run(git_mcp_tools.get_diff(str(repo), paths=["b.py"]))
+    hunks = json.loads(result)["hunks"]
+    assert len(hunks) == 2
+
+    encoded = ToolResultCompactor().compact(result, "get_diff")
+    # Hunk lines hold commas, so they stay JSON lists instead of a comma-joined cell
+    assert json.loads(encoded)["hunks"] == hunks
+
+
+def test_long_result_is_cut_with_a_handle_and_paged():
+    compactor = ToolResultCompactor(max_result_tokens=200, page_size=10)
+    records = [{"name": f"service-{i}", "language": "Python", "node_id": f"R_{i}"} for i in range(100)]
+    cut = compactor.compact(json.dumps({"repositories": records}), "list_org_repos")
+    assert "page_tool_result(handle='r1'" in cut
+    shown = int(cut.rsplit("[showing ", 1)[1].split(" ", 1)[0])
+
+    page = compactor.page("r1", offset=shown, limit=10)
+    assert page.splitlines()[1] == f"service-{shown}|Python"
+    assert page.endswith(f"[{shown + 10} of 100; next: offset={shown + 10}]")
+    # fields= brings back fields the projection left out
+    assert json.loads(compactor.page("r1", offset=0, limit=1, fields=["node_id"]).splitlines()[0]) == [
+        {"node_id": "R_0"}]
+
+
+def test_expired_handle_is_reported():
+    compactor = ToolResultCompactor(max_result_tokens=50, max_handles=1)
+    text = json.dumps([{"name": f"service-{i}", "description": "x" * 40} for i in range(50)])
+    compactor.compact(text, "a")
+    compactor.compact(text, "b")
+    assert compactor.page("r1").startswith("Error: unknown or expired result handle")
+    assert compactor.page("r2", offset=0, limit=2).splitlines()[0] == "name|description"
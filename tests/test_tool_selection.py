@@ -0,0 +1,56 @@
+from langchain_core.messages import AIMessage, HumanMessage
+
+from prompt_cache import CACHE_POINT
+from tool_results import ToolResultCompactor
+from tool_selection import ALWAYS_TOOLS, ToolSelector, fake_registry
+
+
+def registry():
+    return [*fake_registry(), ToolResultCompactor().page_tool()]
+
+
+def selector(**kwargs):
+    selector = ToolSelector(registry(), max_tools=5, core=(), **kwargs)
+    selector.find_tools_tool()
+    return selector
+
+
+def test_best_matches_rank_first_and_always_tools_are_bound():
+    tools = selector()
+    assert tools.index.search("merge pull request 42", 2) == ["merge_pull_request", "create_pull_request"]
+    names = tools.select([HumanMessage("restart the api deployment")])
+    assert "k8s_rollout_restart" in names and ALWAYS_TOOLS <= set(names)
+    # Only tools matching the question, at most max_tools of them
+    assert set(names) - ALWAYS_TOOLS == {"k8s_deployments", "k8s_rollout_restart", "k8s_scale"}
+    assert len(tools.select([HumanMessage("list the repos and branches in acme")])) == 5 + len(ALWAYS_TOOLS)
+
+
+def test_find_tools_loads_more_tools_for_the_rest_of_the_turn():
+    tools = selector()
+    question = HumanMessage("restart the api deployment")
+    assert "ci_rerun" not in tools.select([question])
+    call = {"id": "call_1", "name": "find_tools", "args": {"need": "re-run a failed workflow"}}
+    assert "ci_rerun" in tools.select([question, AIMessage(content="", tool_calls=[call])])
+    assert "Loaded tools:" in tools.tools["find_tools"].invoke({"need": "re-run a failed workflow"})
+    # A new question starts from a fresh subset
+    assert "ci_rerun" not in tools.select([question, AIMessage(content="", tool_calls=[call]),
+                                           HumanMessage("restart the api deployment")])
+
+
+def test_disabled_selector_binds_every_tool():
+    tools = selector(enabled=False)
+    assert tools.select([HumanMessage("restart the api deployment")]) == sorted(tools.tools)
+    assert CACHE_POINT not in tools.bound_tools(sorted(tools.tools))
+
+
+def test_core_tools_come_first_behind_a_cache_point():
+    tools = ToolSelector(registry(), max_tools=5, core={"git_status", "git_log"})
+    tools.find_tools_tool()
+    bound = tools.bound_tools(tools.select([HumanMessage("restart the api deployment")]))
+    split = bound.index(CACHE_POINT)
+    shared = [tool.name for tool in bound[:split]]
+    assert shared == sorted(ALWAYS_TOOLS | {"git_status", "git_log"})
+    assert "k8s_rollout_restart" in [tool.name for tool in bound[split + 1:]]
+    # The shared part is the same for an unrelated question
+    other = tools.bound_tools(tools.select([HumanMessage("who is on call for payments")]))
+    assert other[:split + 1] == bound[:split + 1]
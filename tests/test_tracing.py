@@ -0,0 +1,99 @@
+import asyncio
+import json
+
+import httpx
+
+import tools
+from tracing import Tracer, build_trees, critical_path, load_spans, to_otlp
+
+
+def make_span(name, start, end, span_id, parent=None, service="voicegit", trace="t1", **attributes):
+    return {"traceId": trace, "spanId": span_id, "parentSpanId": parent, "name": name,
+            "startTimeUnixNano": start, "endTimeUnixNano": end, "attributes": attributes,
+            "status": {"code": "OK"}, "resource": {"service.name": service}}
+
+
+def turn_spans():
+    return [
+        make_span("turn", 0, 100, "turn"),
+        make_span("llm_call", 0, 20, "llm1", "turn"),
+        make_span("tool_call", 20, 70, "tool", "turn", tool="list_org_repos"),
+        make_span("mcp_call", 22, 68, "mcp", "tool", tool="list_org_repos"),
+        make_span("llm_call", 70, 100, "llm2", "turn"),
+        # From the GitHub server process: no parent, another trace id
+        make_span("http_request", 30, 60, "http", service="github-mcp", trace="other", status=200),
+        make_span("http_request", 75, 80, "late", service="github-mcp", trace="other"),
+    ]
+
+
+def test_server_spans_attach_to_the_innermost_call_running_around_them():
+    spans = turn_spans()
+    children = build_trees(spans)
+    assert [span["spanId"] for span in children["mcp"]] == ["http"]
+    assert spans[5]["traceId"] == "t1" and spans[5]["parentSpanId"] == "mcp"
+    # Outside every tool call window: left alone
+    assert spans[6]["parentSpanId"] is None and spans[6]["traceId"] == "other"
+
+
+def test_critical_path_walks_back_from_the_end():
+    spans = turn_spans()
+    # A short call overlapping the tool call is not on the critical path
+    spans.append(make_span("llm_call", 25, 30, "side", "turn"))
+    children = build_trees(spans)
+
+    def names(node):
+        span, path = node
+        return [span["spanId"], [names(child) for child in path]]
+
+    assert names(critical_path(spans[0], children)) == [
+        "turn", [["llm1", []], ["tool", [["mcp", [["http", []]]]]], ["llm2", []]]]
+
+
+def test_to_otlp_groups_spans_by_service():
+    spans = turn_spans()
+    spans[2]["status"] = {"code": "ERROR", "message": "TimeoutError"}
+    document = to_otlp(spans)
+    services = {resource["resource"]["attributes"][0]["value"]["stringValue"]: resource["scopeSpans"][0]["spans"]
+                for resource in document["resourceSpans"]}
+    assert len(services["voicegit"]) == 5 and len(services["github-mcp"]) == 2
+    tool = services["voicegit"][2]
+    assert tool["parentSpanId"] == "turn" and tool["kind"] == 1 and tool["status"] == {"code": 2, "message": "TimeoutError"}
+    assert tool["attributes"] == [{"key": "tool", "value": {"stringValue": "list_org_repos"}}]
+    http = services["github-mcp"][0]
+    assert "parentSpanId" not in http and http["kind"] == 3 and http["startTimeUnixNano"] == "30"
+    assert http["attributes"] == [{"key": "status", "value": {"intValue": "200"}}]
+
+
+def test_trace_file_is_rotated_past_max_bytes(tmp_path):
+    path = str(tmp_path / "traces" / "traces.jsonl")
+    tracer = Tracer(path=path, enabled=True, max_bytes=1000)
+    for i in range(20):
+        with tracer.span("turn", query=f"question {i}"):
+            pass
+    tracer.close()
+    assert (tmp_path / "traces" / "traces.jsonl.1").exists()
+    assert (tmp_path / "traces" / "traces.jsonl").stat().st_size <= 1000 + 400
+    # The newest spans survive, in the order they were written
+    queries = [span["attributes"]["query"] for span in load_spans(path)]
+    assert queries[-1] == "question 19" and queries == sorted(queries, key=lambda q: int(q.split()[1]))
+
+
+def test_github_requests_are_traced_with_their_sizes(tmp_path, monkeypatch):
+    tracer = Tracer(path=str(tmp_path / "traces.jsonl"), service="github-mcp", enabled=True)
+    monkeypatch.setattr(tools, "tracer", tracer)
+    sent = []
+
+    def handler(request):
+        sent.append(request.content)
+        return httpx.Response(200, json={"data": {"viewer": {"login": "me"}}})
+
+    transport = httpx.MockTransport(handler)
+    api = tools.GitHubAPI("test", base_url="https://api.test", transport=transport)
+    query = "query { viewer { login } }"
+    asyncio.run(api.graphql(query))
+    tracer.close()
+    [span] = load_spans(str(tmp_path / "traces.jsonl"))
+    assert span["name"] == "http_request" and span["resource"]["service.name"] == "github-mcp"
+    assert json.loads(sent[0])["query"] == query
+    assert span["attributes"]["request_bytes"] == len(sent[0])
+    assert span["attributes"]["status"] == 200 and span["parentSpanId"] is None